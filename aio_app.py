@@ -0,0 +1,333 @@
+"""Asyncio front end to the picoscopes, in place of the Flask app.
+
+Serves status, history and acquisitions from a single event loop: pulses
+await the device (see picoscope.aio) rather than holding a thread each,
+so status and history requests are answered while devices are busy.
+
+Deliberately minimal HTTP/1.1, one request per connection and JSON only,
+to stay free of dependencies: bodies need a Content-Length (411 if
+chunked) and Expect headers aren't honoured (417). Only a subset of
+app.py's routes is served, with the same values.
+
+It opens the devices itself, so it replaces app.py rather than running
+alongside it, as a device can only be opened once.
+"""
+
+import asyncio
+from dataclasses import dataclass
+import json
+import logging
+import numpy as np
+from typing import Awaitable, Callable, Dict, List, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from picoscope.aio import AsyncAcquirer
+from picoscope.averaging import AveragedWaveform
+from picoscope.constants import AIO_PORT, SUPERVISE, WARM_START, WARM_START_PARAMS
+from picoscope.history import Entry
+from picoscope.metrics import METRICS
+from picoscope.parameters import PulsingParams
+from picoscope.pool import Device, DevicePool
+from picoscope.utils import (
+    bool_to_requests, parse_preview, parse_processing_params, parse_pulsing_params, waveform_payload
+)
+
+REASONS: Dict[int, str] = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 411: 'Length Required', 417: 'Expectation Failed',
+    500: 'Internal Server Error', 503: 'Service Unavailable'
+}
+MAX_BODY_BYTES: int = 2**20
+
+pool: DevicePool = DevicePool.open()  # Backend, units and archiving set in constants
+acquirers: Dict[str, AsyncAcquirer] = {device.id: AsyncAcquirer(owner=device.owner) for device in pool}
+
+if WARM_START:
+    pool.warm_start(pulsing_params=PulsingParams(**WARM_START_PARAMS))
+
+if SUPERVISE:
+    pool.supervise()
+
+
+class NotFound(Exception):
+    """Raised by handlers to respond with 404."""
+
+
+class BadRequest(Exception):
+    """Raised to respond with 400, e.g. for missing or malformed values."""
+
+
+class LengthRequired(Exception):
+    """Raised to respond with 411 to chunked bodies, which aren't supported."""
+
+
+class ExpectationFailed(Exception):
+    """Raised to respond with 417 to Expect headers, e.g. 100-continue, which aren't supported."""
+
+
+ERRORS: Dict[type, int] = {BadRequest: 400, NotFound: 404, LengthRequired: 411, ExpectationFailed: 417}
+
+
+@dataclass
+class Request:
+    """An incoming http request.
+
+    Attributes:
+        method (str): E.g. 'GET'.
+        path (str): W/o the query string.
+        values (Dict[str, str]): Query args and form or JSON body values, as
+            flask.request.values.
+    """
+
+    method: str
+    path: str
+    values: Dict[str, str]
+
+    @property
+    def device(self) -> Device:
+        """The device the request is for, see app.requested_device. NotFound if there's none."""
+
+        try:
+            return pool.get(self.values.get('device'))
+
+        except KeyError:
+            raise NotFound()
+
+
+Response = Tuple[int, str, str]  # Status, content type and body
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+async def read_request(reader: asyncio.StreamReader) -> Request:
+    """Parses a request off the stream.
+
+    Args:
+        reader (asyncio.StreamReader): The connection.
+
+    Returns:
+        Request: The request. Raises BadRequest if it's malformed, and
+            LengthRequired or ExpectationFailed if it's chunked or has an
+            Expect header, neither of which is supported.
+    """
+
+    try:
+        method, target, _ = (await reader.readline()).decode('latin-1').split()
+        headers: Dict[str, str] = dict()
+
+        while (line := (await reader.readline()).decode('latin-1').strip()):
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if 'transfer-encoding' in headers:
+            raise LengthRequired()
+
+        if 'expect' in headers:
+            raise ExpectationFailed()
+
+        length = int(headers.get('content-length', 0))
+
+        if length > MAX_BODY_BYTES:
+            raise BadRequest(f'Body of {length} bytes exceeds {MAX_BODY_BYTES}.')
+
+        body = (await reader.readexactly(length)).decode() if length else ''
+
+    except (ValueError, asyncio.IncompleteReadError) as e:  # Incl. UnicodeDecodeError
+        raise BadRequest(str(e))
+
+    url = urlsplit(target)
+    values = dict(parse_qsl(url.query))
+
+    if headers.get('content-type', '').startswith('application/json'):
+        try:
+            json_values = json.loads(body)
+
+        except ValueError as e:
+            raise BadRequest(str(e))
+
+        if not isinstance(json_values, dict):
+            raise BadRequest('The JSON body must be an object.')
+
+        values.update({key: str(value) for key, value in json_values.items()})
+    else:
+        values.update(parse_qsl(body))
+
+    return Request(method=method.upper(), path=url.path, values=values)
+
+
+def encode_response(status: int, content_type: str, body: str) -> bytes:
+    body_bytes = body.encode()
+    head = (
+        f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n'
+        f'Content-Type: {content_type}\r\n'
+        f'Content-Length: {len(body_bytes)}\r\n'
+        'Connection: close\r\n\r\n'
+    )
+
+    return head.encode('latin-1') + body_bytes
+
+
+async def connection_status(device: Device) -> bool:
+    """As app.connection_status."""
+
+    if device.supervisor is not None:
+        return bool(device.supervisor.is_connected)
+
+    return await acquirers[device.id].run(lambda: device.picoscope_.is_connected)
+
+
+async def picoscope_status(request: Request) -> str:
+    is_connected: bool = await connection_status(device=request.device)
+
+    return f"Picoscope connection status: {bool_to_requests(is_connected)}"
+
+
+async def hello_world(request: Request) -> Response:
+    return 200, 'text/plain', f"Asyncio picoscope server running. {await picoscope_status(request=request)}"
+
+
+async def is_connected(request: Request) -> Response:
+    return 200, 'text/plain', await picoscope_status(request=request)
+
+
+async def pulsing(request: Request) -> Response:
+    """As /get_wave in app.py, JSON only. Only the acquiring device's requests wait on it."""
+
+    device: Device = request.device
+
+    try:
+        pulsing_params_ = parse_pulsing_params(request.values)
+        processing_params_ = parse_processing_params(request.values)
+        preview = parse_preview(request.values)
+
+    except (TypeError, ValueError):  # Missing or malformed values
+        raise BadRequest()
+
+    with METRICS.timer(metric='stage', label='acquire'):
+        waveform: AveragedWaveform = await acquirers[device.id].acquire(pulsing_params=pulsing_params_)
+
+    # Processing is numpy-heavy, so off the loop.
+    payload = await asyncio.get_running_loop().run_in_executor(
+        None,
+        lambda: waveform_payload(
+            waveform=waveform,
+            pulsing_params=pulsing_params_,
+            processing_params=processing_params_,
+            preview=preview
+        )
+    )
+
+    return 200, 'application/json', json.dumps(payload)
+
+
+async def latest(request: Request) -> Response:
+    """As /latest in app.py, JSON only."""
+
+    entry: Entry = request.device.history.latest()
+
+    if entry is None:
+        raise NotFound()
+
+    return 200, 'application/json', json.dumps(entry.to_dict())
+
+
+async def history_range(request: Request) -> Response:
+    """As /history in app.py, JSON only."""
+
+    try:
+        start = float(request.values.get('start', -np.inf))
+        end = float(request.values.get('end', np.inf))
+
+    except ValueError:
+        raise BadRequest()
+
+    entries: List[Entry] = request.device.history.between(start=start, end=end)
+
+    return 200, 'application/json', json.dumps([entry.to_dict() for entry in entries])
+
+
+async def devices(request: Request) -> Response:
+    """As /devices in app.py, all devices pinged at once."""
+
+    statuses = await asyncio.gather(*[connection_status(device=device) for device in pool])
+
+    return 200, 'application/json', json.dumps([
+        {'device': device.id, 'is_connected': bool_to_requests(status)}
+        for device, status in zip(pool, statuses)
+    ])
+
+
+async def health(request: Request) -> Response:
+    """As /health in app.py."""
+
+    body = json.dumps({'devices': [device.health() for device in pool]})
+
+    return 200 if pool.is_healthy else 503, 'application/json', body
+
+
+async def metrics(request: Request) -> Response:
+    return 200, 'text/plain; version=0.0.4', METRICS.render()
+
+
+ROUTES: Dict[Tuple[str, str], Handler] = {
+    ('GET', '/'): hello_world,
+    ('GET', '/is_connected'): is_connected,
+    ('POST', '/get_wave'): pulsing,
+    ('GET', '/latest'): latest,
+    ('GET', '/history'): history_range,
+    ('GET', '/devices'): devices,
+    ('GET', '/health'): health,
+    ('GET', '/metrics'): metrics
+}
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Answers a single request, then closes the connection."""
+
+    try:
+        try:
+            request = await read_request(reader=reader)
+            handler = ROUTES.get((request.method, request.path))
+
+            if handler is None:
+                raise NotFound()
+
+            response = await handler(request)
+
+        except tuple(ERRORS) as e:
+            response = ERRORS[type(e)], 'text/plain', ''
+
+        except Exception as e:
+            logging.exception(e)
+            response = 500, 'text/plain', ''
+
+        writer.write(encode_response(*response))
+        await writer.drain()
+
+    except ConnectionError:
+        pass  # Client hung up
+
+    finally:
+        writer.close()
+
+
+async def serve(host: str = '0.0.0.0', port: int = AIO_PORT) -> asyncio.AbstractServer:
+    """Starts listening, w/o blocking.
+
+    Args:
+        host (str, optional): Interface to bind to. Defaults to all.
+        port (int, optional): Defaults to constants.AIO_PORT, 0 for any free one.
+
+    Returns:
+        asyncio.AbstractServer: The server, already serving.
+    """
+    return await asyncio.start_server(handle, host=host, port=port)
+
+
+async def main() -> None:
+    server = await serve()
+
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
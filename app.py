@@ -1,17 +1,30 @@
 """Flask app connecting pithy container to picoscope container"""
 
+from dataclasses import asdict
 import flask
+from functools import partial
 import json
 import logging
+import numpy as np
 import os
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple
 from werkzeug.exceptions import BadRequest
 
-from picoscope.constants import PORT
+from picoscope import encoding
+from picoscope.archive import Record
+from picoscope.averaging import AveragedWaveform
+from picoscope.constants import PORT, STREAM_RATE, SUPERVISE, WARM_START, WARM_START_PARAMS
+from picoscope.history import Entry
+from picoscope.jobs import Job, JobStatus, JobStore
+from picoscope.metrics import METRICS
 from picoscope.parameters import PulsingParams
-from picoscope.picoscope import Picoscope2000
+from picoscope.pool import Device, DevicePool
+from picoscope.processing import ProcessingParams
+from picoscope.scheduler import Schedule, Scheduler
 from picoscope import pulse
-from picoscope.utils import bool_to_requests, dataclass_from_dict, parse_dict_vals
+from picoscope.utils import (
+    bool_to_requests, parse_preview, parse_processing_params, parse_pulsing_params, waveform_payload
+)
 
 
 log_filename = "logs/logs.log"
@@ -23,11 +36,85 @@ logging.basicConfig(
 )
 
 app: flask.Flask = flask.Flask(__name__)
-picoscope_: Picoscope2000 = Picoscope2000()
+pool: DevicePool = DevicePool.open()  # Backend, units and archiving set in constants
+jobs: JobStore = JobStore()
+scheduler: Scheduler = Scheduler()
+
+if WARM_START:
+    pool.warm_start(pulsing_params=PulsingParams(**WARM_START_PARAMS))
+
+if SUPERVISE:
+    pool.supervise()
+
+
+def requested_device() -> Device:
+    """The device a request is for, by its _device_ value.
+
+    Requests w/o one go to the default device. Aborts with 404 if
+    there's no device by that ID.
+
+    Returns:
+        Device: The device.
+    """
+
+    try:
+        return pool.get(flask.request.values.get('device'))
+
+    except KeyError:
+        flask.abort(404)
+
+
+def channels_mV(waveform: AveragedWaveform) -> Tuple[np.ndarray, Dict[str, str]]:
+    """What to binary-encode: the waveform, or if several channels were captured, one per row.
+
+    Args:
+        waveform (AveragedWaveform): The averaged waveform.
+
+    Returns:
+        Tuple[np.ndarray, Dict[str, str]]: The waveform(s) [mV] and, if
+            several, X-Channels: the channel letter of each row.
+    """
+
+    if waveform.channels is None:
+        return waveform.mean_mV, dict()
+
+    return np.stack([waveform_.mean_mV for waveform_ in waveform.channels.values()]), \
+        {'X-Channels': ','.join(waveform.channels)}
+
+
+def connection_status(device: Device) -> bool:
+    """Whether the device is connected, as cached by its supervisor if it has one, else pinged."""
+
+    if device.supervisor is not None:
+        return bool(device.supervisor.is_connected)
+
+    return device.owner.run(lambda: device.picoscope_.is_connected)
+
 
+def picoscope_status(device: Device) -> str:
+    return f"Picoscope connection status: {bool_to_requests(connection_status(device=device))}"
 
-def picoscope_status() -> str:
-    return f"Picoscope connection status: {bool_to_requests(picoscope_.is_connected)}"
+
+def parse_values(raw_values: Dict[str, str]) -> Tuple[PulsingParams, ProcessingParams, Tuple[int, str]]:
+    """Parses incoming http values to everything a pulse is requested with.
+
+    Aborts with 400 if they're malformed.
+
+    Args:
+        raw_values (Dict[str, str]): Incoming http values.
+
+    Returns:
+        Tuple[PulsingParams, ProcessingParams, Tuple[int, str]]: Parameters
+            for pulsing, what to compute from the waveform (None for
+            nothing) and the preview asked for (None for none), see
+            picoscope.utils.
+    """
+
+    try:
+        return parse_pulsing_params(raw_values), parse_processing_params(raw_values), parse_preview(raw_values)
+
+    except (TypeError, ValueError):  # Missing or malformed values
+        flask.abort(400)
 
 
 def configure_routes(app):
@@ -38,7 +125,7 @@ def configure_routes(app):
         Returns:
             Str: Status message
         """
-        return f"Flask picoscope server running. {picoscope_status()}"
+        return f"Flask picoscope server running. {picoscope_status(device=requested_device())}"
 
     @app.route('/connect')
     def connect():
@@ -46,49 +133,499 @@ def configure_routes(app):
         w/o having to restart container.
         """
 
-        picoscope_.connect()  # Calls self.is_connected() implicitly
+        device: Device = requested_device()
+        device.owner.run(device.picoscope_.connect)  # Calls self.is_connected() implicitly
 
-        return picoscope_status()
+        return picoscope_status(device=device)
 
     @app.route('/is_connected')
     def is_connected():
         """Checking whether picoscope is connected."""
 
-        picoscope_.is_connected
-
-        return picoscope_status()
+        return picoscope_status(device=requested_device())
 
     @app.route('/get_wave', methods=['POST'])
     def pulsing():
         """Pulsing. Performs a pulse and returns the resulting data.
+
+        The response format is negotiated through the Accept header, see
+        picoscope.encoding. Defaults to JSON. For compressed responses the
+        X-Precision header [mV] trades exactness for size. If several
+        _channels_ are captured, binary bodies hold one row per channel.
+
+        If _features_ are asked for (see picoscope.processing.ProcessingParams
+        for these and the other processing values), they're computed here
+        and returned as JSON instead of the waveform, or along with it if
+        _include_waveform_. A _preview_ value (no. of points, optionally
+        with _preview_method_, see picoscope.decimation) returns the
+        waveform decimated for display as JSON, with the time of each point.
+
+        Downsampling on the device (see PulsingParams.downsampling_mode)
+        shortens the waveform; sampling_interval (X-Sampling-Interval for
+        binary formats) is the time between the samples returned.
         
         Returns:
             dict: Pulsing data.
         """
 
+        device: Device = requested_device()
+        raw_pulsing_params: Dict[str, str] = flask.request.values.to_dict()
+        pulsing_params_, processing_params_, preview = parse_values(raw_pulsing_params)
+        mimetype: str = flask.request.accept_mimetypes.best_match(
+            encoding.MIMETYPES,
+            default=encoding.JSON
+        )
+
+        with METRICS.timer(metric='stage', label='acquire'):  # Incl. waiting for the owner
+            waveform: AveragedWaveform = device.owner.acquire(pulsing_params=pulsing_params_)
+
+        if mimetype == encoding.JSON or processing_params_ is not None or preview is not None:
+            with METRICS.timer(metric='stage', label='parse_payload'):
+                payload: Dict[str, List[float]] = waveform_payload(
+                    waveform=waveform,
+                    pulsing_params=pulsing_params_,
+                    processing_params=processing_params_,
+                    preview=preview
+                )
+
+            with METRICS.timer(metric='stage', label='json_dumps'):
+                return json.dumps(payload)
+
+        with METRICS.timer(metric='stage', label='encode_waveform'):
+            waveform_mV, channel_headers = channels_mV(waveform=waveform)
+            body, headers = encoding.encode_waveform(
+                waveform_mV=waveform_mV,
+                mimetype=mimetype,
+                mV_per_adc=waveform.mV_per_adc,
+                sampling_interval=waveform.sampling_interval,
+                avg_num=waveform.avg_num,
+                precision=flask.request.headers.get('X-Precision', type=float)
+            )
+
+        return flask.Response(body, headers={**headers, **channel_headers})
+
+    @app.route('/get_waves', methods=['POST'])
+    def batch_pulsing():
+        """Pulses once per set of pulsing params, all in one request.
+
+        Takes a JSON list of objects with the same keys as /get_wave, incl.
+        the processing and preview ones. The sets are acquired back to back, reordered
+        to minimise device reconfiguration, but returned in the order they
+        were sent. Sets for different devices (by their _device_ key) run
+        in parallel.
+
+        The response is either a JSON list of /get_wave payloads or, if
+        requested through the Accept header, the averaged waveforms packed
+        back to back as float32, every channel of each if several
+        (see picoscope.encoding.encode_waveforms).
+
+        Returns:
+            list[dict]: Pulsing data per set of params. 400 if the body isn't
+                a non-empty JSON list of objects or a value is invalid.
+        """
+
+        raw_values: List[Dict[str, str]] = flask.request.get_json(silent=True)
+
+        if not raw_values or not isinstance(raw_values, list) \
+                or not all(isinstance(values, dict) for values in raw_values):
+            flask.abort(400)
+
+        pulsing_params_, all_processing_params, previews = zip(*map(parse_values, raw_values))
+        requests: List[Tuple[str, PulsingParams]] = [
+            (raw_pulsing_params.get('device'), params)
+            for raw_pulsing_params, params in zip(raw_values, pulsing_params_)
+        ]
+        mimetype: str = flask.request.accept_mimetypes.best_match(
+            encoding.BATCH_MIMETYPES,
+            default=encoding.JSON
+        )
+
+        try:
+            waveforms: List[AveragedWaveform] = pool.acquire_batch(requests=requests)
+
+        except KeyError:
+            flask.abort(404)
+
+        if mimetype == encoding.JSON or any(all_processing_params) or any(previews):
+            payloads = [
+                waveform_payload(
+                    waveform=waveform,
+                    pulsing_params=pulsing_params_,
+                    processing_params=processing_params_,
+                    preview=preview
+                )
+                for waveform, (_, pulsing_params_), processing_params_, preview
+                in zip(waveforms, requests, all_processing_params, previews)
+            ]
+
+            return json.dumps(payloads)
+
+        body, headers = encoding.encode_waveforms(
+            waveforms_mV=[channels_mV(waveform=waveform)[0] for waveform in waveforms],
+            sampling_interval=[waveform.sampling_interval for waveform in waveforms]
+        )
+
+        return flask.Response(body, headers=headers)
+
+    @app.route('/jobs', methods=['POST'])
+    def submit_job():
+        """Queues a pulse and returns immediately, w/o waiting for the device.
+
+        Takes the same values as /get_wave. Poll /jobs/<job_id> for the result.
+
+        Returns:
+            dict: The job's ID under 'job' and its status, see /jobs/<job_id>. 202.
+        """
+
+        device: Device = requested_device()
+        pulsing_params_, processing_params_, preview = parse_values(flask.request.values.to_dict())
+        job: Job = jobs.submit(
+            owner=device.owner,
+            device_id=device.id,
+            pulsing_params=pulsing_params_,
+            processing_params=processing_params_,
+            preview=preview
+        )
+
+        return json.dumps(job.to_dict()), 202
+
+    @app.route('/jobs/<job_id>', methods=['GET', 'DELETE'])
+    def job_status(job_id: str):
+        """Status of a job, with the result once it's done.
+
+        Jobs are kept until constants.JOB_TTL_S after they finished, or
+        until DELETE-d, after which they're gone.
+
+        Returns:
+            dict: ID, device, status ('queued', 'running', 'done' or
+                'failed'), submission time and pulsing params. If done, the
+                /get_wave payload under 'result', if failed, the error
+                under 'error'. 404 if there's no such job (any more).
+        """
+
+        try:
+            job: Job = jobs.pop(job_id) if flask.request.method == 'DELETE' else jobs.get(job_id)
+
+        except KeyError:
+            return '', 404
+
+        status: Dict = job.to_dict()
+
+        if status['status'] == JobStatus.DONE.value:
+            status['result'] = waveform_payload(
+                waveform=job.result(),
+                pulsing_params=job.pulsing_params,
+                processing_params=job.processing_params,
+                preview=job.preview
+            )
+
+        return json.dumps(status)
+
+    @app.route('/schedules', methods=['GET', 'POST'])
+    def schedules():
+        """Pulses periodically, server-side, w/o a request per pulse.
+
+        POST starts a schedule. Takes the same values as /get_wave, minus the
+        processing and preview ones, plus _name_, _interval_s_ and optionally
+        _duration_s_ (until cancelled if not given) and _sink_: 'memory'
+        (the default, see /schedules/<name>) or 'file', one JSON line per shot
+        in constants.SCHEDULE_DIR. GET lists all schedules.
+
+        Returns:
+            dict: The schedule's status (201), see /schedules/<name>, or a
+                list thereof. 400 if a value is missing or invalid, or the
+                name is taken.
+        """
+
+        if flask.request.method == 'GET':
+            return json.dumps([schedule.to_dict() for schedule in scheduler])
+
+        device: Device = requested_device()
+        raw_values: Dict[str, str] = flask.request.values.to_dict()
+        pulsing_params_, _, _ = parse_values(raw_values)
+
+        try:
+            schedule: Schedule = scheduler.create(
+                name=raw_values.get('name', ''),
+                sink=raw_values.get('sink', 'memory'),
+                owner=device.owner,
+                device_id=device.id,
+                pulsing_params=pulsing_params_,
+                interval_s=float(raw_values['interval_s']),
+                duration_s=float(raw_values['duration_s']) if 'duration_s' in raw_values else None
+            )
+
+        except (KeyError, ValueError):
+            flask.abort(400)
+
+        return json.dumps(schedule.to_dict()), 201
+
+    @app.route('/schedules/<name>', methods=['GET', 'DELETE'])
+    def schedule_status(name: str):
+        """Status of a schedule, with its shots kept in memory.
+
+        Takes an optional query arg _since_, the index of the last shot
+        fetched, to only return newer ones. DELETE cancels the schedule, if
+        still running, and forgets it.
+
+        Returns:
+            dict: Name, device, status ('running', 'done' or 'cancelled'),
+                pulsing params, interval, duration, counts of shots, failed
+                and dropped shots, and mean and max. lateness [s]. Under
+                'shots' the /get_wave payload of each with its index and
+                planned and actual start (unix time [s]). 404 if there's
+                no such schedule.
+        """
+
+        try:
+            schedule: Schedule = scheduler.remove(name) if flask.request.method == 'DELETE' else scheduler.get(name)
+
+        except KeyError:
+            return '', 404
+
+        status: Dict = schedule.to_dict()
+        status['shots'] = [
+            shot.to_dict() for shot in schedule.sink.since(index=flask.request.args.get('since', -1, type=int))
+        ]
+
+        return json.dumps(status)
+
+    @app.route('/stream', methods=['POST'])
+    def streaming():
+        """Pulses repeatedly and streams the waveforms as server-sent events.
+
+        Takes the same values as /get_wave, plus optionally _rate_ [Hz]
+        and _n_frames_. Streams until n_frames have been sent or the client
+        disconnects. Each event is a JSON object with the averaged waveform
+        (or its features or preview, as for /get_wave) and the frame's timing, incl.
+        counts of late and dropped frames.
+
+        Returns:
+            Response: text/event-stream. 400 if a value is invalid, incl. a
+                rate that isn't positive or fewer than one frame.
+        """
+
+        device: Device = requested_device()
         raw_pulsing_params: Dict[str, str] = flask.request.values.to_dict()
-        pulsing_params_parsed: Dict[str, float] = parse_dict_vals(dict_=raw_pulsing_params)
-        pulsing_params_: PulsingParams = dataclass_from_dict(
-            dict_=pulsing_params_parsed,
-            dataclass_=PulsingParams
+        pulsing_params_, processing_params_, preview = parse_values(raw_pulsing_params)
+
+        try:
+            rate: float = float(raw_pulsing_params.get('rate', STREAM_RATE))
+            n_frames: int = int(raw_pulsing_params['n_frames']) if 'n_frames' in raw_pulsing_params else None
+
+        except ValueError:
+            flask.abort(400)
+
+        if not (np.isfinite(rate) and rate > 0) or (n_frames is not None and n_frames < 1):
+            flask.abort(400)
+
+        def events() -> Iterator[str]:
+            frames = pulse.stream(
+                acquire_fn=partial(device.owner.acquire, pulsing_params=pulsing_params_),
+                rate=rate,
+                n_frames=n_frames
+            )
+
+            for frame in frames:
+                payload = waveform_payload(
+                    waveform=frame.waveform,
+                    pulsing_params=pulsing_params_,
+                    processing_params=processing_params_,
+                    preview=preview
+                )
+                payload.update(
+                    frame=frame.index,
+                    timestamp=frame.timestamp,
+                    lateness_s=frame.lateness_s,
+                    n_late=frame.n_late,
+                    n_dropped=frame.n_dropped
+                )
+
+                yield f"data: {json.dumps(payload)}\n\n"
+
+        return flask.Response(events(), mimetype='text/event-stream')
+
+    @app.route('/latest')
+    def latest():
+        """The most recent acquisition, w/o pulsing.
+
+        Binary formats can be requested through the Accept header, as
+        for /get_wave, in which case the metadata is sent as headers.
+
+        Returns:
+            dict: The averaged waveform with its pulsing params,
+                timestamp and timings. 404 if nothing has been acquired yet.
+        """
+
+        device: Device = requested_device()
+        entry: Entry = device.history.latest()
+
+        if entry is None:
+            return '', 404
+
+        mimetype: str = flask.request.accept_mimetypes.best_match(
+            encoding.MIMETYPES,
+            default=encoding.JSON
+        )
+
+        if mimetype == encoding.JSON:
+            return json.dumps(entry.to_dict())
+
+        waveform_mV, channel_headers = channels_mV(waveform=entry.waveform)
+        body, headers = encoding.encode_waveform(
+            waveform_mV=waveform_mV,
+            mimetype=mimetype,
+            mV_per_adc=entry.waveform.mV_per_adc,
+            sampling_interval=entry.waveform.sampling_interval or device.picoscope_.sampling_interval,
+            avg_num=entry.waveform.avg_num,
+            precision=flask.request.headers.get('X-Precision', type=float)
+        )
+        headers['X-Timestamp'] = str(entry.timestamp)
+        headers['X-Pulsing-Params'] = json.dumps(asdict(entry.pulsing_params))
+        headers.update(channel_headers)
+
+        return flask.Response(body, headers=headers)
+
+    @app.route('/history')
+    def history_range():
+        """Recent acquisitions in a time range, w/o pulsing.
+
+        Takes optional query args _start_ and _end_ (unix time [s]).
+        If requested through the Accept header, the waveforms are packed
+        back to back as float32, every channel of each if several,
+        see picoscope.encoding.encode_waveforms.
+
+        Returns:
+            list[dict]: Entries as for /latest, oldest first.
+        """
+
+        device: Device = requested_device()
+        entries: List[Entry] = device.history.between(
+            start=flask.request.args.get('start', -np.inf, type=float),
+            end=flask.request.args.get('end', np.inf, type=float)
+        )
+        mimetype: str = flask.request.accept_mimetypes.best_match(
+            encoding.BATCH_MIMETYPES,
+            default=encoding.JSON
+        )
+
+        if mimetype == encoding.JSON:
+            return json.dumps([entry.to_dict() for entry in entries])
+
+        body, headers = encoding.encode_waveforms(
+            waveforms_mV=[channels_mV(waveform=entry.waveform)[0] for entry in entries],
+            sampling_interval=[
+                entry.waveform.sampling_interval or device.picoscope_.sampling_interval for entry in entries
+            ]
+        )
+        headers['X-Timestamps'] = ','.join(str(entry.timestamp) for entry in entries)
+
+        return flask.Response(body, headers=headers)
+
+    @app.route('/archive')
+    def archive_range():
+        """Archived acquisitions in a time range, read from disk.
+
+        As /history, but reaching back as far as the archive does. Takes
+        optional query args _start_ and _end_ (unix time [s]) and _limit_,
+        the max. no. of waveforms to return (the oldest ones).
+
+        Returns:
+            list[dict]: Waveforms with their channel, pulsing params and
+                timestamp, oldest first, one per channel for acquisitions of
+                several. 404 if archiving is off, see constants.ARCHIVE_DIR.
+        """
+
+        device: Device = requested_device()
+        archive = device.archive
+
+        if archive is None:
+            return '', 404
+
+        index: np.ndarray = archive.between(
+            start=flask.request.args.get('start', -np.inf, type=float),
+            end=flask.request.args.get('end', np.inf, type=float)
         )
-        payload: Dict[str, List[float]] = pulse.pulse(
-            picoscope_=picoscope_,
-            pulsing_params=pulsing_params_
+        records: List[Record] = [
+            archive.record(index_record=index_record)
+            for index_record in index[:flask.request.args.get('limit', len(index), type=int)]
+        ]
+        mimetype: str = flask.request.accept_mimetypes.best_match(
+            encoding.BATCH_MIMETYPES,
+            default=encoding.JSON
         )
 
-        return json.dumps(payload)
+        if mimetype == encoding.JSON:
+            return json.dumps([record.to_dict() for record in records])
+
+        body, headers = encoding.encode_waveforms(
+            waveforms_mV=[record.mean_mV for record in records],
+            sampling_interval=[record.sampling_interval or device.picoscope_.sampling_interval for record in records]
+        )
+        headers['X-Timestamps'] = ','.join(str(record.timestamp) for record in records)
+
+        return flask.Response(body, headers=headers)
+
+    @app.route('/devices')
+    def devices():
+        """The devices served, the first being the default.
+
+        Any route takes a _device_ value to address a device other than
+        the default one.
+
+        Returns:
+            list[dict]: ID and connection status ('0' or '1') per device.
+        """
+
+        # Pinging all unsupervised devices at once rather than one after the other.
+        futures = {
+            device.id: device.owner.submit(lambda device=device: device.picoscope_.is_connected)
+            for device in pool if device.supervisor is None
+        }
+
+        return json.dumps([
+            {
+                'device': device.id,
+                'is_connected': bool_to_requests(
+                    futures[device.id].result() if device.id in futures else connection_status(device=device)
+                )
+            }
+            for device in pool
+        ])
+
+    @app.route('/health')
+    def health():
+        """Whether the devices are warm, w/o pinging them, see constants.WARM_START.
+
+        Returns:
+            dict: Readiness ('cold', 'warming', 'ready' or 'failed') per
+                device, with how long the warm start took or why it failed.
+                503 while any device is still warming up or failed to.
+        """
+
+        return json.dumps({'devices': [device.health() for device in pool]}), 200 if pool.is_healthy else 503
+
+    @app.route('/metrics')
+    def metrics():
+        """Latency histograms per stage and SDK call, and counts of
+        acquisitions, shots, (re)connects and overflows.
+
+        Returns:
+            Response: Prometheus' text exposition format.
+        """
+        return flask.Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
 
     @app.route('/disconnect')
     def disconnect():
         """Disconnects the oscilloscope. Mainly for testing purposes."""
-        picoscope_.disconnect()
+        device: Device = requested_device()
+        device.owner.run(device.picoscope_.disconnect)
 
         return 'Picoscope disconnected.'
 
     @app.errorhandler(BadRequest)
     def handle_bad_request(e):
-        return '', 404
+        return '', 400
 
 
 configure_routes(app)
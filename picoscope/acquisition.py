@@ -0,0 +1,266 @@
+"""Serialised access to the oscilloscope from concurrent http requests."""
+
+from concurrent.futures import Future
+from contextlib import contextmanager
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List
+
+from picoscope import pulse
+from picoscope.archive import Archive
+from picoscope.averaging import AveragedWaveform
+from picoscope.history import Entry, History
+from picoscope.parameters import PulsingParams
+from picoscope.picoscope import Picoscope2000
+
+
+class AcquisitionOwner:
+    """Owns the oscilloscope: all SDK calls run on a single worker thread.
+
+    Requests are queued and run one at a time, in order, so concurrent
+    http requests never interleave SDK calls on the same handle.
+    Acquisitions with PulsingParams identical to one that is queued or
+    in flight share its result rather than pulsing again.
+
+    Example:
+        owner = AcquisitionOwner(picoscope_=Picoscope2000())
+        waveform = owner.acquire(pulsing_params=pulsing_params)
+        is_connected = owner.run(lambda: picoscope_.is_connected)
+    """
+
+    def __init__(self, picoscope_: Picoscope2000, history: History = None, archive: Archive = None):
+        """
+        Args:
+            picoscope_ (Picoscope2000): Picoscope instance. Shouldn't be
+                accessed other than through this owner from here on.
+            history (History, optional): If passed, every acquisition is
+                recorded to it. Defaults to None.
+            archive (Archive, optional): If passed, every acquisition is
+                archived to disk. Defaults to None.
+        """
+
+        self.picoscope_: Picoscope2000 = picoscope_
+        self.history: History = history
+        self.archive: Archive = archive
+        # Whether acquisitions ping the device first, see pulse.acquire. Off if supervised.
+        self.check_connection: bool = True
+        self.acquired_at: float = None  # time.monotonic() of the last successful acquisition
+
+        self._queue: queue.Queue = queue.Queue()
+        self._is_running: bool = False
+        self._n_leases: int = 0  # Multi-step acquisitions in flight, see lease
+        self._lock: threading.Lock = threading.Lock()
+        self._pending: Dict[PulsingParams, Future] = dict()
+        self._worker: threading.Thread = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+    def _work(self) -> None:
+        """Runs queued calls one at a time, forever."""
+
+        while True:
+            fn, args, kwargs, future = self._queue.get()
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            self._is_running = True
+
+            try:
+                future.set_result(fn(*args, **kwargs))
+
+            except Exception as e:
+                future.set_exception(e)
+
+            finally:
+                self._is_running = False
+
+    @property
+    def is_leased(self) -> bool:
+        """Whether a multi-step acquisition is in flight, see lease."""
+        return self._n_leases > 0
+
+    @property
+    def is_idle(self) -> bool:
+        """Whether nothing is running, queued or leased, at the moment of asking."""
+        return not self.is_leased and not self._is_running and self._queue.empty()
+
+    @contextmanager
+    def lease(self) -> Iterator[None]:
+        """Marks a multi-step acquisition, submitted call by call, as in flight.
+
+        The worker is idle in between the calls, e.g. while awaiting
+        readiness (see picoscope.aio), so is_idle alone can't tell that
+        calls such as a heartbeat would land between RunBlock and GetValues.
+
+        Example:
+            with owner.lease():
+                owner.run(picoscope_.run_block)
+                ...
+        """
+
+        with self._lock:
+            self._n_leases += 1
+
+        try:
+            yield
+
+        finally:
+            with self._lock:
+                self._n_leases -= 1
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queues fn to be called on the worker thread.
+
+        Args:
+            fn (Callable): Any callable that accesses the oscilloscope.
+
+        Returns:
+            Future: Resolves to the return value of fn.
+        """
+
+        future = Future()
+        self._queue.put((fn, args, kwargs, future))
+
+        return future
+
+    def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Like submit, but blocks until fn has been called.
+
+        Returns:
+            Any: The return value of fn. Exceptions are re-raised.
+        """
+        return self.submit(fn, *args, **kwargs).result()
+
+    def record(self, pulsing_params: PulsingParams, waveform: AveragedWaveform, timestamp: float, acquire_s: float) -> None:
+        """Records an acquisition to history and archive, whichever are set.
+
+        Args:
+            pulsing_params (PulsingParams): Parameters it was pulsed with.
+            waveform (AveragedWaveform): The averaged waveform.
+            timestamp (float): Unix time at which it was started [s].
+            acquire_s (float): How long it took [s].
+        """
+
+        if self.history is None and self.archive is None:
+            return
+
+        entry = Entry(
+            waveform=waveform,
+            pulsing_params=pulsing_params,
+            timestamp=timestamp,
+            timings={
+                'acquire_s': acquire_s,
+                'wait_s': self.picoscope_.wait_s
+            }
+        )
+
+        if self.history is not None:
+            self.history.append(entry)
+
+        if self.archive is not None:
+            self.archive.append(entry)  # Only queued, written on the archive's own thread
+
+    def run_acquisition(self, pulsing_params: PulsingParams) -> AveragedWaveform:
+        """Connects if need be, pulses and records, right away.
+
+        Only to be called on the worker thread, i.e. from a call passed to
+        submit. Use acquire or submit_acquire otherwise.
+
+        Args:
+            pulsing_params (PulsingParams): Parameters for pulsing.
+
+        Returns:
+            AveragedWaveform: The averaged waveform.
+        """
+
+        timestamp = time.time()
+        start = time.perf_counter()
+        waveform = pulse.acquire(
+            picoscope_=self.picoscope_,
+            pulsing_params=pulsing_params,
+            check_connection=self.check_connection
+        )
+        self.acquired_at = time.monotonic()
+        self.record(
+            pulsing_params=pulsing_params,
+            waveform=waveform,
+            timestamp=timestamp,
+            acquire_s=time.perf_counter() - start
+        )
+
+        return waveform
+
+    def run_acquisition_batch(self, pulsing_params: List[PulsingParams]) -> List[AveragedWaveform]:
+        """Like run_acquisition, once per set of parameters, see pulse.acquire_batch.
+
+        Only to be called on the worker thread. Use submit_acquire_batch otherwise.
+
+        Args:
+            pulsing_params (List[PulsingParams]): Parameters for each pulse.
+
+        Returns:
+            List[AveragedWaveform]: The averaged waveform per set of parameters,
+                each recorded as it was acquired.
+        """
+
+        waveforms = pulse.acquire_batch(
+            picoscope_=self.picoscope_,
+            pulsing_params=pulsing_params,
+            check_connection=self.check_connection,
+            record=self.record
+        )
+        self.acquired_at = time.monotonic()
+
+        return waveforms
+
+    def submit_acquire_batch(self, pulsing_params: List[PulsingParams]) -> Future:
+        """Queues a batch of acquisitions, see run_acquisition_batch. Not coalesced.
+
+        Args:
+            pulsing_params (List[PulsingParams]): Parameters for each pulse.
+
+        Returns:
+            Future: Resolves to the list of AveragedWaveforms.
+        """
+        return self.submit(self.run_acquisition_batch, pulsing_params=pulsing_params)
+
+    def _acquire(self, pulsing_params: PulsingParams) -> AveragedWaveform:
+        try:
+            return self.run_acquisition(pulsing_params=pulsing_params)
+
+        finally:
+            # Before the result is set, so later requests trigger a new pulse.
+            with self._lock:
+                del self._pending[pulsing_params]
+
+    def submit_acquire(self, pulsing_params: PulsingParams) -> Future:
+        """Queues an acquisition, unless an identical one is already queued or in flight.
+
+        Args:
+            pulsing_params (PulsingParams): Parameters for pulsing.
+
+        Returns:
+            Future: Resolves to the AveragedWaveform. Shared between
+                coalesced requests, so the result must not be modified.
+        """
+
+        with self._lock:
+            future = self._pending.get(pulsing_params)
+
+            if future is None:
+                future = self.submit(self._acquire, pulsing_params)
+                self._pending[pulsing_params] = future
+
+        return future
+
+    def acquire(self, pulsing_params: PulsingParams) -> AveragedWaveform:
+        """Like submit_acquire, but blocks until the acquisition is done.
+
+        Args:
+            pulsing_params (PulsingParams): Parameters for pulsing.
+
+        Returns:
+            AveragedWaveform: The averaged waveform.
+        """
+        return self.submit_acquire(pulsing_params=pulsing_params).result()
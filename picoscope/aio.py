@@ -0,0 +1,190 @@
+"""Asyncio-native acquisition: awaits the device instead of blocking a thread on it.
+
+The SDK calls themselves are short and still run on the device's worker
+thread (see AcquisitionOwner), which doubles as the executor. Only the
+wait for a block to finish, by far the longest part of a pulse, happens
+on the event loop, so one loop can keep many devices busy and serve
+other requests in the meantime.
+
+Example:
+    acquirer = AsyncAcquirer(owner=device.owner)
+    waveform = await acquirer.acquire(pulsing_params=pulsing_params)
+"""
+
+import asyncio
+from functools import partial
+import time
+from typing import Any, Callable, Dict, List
+
+from picoscope import constants
+from picoscope.acquisition import AcquisitionOwner
+from picoscope.averaging import Accumulator, AveragedWaveform
+from picoscope.metrics import METRICS
+from picoscope.parameters import PulsingParams
+from picoscope.pulse import Pulse
+
+
+class AsyncAcquirer:
+    """Pulses through an AcquisitionOwner, awaiting readiness on the event loop.
+
+    Acquisitions by the same acquirer run one at a time; ones with
+    PulsingParams identical to one in flight share its result. Each holds a
+    lease on the owner for its whole duration (see AcquisitionOwner.lease).
+    Meant to be the only one acquiring with the owner, as blocking
+    acquisitions queued with it could otherwise run between the steps of an
+    async one.
+    """
+
+    def __init__(self, owner: AcquisitionOwner):
+        """
+        Args:
+            owner (AcquisitionOwner): Owner of the device to acquire with.
+        """
+
+        self.owner: AcquisitionOwner = owner
+
+        self._pulse: Pulse = Pulse(picoscope_=owner.picoscope_)
+        self._lock: asyncio.Lock = None  # Bound to the running loop on first use
+        self._pending: Dict[PulsingParams, asyncio.Future] = dict()
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Awaits fn, called on the owner's worker thread.
+
+        Returns:
+            Any: The return value of fn. Exceptions are re-raised.
+        """
+        return await asyncio.wrap_future(self.owner.submit(fn, *args, **kwargs))
+
+    async def wait_ready(self) -> float:
+        """Like Picoscope.wait_ready, w/o blocking the event loop.
+
+        Sleeps through the driver's time-indisposed estimate, then polls
+        every constants.AIO_POLL_INTERVAL_S.
+
+        Returns:
+            float: Time spent waiting [s], also stored as the picoscope's wait_s.
+        """
+
+        picoscope_ = self.owner.picoscope_
+        start = time.perf_counter()
+        remaining_s = await self.run(picoscope_.estimated_remaining_s)
+
+        if remaining_s > 0:
+            await asyncio.sleep(remaining_s)
+
+        while not await self.run(picoscope_.is_ready):
+            await asyncio.sleep(constants.AIO_POLL_INTERVAL_S)
+
+        picoscope_.wait_s = time.perf_counter() - start
+
+        return picoscope_.wait_s
+
+    async def _shot(self, get_data: Callable, while_capturing: Callable = None) -> None:
+        """Collects a block, a single waveform or all segments.
+
+        Args:
+            get_data (Callable): Transfers the block, e.g. Picoscope.get_data.
+            while_capturing (Callable, optional): Run on the worker thread
+                once the block is armed, e.g. to accumulate the previous
+                one. Defaults to None.
+        """
+
+        for fn in self._pulse.arming_fns:
+            with METRICS.timer(metric='stage', label=fn.__name__):
+                await self.run(fn)
+
+        if while_capturing is not None:
+            await self.run(while_capturing)
+
+        with METRICS.timer(metric='stage', label='wait_ready'):
+            await self.wait_ready()
+
+        for fn in [get_data, self.owner.picoscope_.stop]:
+            with METRICS.timer(metric='stage', label=fn.__name__):
+                await self.run(fn)
+
+    async def _acquire(self, pulsing_params: PulsingParams) -> AveragedWaveform:
+        """Connects if need be, prepares and pulses, as pulse.acquire, incl. rapid block and pipelining."""
+
+        picoscope_ = self.owner.picoscope_
+
+        with METRICS.timer(metric='stage', label='is_connected'):
+            if self.owner.check_connection:
+                is_connected = await self.run(lambda: picoscope_.is_connected)
+            else:
+                is_connected = picoscope_.was_connected
+
+        if not is_connected:
+            METRICS.increment('reconnects')
+            await self.run(picoscope_.connect)
+
+        await self.run(self._pulse.prepare, pulsing_params=pulsing_params)
+        accumulators: List[Accumulator] = await self.run(self._pulse.make_accumulators)
+        await self.run(picoscope_.set_buffers)
+        picoscope_.segment_index = 0
+
+        if picoscope_.rapid_block:
+            await self._shot(get_data=picoscope_.get_data_bulk)
+            await self.run(self._pulse.accumulate, accumulators=accumulators)
+        elif picoscope_.pipelined:
+            # As Pulse._pulse_pipelined: the previous shot is accumulated while the next one captures.
+            previous: int = None
+
+            for shot in range(picoscope_.avg_num):
+                picoscope_.segment_index = shot % picoscope_.n_segments
+                await self._shot(
+                    get_data=picoscope_.get_data,
+                    while_capturing=None if previous is None
+                    else partial(self._pulse.accumulate, accumulators=accumulators, segment=previous)
+                )
+                previous = picoscope_.segment_index
+
+            await self.run(self._pulse.accumulate, accumulators=accumulators, segment=previous)
+        else:
+            for _ in range(picoscope_.avg_num):
+                await self._shot(get_data=picoscope_.get_data)
+                await self.run(self._pulse.accumulate, accumulators=accumulators)
+
+        return await self.run(self._pulse.to_waveform, accumulators=accumulators)
+
+    async def _acquire_and_record(self, pulsing_params: PulsingParams) -> AveragedWaveform:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            timestamp = time.time()
+            start = time.perf_counter()
+
+            with self.owner.lease():  # So that the owner isn't taken to be idle between steps
+                waveform = await self._acquire(pulsing_params=pulsing_params)
+
+            self.owner.record(
+                pulsing_params=pulsing_params,
+                waveform=waveform,
+                timestamp=timestamp,
+                acquire_s=time.perf_counter() - start
+            )
+            self.owner.acquired_at = time.monotonic()
+
+            return waveform
+
+    async def acquire(self, pulsing_params: PulsingParams) -> AveragedWaveform:
+        """Acquires an averaged waveform, unless an identical acquisition is in flight.
+
+        Args:
+            pulsing_params (PulsingParams): Parameters for pulsing.
+
+        Returns:
+            AveragedWaveform: The averaged waveform. Shared between coalesced
+                requests, so it must not be modified.
+        """
+
+        future = self._pending.get(pulsing_params)
+
+        if future is None:
+            future = asyncio.ensure_future(self._acquire_and_record(pulsing_params=pulsing_params))
+            self._pending[pulsing_params] = future
+            future.add_done_callback(lambda _: self._pending.pop(pulsing_params, None))
+
+        # Shielded so that one client hanging up doesn't cancel it for the others.
+        return await asyncio.shield(future)
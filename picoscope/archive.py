@@ -0,0 +1,334 @@
+"""Append-only on-disk archive of acquisitions, read through memory maps.
+
+Layout of an archive directory:
+    index.bin: One INDEX_DTYPE record per waveform, appended in order. An
+        acquisition of several channels has one per channel, in the order
+        they were requested.
+    chunk_000000.npy, ...: Preallocated flat int16 arrays the waveforms
+        are packed into back to back.
+
+Waveforms are stored as int16 with a per-waveform scale (see quantize),
+i.e. at the size of raw data. Writes happen on a background thread so
+they never hold up acquisition, and reads only map the slices asked for.
+
+Example:
+    archive = Archive(directory='archive/')
+    archive.append(entry)
+    for record in archive.records(start=time.time() - 3600):
+        plt.plot(record.mean_mV)
+"""
+
+from dataclasses import asdict, dataclass
+import logging
+import numpy as np
+import os
+import queue
+import threading
+from typing import Dict, Iterator, List, Tuple, Union
+
+from picoscope import constants
+from picoscope.averaging import AveragedWaveform
+from picoscope.history import Entry
+from picoscope.parameters import PulsingParams
+
+INDEX_FILENAME: str = 'index.bin'
+CHUNK_FILENAME: str = 'chunk_{:06d}.npy'
+INDEX_DTYPE: np.dtype = np.dtype([
+    ('timestamp', '<f8'),
+    ('chunk', '<u4'),
+    ('offset', '<u8'),
+    ('length', '<u4'),
+    ('scale', '<f8'),  # mV per stored count
+    ('delay', '<f8'),
+    ('voltage_range', '<f8'),
+    ('duration', '<f8'),
+    ('avg_num', '<u4'),
+    ('std', '?'),
+    ('channels', 'S8'),  # All channels captured, as in PulsingParams
+    ('channel', 'S1'),  # The channel of this waveform
+    ('downsampling_mode', 'S16'),  # As in PulsingParams, e.g. b'average'
+    ('downsampling_ratio', '<u4'),
+    ('sampling_interval', '<f8'),  # After downsampling, 0 if unknown
+])
+INT16_MAX: int = np.iinfo(np.int16).max
+
+
+def quantize(waveform_mV: np.ndarray, mV_per_adc: float) -> Tuple[np.ndarray, float]:
+    """Converts an averaged waveform to int16 w/o losing the precision gained by averaging.
+
+    Raw data is stored as is, in ADC counts. Averaged waveforms have
+    fractional counts, so are stored in the finest power-of-two fraction of
+    a count that still fits int16.
+
+    Args:
+        waveform_mV (np.ndarray): The waveform [mV].
+        mV_per_adc (float): Conversion factor from ADC counts to mV.
+
+    Returns:
+        Tuple[np.ndarray, float]: The int16 waveform and mV per stored count.
+    """
+
+    adc = np.asarray(waveform_mV) / mV_per_adc
+    peak = np.max(np.abs(adc), initial=1.)
+    shift = max(int(np.floor(np.log2(INT16_MAX / peak))), 0)
+    scale = mV_per_adc / 2**shift
+
+    return np.clip(np.round(adc * 2**shift), -INT16_MAX, INT16_MAX).astype(np.int16), scale
+
+
+@dataclass
+class Record:
+    """A single archived waveform.
+
+    Attributes:
+        timestamp (float): Unix time at which collection started [s].
+        pulsing_params (PulsingParams): Parameters it was collected with.
+        scale (float): mV per stored count.
+        counts (np.ndarray): The stored waveform, int16. A read-only view
+            into the memory-mapped chunk, i.e. not loaded until accessed.
+        channel (str, optional): Letter of the channel, e.g. 'A'. Defaults
+            to the first of pulsing_params.channels.
+        sampling_interval (float, optional): Time between samples [s],
+            None if unknown.
+    """
+
+    timestamp: float
+    pulsing_params: PulsingParams
+    scale: float
+    counts: np.ndarray
+    channel: str = None
+    sampling_interval: float = None
+
+    def __post_init__(self):
+        if self.channel is None:
+            self.channel = self.pulsing_params.channels[0].upper()
+
+    @property
+    def mean_mV(self) -> np.ndarray:
+        """The averaged waveform [mV]."""
+        return self.counts * self.scale
+
+    def to_dict(self) -> Dict[str, Union[float, List[float], Dict[str, float]]]:
+        """Http-ready representation, with the waveform under the same key as /get_wave."""
+
+        return {
+            'amps': self.mean_mV.tolist(),
+            'channel': self.channel,
+            'pulsing_params': asdict(self.pulsing_params),
+            'sampling_interval': self.sampling_interval,
+            'timestamp': self.timestamp
+        }
+
+
+class Archive:
+    """Append-only archive of acquisitions in a directory, see module docstring.
+
+    Appending only queues the entry; a single writer thread does the
+    writing. Reopening an existing directory continues where it left off.
+    """
+
+    def __init__(self, directory: str, chunk_samples: int = constants.ARCHIVE_CHUNK_SAMPLES):
+        """
+        Args:
+            directory (str): Where to keep the archive. Created if need be.
+            chunk_samples (int, optional): No. of samples per chunk file.
+                Defaults to constants.ARCHIVE_CHUNK_SAMPLES.
+        """
+
+        self.directory: str = directory
+        self.chunk_samples: int = chunk_samples
+
+        os.makedirs(directory, exist_ok=True)
+        self._index_path: str = os.path.join(directory, INDEX_FILENAME)
+        self._write_chunks: Dict[int, np.memmap] = dict()
+        self._read_chunks: Dict[int, np.memmap] = dict()
+        self._read_lock: threading.Lock = threading.Lock()
+
+        # Where the next waveform goes.
+        index = self.index()
+        last = index[-1] if len(index) else None
+        self._chunk: int = int(last['chunk']) if last is not None else 0
+        self._offset: int = int(last['offset'] + last['length']) if last is not None else 0
+
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: threading.Thread = threading.Thread(target=self._write_forever, daemon=True)
+        self._writer.start()
+
+    def __len__(self) -> int:
+        return len(self.index())
+
+    def append(self, entry: Entry) -> None:
+        """Queues an acquisition to be archived. Returns immediately.
+
+        Args:
+            entry (Entry): The acquisition, as recorded to History.
+        """
+        self._queue.put(entry)
+
+    def flush(self) -> None:
+        """Blocks until all queued entries have been written."""
+        self._queue.join()
+
+    def _write_forever(self) -> None:
+        while True:
+            entry = self._queue.get()
+
+            try:
+                self._write(entry=entry)
+
+            except Exception:
+                # Losing a waveform from the archive beats stalling acquisition.
+                logging.exception('Failed to archive acquisition at %s', entry.timestamp)
+
+            finally:
+                self._queue.task_done()
+
+    def _chunk_path(self, chunk: int) -> str:
+        return os.path.join(self.directory, CHUNK_FILENAME.format(chunk))
+
+    def _write_chunk(self, chunk: int) -> np.memmap:
+        if chunk not in self._write_chunks:
+            path = self._chunk_path(chunk=chunk)
+
+            if os.path.isfile(path):
+                self._write_chunks[chunk] = np.lib.format.open_memmap(path, mode='r+')
+            else:
+                self._write_chunks[chunk] = np.lib.format.open_memmap(
+                    path, mode='w+', dtype=np.int16, shape=(self.chunk_samples, )
+                )
+
+        return self._write_chunks[chunk]
+
+    def _write(self, entry: Entry) -> None:
+        """Writes an acquisition, one waveform per channel."""
+
+        if len(entry.pulsing_params.channels.encode()) > INDEX_DTYPE['channels'].itemsize:
+            # Rather than truncated by the index, see utils.parse_channels.
+            raise ValueError(f'Invalid channels {entry.pulsing_params.channels}.')
+
+        waveforms: Dict[str, AveragedWaveform] = entry.waveform.channels \
+            or {entry.pulsing_params.channels[0].upper(): entry.waveform}
+
+        for channel, waveform in waveforms.items():
+            self._write_waveform(entry=entry, channel=channel, waveform=waveform)
+
+    def _write_waveform(self, entry: Entry, channel: str, waveform: AveragedWaveform) -> None:
+        counts, scale = quantize(waveform_mV=waveform.mean_mV, mV_per_adc=waveform.mV_per_adc)
+
+        if len(counts) > self.chunk_samples:
+            raise ValueError(f'Waveform of {len(counts)} samples exceeds chunk size of {self.chunk_samples}.')
+
+        if self._offset + len(counts) > self.chunk_samples:
+            # Done writing the current chunk, only readers need it from here on.
+            chunk = self._write_chunks.pop(self._chunk, None)
+
+            if chunk is not None:
+                chunk.flush()
+
+            self._chunk += 1
+            self._offset = 0
+
+        self._write_chunk(chunk=self._chunk)[self._offset:self._offset + len(counts)] = counts
+
+        record = np.zeros(1, dtype=INDEX_DTYPE)
+        record['timestamp'] = entry.timestamp
+        record['chunk'] = self._chunk
+        record['offset'] = self._offset
+        record['length'] = len(counts)
+        record['scale'] = scale
+        record['delay'] = entry.pulsing_params.delay
+        record['voltage_range'] = entry.pulsing_params.voltage_range
+        record['duration'] = entry.pulsing_params.duration
+        record['avg_num'] = entry.pulsing_params.avg_num
+        record['std'] = entry.pulsing_params.std
+        record['channels'] = entry.pulsing_params.channels.encode()
+        record['channel'] = channel.encode()
+        record['downsampling_mode'] = entry.pulsing_params.downsampling_mode.encode()
+        record['downsampling_ratio'] = entry.pulsing_params.downsampling_ratio
+        record['sampling_interval'] = waveform.sampling_interval or 0.
+
+        # Only after the data, so readers never see a record w/o its waveform.
+        with open(self._index_path, 'ab') as f:
+            f.write(record.tobytes())
+
+        self._offset += len(counts)
+
+    def index(self) -> np.ndarray:
+        """The index of all archived waveforms, oldest first.
+
+        Returns:
+            np.ndarray: Memory-mapped INDEX_DTYPE records.
+        """
+
+        size = os.path.getsize(self._index_path) if os.path.isfile(self._index_path) else 0
+        n_records = size // INDEX_DTYPE.itemsize
+
+        if n_records == 0:
+            return np.zeros(0, dtype=INDEX_DTYPE)
+
+        return np.memmap(self._index_path, dtype=INDEX_DTYPE, mode='r', shape=(n_records, ))
+
+    def _read_chunk(self, chunk: int) -> np.memmap:
+        with self._read_lock:
+            if chunk not in self._read_chunks:
+                self._read_chunks[chunk] = np.load(self._chunk_path(chunk=chunk), mmap_mode='r')
+
+            return self._read_chunks[chunk]
+
+    def between(self, start: float = -np.inf, end: float = np.inf) -> np.ndarray:
+        """Index records with timestamp in [start, end].
+
+        Args:
+            start (float, optional): Unix time [s]. Defaults to -inf.
+            end (float, optional): Unix time [s]. Defaults to inf.
+
+        Returns:
+            np.ndarray: Memory-mapped INDEX_DTYPE records, oldest first.
+        """
+
+        index = self.index()
+        # Appended in order of acquisition, so sorted by timestamp.
+        first = np.searchsorted(index['timestamp'], start, side='left')
+        last = np.searchsorted(index['timestamp'], end, side='right')
+
+        return index[first:last]
+
+    def record(self, index_record: np.void) -> Record:
+        """The waveform belonging to an index record, see index."""
+
+        counts = self._read_chunk(chunk=int(index_record['chunk']))
+        offset = int(index_record['offset'])
+
+        return Record(
+            timestamp=float(index_record['timestamp']),
+            pulsing_params=PulsingParams(
+                delay=float(index_record['delay']),
+                voltage_range=float(index_record['voltage_range']),
+                duration=float(index_record['duration']),
+                avg_num=int(index_record['avg_num']),
+                std=bool(index_record['std']),
+                channels=index_record['channels'].decode(),
+                downsampling_mode=index_record['downsampling_mode'].decode(),
+                downsampling_ratio=int(index_record['downsampling_ratio'])
+            ),
+            scale=float(index_record['scale']),
+            counts=counts[offset:offset + int(index_record['length'])],
+            channel=index_record['channel'].decode(),
+            sampling_interval=float(index_record['sampling_interval']) or None
+        )
+
+    def records(self, start: float = -np.inf, end: float = np.inf) -> Iterator[Record]:
+        """Archived waveforms with timestamp in [start, end], oldest first.
+
+        Lazy, so arbitrarily long ranges can be iterated through.
+
+        Args:
+            start (float, optional): Unix time [s]. Defaults to -inf.
+            end (float, optional): Unix time [s]. Defaults to inf.
+
+        Yields:
+            Record: The next waveform.
+        """
+
+        for index_record in self.between(start=start, end=end):
+            yield self.record(index_record=index_record)
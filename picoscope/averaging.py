@@ -0,0 +1,120 @@
+"""Averaging across waveforms in constant memory."""
+
+from dataclasses import dataclass
+import numpy as np
+from typing import Dict
+
+
+@dataclass
+class AveragedWaveform:
+    """The result of a pulse: the average across avg_num waveforms.
+
+    Attributes:
+        mean_mV (np.ndarray): The averaged waveform [mV].
+        mV_per_adc (float): Conversion factor from ADC counts to mV at
+            the voltage range the waveform was collected at.
+        avg_num (int): The number of waveforms averaged across.
+        std_mV (np.ndarray, optional): Per-sample (sample) standard deviation
+            across the waveforms [mV]. None unless it was asked for.
+        sampling_interval (float, optional): Time between samples [s], i.e.
+            after any downsampling. None if unknown.
+        channels (Dict[str, AveragedWaveform], optional): If several channels
+            were captured in the same shots, the waveform of each by channel
+            letter, incl. this one (that of the first channel). None otherwise.
+    """
+
+    mean_mV: np.ndarray
+    mV_per_adc: float
+    avg_num: int
+    std_mV: np.ndarray = None
+    sampling_interval: float = None
+    channels: Dict[str, 'AveragedWaveform'] = None
+
+
+class Accumulator:
+    """Running sum of raw amplitudes (in ADCs), optionally with variance.
+
+    Waveforms are added as they are collected, so memory doesn't grow
+    with the number of waveforms averaged across. The sum is kept as
+    int64 and thus exact; conversion to mV happens once, at the end.
+    The variance is updated with Welford's algorithm.
+
+    Example:
+        accumulator = Accumulator(n_samples=3000, keep_variance=True)
+        for adc in waveforms:
+            accumulator.add(adc)
+        waveform = accumulator.to_waveform(mV_per_adc=0.03)
+    """
+
+    def __init__(self, n_samples: int, keep_variance: bool = False):
+        """
+        Args:
+            n_samples (int): Number of samples per waveform.
+            keep_variance (bool, optional): Whether to keep track of the
+                per-sample variance. Defaults to False.
+        """
+
+        self.count: int = 0
+        self.keep_variance: bool = keep_variance
+
+        self._sum: np.ndarray = np.zeros(n_samples, dtype=np.int64)
+        self._mean: np.ndarray = np.zeros(n_samples) if keep_variance else None
+        self._m2: np.ndarray = np.zeros(n_samples) if keep_variance else None
+
+    def add(self, adc: np.ndarray) -> None:
+        """Adds waveforms to the running totals.
+
+        Args:
+            adc (np.ndarray): Raw amplitudes [ADC counts], either a single
+                waveform or one waveform per row.
+        """
+
+        adc = np.atleast_2d(adc)
+        self._sum += adc.sum(axis=0, dtype=np.int64)
+
+        if self.keep_variance:
+            for count, waveform in enumerate(adc, start=self.count + 1):
+                delta = waveform - self._mean
+                self._mean += delta / count
+                self._m2 += delta * (waveform - self._mean)
+
+        self.count += adc.shape[0]
+
+    @property
+    def mean(self) -> np.ndarray:
+        """Per-sample mean [ADC counts]."""
+        return self._sum / self.count
+
+    @property
+    def std(self) -> np.ndarray:
+        """Per-sample (sample) standard deviation [ADC counts], None if not kept."""
+
+        if not self.keep_variance:
+            return None
+
+        if self.count < 2:
+            return np.zeros_like(self._m2)
+
+        return np.sqrt(self._m2 / (self.count - 1))
+
+    def to_waveform(self, mV_per_adc: float, sampling_interval: float = None) -> AveragedWaveform:
+        """Scales the running totals to mV.
+
+        Args:
+            mV_per_adc (float): Conversion factor from ADC counts to mV.
+            sampling_interval (float, optional): Time between samples [s].
+                Defaults to None.
+
+        Returns:
+            AveragedWaveform: The averaged waveform.
+        """
+
+        std = self.std
+
+        return AveragedWaveform(
+            mean_mV=self.mean * mV_per_adc,
+            mV_per_adc=mV_per_adc,
+            avg_num=self.count,
+            std_mV=None if std is None else std * mV_per_adc,
+            sampling_interval=sampling_interval
+        )
@@ -0,0 +1,63 @@
+"""Capture buffers shared between python and the C driver."""
+
+import ctypes
+import numpy as np
+from typing import Tuple
+
+
+class CaptureBuffers:
+    """One contiguous int16 block with a row per channel and memory segment.
+
+    The block is only reallocated when its shape or channels change, i.e.
+    when n_samples, the number of segments or the channels change, so that
+    the same memory can be registered with the driver once and reused
+    across pulses.
+
+    Attributes:
+        block (np.ndarray): Raw amplitudes [ADC counts],
+            shape (n_channels, n_segments, n_samples).
+        channels (Tuple[int, ...]): Enumerated channel of each row of block.
+        is_registered (bool): Whether every row of block is currently
+            registered with the driver.
+    """
+
+    def __init__(self) -> None:
+        self.block: np.ndarray = np.zeros((0, 0, 0), dtype=np.int16)
+        self.channels: Tuple[int, ...] = ()
+        self.is_registered: bool = False
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.block.shape
+
+    def allocate(self, channels: Tuple[int, ...], n_segments: int, n_samples: int) -> None:
+        """(Re)allocates the block if, and only if, its shape or channels have changed.
+
+        Args:
+            channels (Tuple[int, ...]): Enumerated channels.
+            n_segments (int): Number of memory segments.
+            n_samples (int): Number of samples per segment.
+        """
+
+        if self.channels == channels and self.block.shape == (len(channels), n_segments, n_samples):
+            return
+
+        self.block = np.zeros((len(channels), n_segments, n_samples), dtype=np.int16)
+        self.channels = channels
+        self.is_registered = False
+
+    def c_pointer(self, channel: int, segment: int) -> ctypes.POINTER(ctypes.c_int16):
+        """Pointer to the row of block belonging to a channel and memory segment.
+
+        Args:
+            channel (int): The enumerated channel.
+            segment (int): The memory segment index.
+
+        Returns:
+            ctypes.POINTER(ctypes.c_int16): Pointer to be passed to SetDataBuffer.
+        """
+        return self.block[self.channels.index(channel), segment].ctypes.data_as(ctypes.POINTER(ctypes.c_int16))
+
+    def invalidate(self) -> None:
+        """Flags the block for re-registration, e.g. after (re)connecting."""
+        self.is_registered = False
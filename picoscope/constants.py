@@ -1,18 +1,52 @@
 import ctypes
+import os
 
 PORT: int = 5001
+AIO_PORT: int = 5002  # Port of the asyncio front end, see aio_app.py
+BACKEND: str = os.environ.get('PICOSCOPE_BACKEND', 'ps2000a')  # 'ps2000a' or 'simulated', see picoscope.BACKENDS
+SERIALS: list = [serial for serial in os.environ.get('PICOSCOPE_SERIALS', '').split(',') if serial]  # Units to open, all attached if empty
+SERIALS_BUFFER_LENGTH: int = 256  # Bytes for the comma-separated serial nos. of attached units
+STREAM_RATE: float = 1.  # Default repetition rate of /stream [Hz]
+STREAM_LATE_FRACTION: float = 0.1  # Frames starting later than this fraction of a period are late
+HISTORY_SIZE: int = 100  # No. of recent acquisitions kept in memory
+JOB_STORE_SIZE: int = 1000  # Max. no. of jobs kept, see jobs.JobStore
+JOB_TTL_S: float = 300.  # How long results of finished jobs are kept [s]
+SCHEDULE_BUFFER_SIZE: int = 1000  # No. of recent shots kept per schedule with a memory sink
+SCHEDULE_DIR: str = os.environ.get('PICOSCOPE_SCHEDULE_DIR', 'schedules')  # Where file sinks of schedules write to
+ARCHIVE_DIR: str = os.environ.get('PICOSCOPE_ARCHIVE_DIR')  # Where to archive acquisitions, None to not archive
+ARCHIVE_CHUNK_SAMPLES: int = 2**24  # Samples per archive chunk file, i.e. 32MB
+WARM_START: bool = os.environ.get('PICOSCOPE_WARM_START', '0') == '1'  # Connect, prepare and pulse once at startup
+WARM_START_PARAMS: dict = {'delay': 26, 'voltage_range': 1, 'duration': 8}  # PulsingParams to warm start with
+SUPERVISE: bool = os.environ.get('PICOSCOPE_SUPERVISE', '0') == '1'  # Heartbeat and reconnect in the background, see supervisor
+HEARTBEAT_INTERVAL_S: float = 5.  # Time between heartbeats of an idle device [s]
+RECONNECT_MAX_BACKOFF_S: float = 60.  # Max. time between attempts to reconnect [s]
 
 AVG_NUM: int = 1
+RAPID_BLOCK: bool = os.environ.get('PICOSCOPE_RAPID_BLOCK', '0') == '1'  # Collect all waveforms to be averaged in a single RunBlock
+SIG_GEN_FREQUENCY: float = float(os.environ.get('PICOSCOPE_SIG_GEN_FREQUENCY', 1E2))  # Pulses per second in rapid block mode [Hz]
+SIG_GEN_PK_TO_PK_UV: int = 2000000  # Amplitude of the square wave triggering the pulser [uV]
+SIG_GEN_OFFSET_UV: int = 0  # Offset of the square wave triggering the pulser [uV]
+PIPELINED: bool = False  # W/o rapid block, accumulate each waveform while the next is captured
+CHANNELS: str = 'B'  # Channels to capture, the first being the receiving transducer's
+N_CHANNELS: int = 2  # No. of input channels of the unit, 2 for the 2208B and 2207B
+DOWNSAMPLING_MODE: str = 'none'  # Default downsampling by the driver, see parameters.DownsamplingMode
+DOWNSAMPLING_RATIO: int = 1  # Default no. of samples per downsampled value
+PREVIEW_METHOD: str = 'minmax'  # Default display decimation, see decimation.METHODS
 SAMPLING_INTERVAL: float = 4E-9  # The selected sampling interval [s]
 MAX_SAMPLING_RATE: float = 1E9  # The fastest possible sampling rate [1GS/s]
+WAIT_STRATEGY: str = 'estimate'  # How to wait for a block to finish, see parameters.WaitStrategy
+POLL_INTERVAL_S: float = 1E-4  # Time between IsReady calls when polling [s]
+AIO_POLL_INTERVAL_S: float = 1E-3  # Time between IsReady calls when awaiting a block, see aio.AsyncAcquirer [s]
+ESTIMATE_FRACTION: float = 0.9  # Fraction of the driver's time estimate to sleep through
+COMPRESSION_LEVEL: int = 1  # zlib level of compressed waveforms, 1 is fastest
+TOF_THRESHOLD: float = 0.5  # Fraction of the envelope's peak that marks the time of flight
+PLAN_CACHE_SIZE: int = 32  # No. of distinct PulsingParams to keep acquisition plans for
+METRIC_BUCKETS_S: tuple = (1E-5, 1E-4, 1E-3, 5E-3, 1E-2, 5E-2, 1E-1, 5E-1, 1., 5.)  # Latency histogram bounds [s]
 
 C_OVERSAMPLE = ctypes.c_int16(0)  # Oversampling factor
-C_HANDLE = ctypes.c_int16()
-C_OVERFLOW = ctypes.c_int16()
-C_SERIAL: None = None
 
 US_TO_S: float = 1e-6
 COUPLING = IS_ENABLED = True
-EXT_IN_THRESHOLD = START_INDEX = DOWNSAMPLING_RATIO \
-    = DOWNSAMPLING_MODE = PRE_TRIGGER_SAMPLES = TIME_INDISPOSED_MS \
+EXT_IN_THRESHOLD = START_INDEX \
+    = PRE_TRIGGER_SAMPLES = TIME_INDISPOSED_MS \
     = LP_READY = P_PARAMETER = ANALOG_OFFSET = 0
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""Display decimation: picking a few hundred samples that still look like the waveform.
+
+Unlike downsampling on the device (see parameters.DownsamplingMode), this
+is only meant for plotting previews. Both methods keep the samples they
+pick as they are, so peaks survive, at the cost of an uneven time axis.
+
+Example:
+    indices = decimate(waveform.mean_mV, n_points=500, method='lttb')
+    plt.plot(times_us[indices], waveform.mean_mV[indices])
+"""
+
+import numpy as np
+from typing import Callable, Dict, List, Union
+
+from picoscope import constants
+from picoscope.averaging import AveragedWaveform
+
+
+def min_max(values: np.ndarray, n_points: int) -> np.ndarray:
+    """Indices of the minimum and maximum in each of n_points / 2 equal buckets.
+
+    Args:
+        values (np.ndarray): The waveform.
+        n_points (int): Max. no. of samples to keep.
+
+    Returns:
+        np.ndarray: Indices of the samples kept, ascending.
+    """
+
+    n_samples = len(values)
+    n_buckets = max(n_points // 2, 1)
+
+    if n_samples <= n_points:
+        return np.arange(n_samples)
+
+    bucket_size = -(-n_samples // n_buckets)
+    n_buckets = -(-n_samples // bucket_size)
+    # Padded with the last value, which argmin/max only pick if it's the first of its kind in the bucket.
+    buckets = np.pad(values, (0, n_buckets * bucket_size - n_samples), mode='edge').reshape(n_buckets, bucket_size)
+    offsets = np.arange(n_buckets) * bucket_size
+    indices = np.concatenate([offsets + np.argmin(buckets, axis=1), offsets + np.argmax(buckets, axis=1)])
+
+    return np.unique(np.minimum(indices, n_samples - 1))
+
+
+def lttb(values: np.ndarray, n_points: int) -> np.ndarray:
+    """Indices picked by Largest-Triangle-Three-Buckets, for evenly spaced samples.
+
+    Keeps the first and last sample, and from each bucket in between the
+    one spanning the largest triangle with the previous pick and the mean
+    of the next bucket.
+
+    Args:
+        values (np.ndarray): The waveform.
+        n_points (int): No. of samples to keep, at least 3.
+
+    Returns:
+        np.ndarray: Indices of the samples kept, ascending.
+    """
+
+    n_samples = len(values)
+
+    if n_samples <= n_points or n_points < 3:
+        return np.arange(n_samples)
+
+    edges = np.linspace(1, n_samples - 1, n_points - 1).astype(int)
+    indices = np.zeros(n_points, dtype=int)
+    indices[-1] = n_samples - 1
+
+    for bucket in range(n_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+
+        if bucket + 2 < len(edges):
+            next_x, next_y = (end + edges[bucket + 2] - 1) / 2, values[end:edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = n_samples - 1, values[-1]
+
+        previous = indices[bucket]
+        xs = np.arange(start, end)
+        areas = np.abs(
+            (previous - next_x) * (values[start:end] - values[previous])
+            - (previous - xs) * (next_y - values[previous])
+        )
+        indices[bucket + 1] = start + np.argmax(areas)
+
+    return indices
+
+
+METHODS: Dict[str, Callable[[np.ndarray, int], np.ndarray]] = {
+    'minmax': min_max,
+    'lttb': lttb
+}
+
+
+def decimate(values: np.ndarray, n_points: int, method: str = constants.PREVIEW_METHOD) -> np.ndarray:
+    """Indices of the samples to plot, see METHODS.
+
+    Args:
+        values (np.ndarray): The waveform.
+        n_points (int): Max. no. of samples to keep.
+        method (str, optional): One of METHODS. Defaults to constants.PREVIEW_METHOD.
+
+    Returns:
+        np.ndarray: Indices of the samples kept, ascending.
+    """
+
+    if method not in METHODS:
+        raise ValueError(f'Unknown preview method {method}, choose from {list(METHODS)}.')
+
+    if n_points < 1:
+        raise ValueError(f'A preview needs at least one point, got {n_points}.')
+
+    return METHODS[method](np.asarray(values), n_points)
+
+
+def preview_payload(
+    waveform: AveragedWaveform,
+    n_points: int,
+    delay_us: float,
+    method: str = constants.PREVIEW_METHOD,
+    key: str = 'amps'
+) -> Dict[str, Union[List[float], Dict]]:
+    """As utils.parse_payload, but decimated for display.
+
+    Args:
+        waveform (AveragedWaveform): The result of a pulse.
+        n_points (int): Max. no. of samples per channel.
+        delay_us (float): Time of the first sample after the trigger [us].
+        method (str, optional): One of METHODS. Defaults to constants.PREVIEW_METHOD.
+        key (str, optional): Key of the amplitudes. Defaults to 'amps'.
+
+    Returns:
+        Dict[str, Union[List[float], Dict]]: The samples kept under _key_ and
+            their times [us] under 'times_us', per channel under 'channels'
+            if several were captured.
+    """
+
+    indices = decimate(values=waveform.mean_mV, n_points=n_points, method=method)
+    payload = {
+        key: waveform.mean_mV[indices].tolist(),
+        'times_us': (delay_us + indices * waveform.sampling_interval / constants.US_TO_S).tolist()
+    }
+
+    if waveform.channels is not None:
+        payload['channels'] = {
+            letter: preview_payload(
+                waveform=waveform_,
+                n_points=n_points,
+                delay_us=delay_us,
+                method=method,
+                key=key
+            )
+            for letter, waveform_ in waveform.channels.items()
+        }
+
+    return payload
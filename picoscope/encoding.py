@@ -0,0 +1,164 @@
+"""Binary encodings of waveforms for http responses.
+
+JSON (see utils.parse_payload) remains the default; these are opted into
+by clients through the Accept header.
+
+DELTA_ZLIB is the most compact: the waveform as integer codes (i.e.
+multiples of X-Scale), delta encoded and then zlib compressed. Decode with
+    np.cumsum(np.frombuffer(zlib.decompress(body), dtype=headers['X-Dtype'])) * float(headers['X-Scale'])
+"""
+
+import io
+import numpy as np
+from typing import Dict, List, Tuple, Union
+import zlib
+
+from picoscope import constants
+from picoscope.archive import quantize
+
+JSON: str = 'application/json'
+FLOAT32: str = 'application/octet-stream'  # Raw little-endian float32 [mV]
+INT16: str = 'application/x-int16'  # Raw little-endian int16 [fractions of an ADC count]
+NPY: str = 'application/x-npy'  # .npy file of float32 [mV]
+DELTA_ZLIB: str = 'application/x-delta-zlib'  # zlib compressed deltas of integer codes
+MIMETYPES: Tuple[str, ...] = (JSON, FLOAT32, INT16, NPY, DELTA_ZLIB)  # In order of preference
+BATCH_MIMETYPES: Tuple[str, ...] = (JSON, FLOAT32)
+
+
+def delta_compress(codes: np.ndarray) -> Tuple[bytes, np.dtype]:
+    """Delta encodes integer codes, then compresses them.
+
+    The deltas are stored in the smallest integer type they fit in;
+    neighbouring samples differ little, so that's usually int8 or int16.
+
+    Args:
+        codes (np.ndarray): Integer codes, flattened if multidimensional.
+
+    Returns:
+        Tuple[bytes, np.dtype]: Compressed body and the dtype of the deltas.
+    """
+
+    deltas = np.diff(codes.ravel(), prepend=0)
+    extreme = int(np.max(np.abs(deltas), initial=0))
+    dtype = next(
+        np.dtype(dtype_).newbyteorder('<') for dtype_ in (np.int8, np.int16, np.int32, np.int64)
+        if extreme <= np.iinfo(dtype_).max
+    )
+
+    return zlib.compress(deltas.astype(dtype).tobytes(), constants.COMPRESSION_LEVEL), dtype
+
+
+def delta_decompress(body: bytes, dtype: str) -> np.ndarray:
+    """Inverse of delta_compress.
+
+    Args:
+        body (bytes): Compressed body.
+        dtype (str): The dtype of the deltas, i.e. X-Dtype.
+
+    Returns:
+        np.ndarray: The integer codes, int64, flattened (see X-Shape).
+    """
+    return np.cumsum(np.frombuffer(zlib.decompress(body), dtype=dtype), dtype=np.int64)
+
+
+def encode_waveform(
+    waveform_mV: np.ndarray,
+    mimetype: str,
+    mV_per_adc: float,
+    sampling_interval: float,
+    avg_num: int = 1,
+    precision: float = None
+) -> Tuple[bytes, Dict[str, str]]:
+    """Encodes a waveform to a compact binary body.
+
+    The headers describe how to decode the body: multiply the values by
+    X-Scale to get mV. For DELTA_ZLIB decompress them first, see
+    delta_decompress.
+
+    Args:
+        waveform_mV (np.ndarray): The (averaged) waveform [mV], or one
+            per row, e.g. per channel.
+        mimetype (str): One of the binary MIMETYPES.
+        mV_per_adc (float): mV per ADC count of the channel the waveform
+            was collected on. Only used for INT16 and DELTA_ZLIB. INT16 is
+            in the finest power-of-two fraction of it that fits, see
+            archive.quantize, so as to keep the precision gained by averaging.
+        sampling_interval (float): Time between samples [s].
+        avg_num (int, optional): No. of waveforms averaged across. Only
+            used for DELTA_ZLIB. Defaults to 1.
+        precision (float, optional): Step to quantize to for DELTA_ZLIB [mV].
+            Defaults to None, i.e. mV_per_adc / avg_num, at which the
+            average of whole ADC counts is represented exactly.
+
+    Returns:
+        Tuple[bytes, Dict[str, str]]: Body and headers.
+    """
+
+    if mimetype == INT16:
+        values, scale = quantize(waveform_mV=waveform_mV, mV_per_adc=mV_per_adc)
+        values = values.astype('<i2')
+    elif mimetype == DELTA_ZLIB:
+        scale = precision or mV_per_adc / avg_num
+        values = np.round(waveform_mV / scale).astype(np.int64)
+    else:
+        values = waveform_mV.astype('<f4')
+        scale = 1.
+
+    dtype = values.dtype
+
+    if mimetype == NPY:
+        file_ = io.BytesIO()
+        np.save(file_, values, allow_pickle=False)
+        body = file_.getvalue()
+    elif mimetype == DELTA_ZLIB:
+        body, dtype = delta_compress(codes=values)
+    else:
+        body = values.tobytes()
+
+    headers = {
+        'Content-Type': mimetype,
+        'X-Dtype': dtype.str,
+        'X-Shape': ','.join(str(dim) for dim in values.shape),
+        'X-Scale': str(float(scale)),
+        'X-Sampling-Interval': str(float(sampling_interval))
+    }
+
+    return body, headers
+
+
+def encode_waveforms(
+    waveforms_mV: List[np.ndarray],
+    sampling_interval: Union[float, List[float]]
+) -> Tuple[bytes, Dict[str, str]]:
+    """Packs several waveforms, possibly of different lengths, into one FLOAT32 body.
+
+    The waveforms are concatenated, those of several channels row by row;
+    X-Lengths holds the no. of values of each, and X-Channel-Counts its no.
+    of channels (rows).
+
+    Args:
+        waveforms_mV (List[np.ndarray]): The (averaged) waveforms [mV],
+            each with one row per channel if several were captured.
+        sampling_interval (Union[float, List[float]]): Time between samples [s],
+            either shared or per waveform, e.g. if downsampled differently.
+            X-Sampling-Interval is comma-separated in the latter case.
+
+    Returns:
+        Tuple[bytes, Dict[str, str]]: Body and headers.
+    """
+
+    values = np.concatenate([np.ravel(waveform) for waveform in waveforms_mV]).astype('<f4')
+    sampling_intervals = [sampling_interval] if np.isscalar(sampling_interval) else sampling_interval
+
+    headers = {
+        'Content-Type': FLOAT32,
+        'X-Dtype': values.dtype.str,
+        'X-Lengths': ','.join(str(waveform.size) for waveform in waveforms_mV),
+        'X-Channel-Counts': ','.join(
+            str(waveform.shape[0] if waveform.ndim > 1 else 1) for waveform in waveforms_mV
+        ),
+        'X-Scale': str(1.),
+        'X-Sampling-Interval': ','.join(str(float(interval)) for interval in sampling_intervals)
+    }
+
+    return values.tobytes(), headers
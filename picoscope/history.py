@@ -0,0 +1,92 @@
+"""Bounded in-memory history of recent acquisitions."""
+
+from collections import deque
+from dataclasses import asdict, dataclass
+import numpy as np
+import threading
+from typing import Deque, Dict, List, Union
+
+from picoscope import constants
+from picoscope.averaging import AveragedWaveform
+from picoscope.parameters import PulsingParams
+from picoscope.utils import parse_payload
+
+
+@dataclass
+class Entry:
+    """A single acquisition.
+
+    Attributes:
+        waveform (AveragedWaveform): The averaged waveform.
+        pulsing_params (PulsingParams): Parameters it was collected with.
+        timestamp (float): Unix time at which collection started [s].
+        timings (Dict[str, float]): Durations of the stages of the
+            acquisition, e.g. 'acquire_s' [s].
+    """
+
+    waveform: AveragedWaveform
+    pulsing_params: PulsingParams
+    timestamp: float
+    timings: Dict[str, float]
+
+    def to_dict(self) -> Dict[str, Union[float, List[float], Dict[str, float]]]:
+        """Http-ready representation, with the waveform under the same keys as /get_wave."""
+
+        return {
+            **parse_payload(waveform=self.waveform),
+            'pulsing_params': asdict(self.pulsing_params),
+            'timestamp': self.timestamp,
+            'timings': self.timings
+        }
+
+
+class History:
+    """Ring buffer of the last _maxlen_ acquisitions, oldest first.
+
+    Lets viewers read recent results without pulsing. Thread safe.
+    """
+
+    def __init__(self, maxlen: int = constants.HISTORY_SIZE):
+        """
+        Args:
+            maxlen (int, optional): Number of entries to keep.
+                Defaults to constants.HISTORY_SIZE.
+        """
+
+        self._entries: Deque[Entry] = deque(maxlen=maxlen)
+        self._lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def append(self, entry: Entry) -> None:
+        """Adds an entry, dropping the oldest one if full."""
+
+        with self._lock:
+            self._entries.append(entry)
+
+    def latest(self) -> Entry:
+        """The most recent entry.
+
+        Returns:
+            Entry: The most recent entry, None if there are none.
+        """
+
+        with self._lock:
+            return self._entries[-1] if self._entries else None
+
+    def between(self, start: float = -np.inf, end: float = np.inf) -> List[Entry]:
+        """Entries with timestamp in [start, end], oldest first.
+
+        Args:
+            start (float, optional): Unix time [s]. Defaults to -inf.
+            end (float, optional): Unix time [s]. Defaults to inf.
+
+        Returns:
+            List[Entry]: The matching entries.
+        """
+
+        with self._lock:
+            entries = list(self._entries)
+
+        return [entry for entry in entries if start <= entry.timestamp <= end]
@@ -0,0 +1,197 @@
+"""Acquisitions as jobs: submitted now, fetched later by ID.
+
+Lets clients queue acquisitions w/o holding a connection open while the
+device pulses. Results are kept for a limited time in a bounded store.
+
+Example:
+    jobs = JobStore()
+    job = jobs.submit(owner=device.owner, device_id=device.id, pulsing_params=pulsing_params)
+    ...
+    job = jobs.get(job.id)
+    if job.status == JobStatus.DONE:
+        waveform = job.result()
+"""
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass
+from enum import Enum
+import threading
+import time
+from typing import Dict, Tuple, Union
+import uuid
+
+from picoscope import constants
+from picoscope.acquisition import AcquisitionOwner
+from picoscope.averaging import AveragedWaveform
+from picoscope.parameters import PulsingParams
+from picoscope.processing import ProcessingParams
+
+
+class JobStatus(Enum):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+@dataclass
+class Job:
+    """A single acquisition, queued with a device's AcquisitionOwner.
+
+    Attributes:
+        id (str): Identifies the job in requests.
+        device_id (str): The device it was submitted to.
+        pulsing_params (PulsingParams): Parameters for pulsing.
+        future (Future): Resolves to the AveragedWaveform.
+        submitted_at (float): Unix time at which it was submitted [s].
+        processing_params (ProcessingParams, optional): Features to return
+            instead of, or along with, the waveform. None for the waveform only.
+        preview (Tuple[int, str], optional): No. of points and method to
+            decimate the waveform to for display. None for every sample.
+        finished_at (float, optional): time.monotonic() at which it finished,
+            None until then. Used for expiry only.
+    """
+
+    id: str
+    device_id: str
+    pulsing_params: PulsingParams
+    future: Future
+    submitted_at: float
+    processing_params: ProcessingParams = None
+    preview: Tuple[int, str] = None
+    finished_at: float = None
+
+    @property
+    def status(self) -> JobStatus:
+        if self.future.done():
+            return JobStatus.FAILED if self.future.exception() is not None else JobStatus.DONE
+
+        return JobStatus.RUNNING if self.future.running() else JobStatus.QUEUED
+
+    def result(self) -> AveragedWaveform:
+        """The averaged waveform. Blocks until done, re-raises if failed."""
+        return self.future.result()
+
+    def to_dict(self) -> Dict[str, Union[str, float, Dict]]:
+        """Http-ready status, w/o the result."""
+
+        dict_ = {
+            'job': self.id,
+            'device': self.device_id,
+            'status': self.status.value,
+            'submitted_at': self.submitted_at,
+            'pulsing_params': asdict(self.pulsing_params)
+        }
+
+        if self.status == JobStatus.FAILED:
+            dict_['error'] = str(self.future.exception())
+
+        return dict_
+
+
+class JobStore:
+    """Jobs by ID, each kept until ttl_s after it finished. Thread safe.
+
+    Holds at most max_jobs; beyond that the oldest are dropped, finished
+    ones first. Dropping a job only forgets it, it's still acquired.
+    """
+
+    def __init__(self, max_jobs: int = constants.JOB_STORE_SIZE, ttl_s: float = constants.JOB_TTL_S):
+        """
+        Args:
+            max_jobs (int, optional): Max. no. of jobs kept. Defaults to
+                constants.JOB_STORE_SIZE.
+            ttl_s (float, optional): How long results are kept after the job
+                finished [s]. Defaults to constants.JOB_TTL_S.
+        """
+
+        self.max_jobs: int = max_jobs
+        self.ttl_s: float = ttl_s
+
+        self._jobs: OrderedDict = OrderedDict()  # By ID, oldest first
+        self._lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire()
+
+            return len(self._jobs)
+
+    def submit(self, owner: AcquisitionOwner, device_id: str, pulsing_params: PulsingParams, **kwargs) -> Job:
+        """Queues an acquisition and returns immediately.
+
+        Args:
+            owner (AcquisitionOwner): Owner of the device to acquire with.
+            device_id (str): ID of the device.
+            pulsing_params (PulsingParams): Parameters for pulsing.
+            **kwargs: Other Job fields, i.e. processing_params and preview.
+
+        Returns:
+            Job: The job, queued.
+        """
+
+        job = Job(
+            id=uuid.uuid4().hex,
+            device_id=device_id,
+            pulsing_params=pulsing_params,
+            future=owner.submit_acquire(pulsing_params=pulsing_params),
+            submitted_at=time.time(),
+            **kwargs
+        )
+
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+            self._evict()
+
+        # Called right away if it's already done, e.g. coalesced with one that just finished.
+        job.future.add_done_callback(lambda _: setattr(job, 'finished_at', time.monotonic()))
+
+        return job
+
+    def get(self, job_id: str) -> Job:
+        """A job by ID.
+
+        Args:
+            job_id (str): As returned by submit.
+
+        Returns:
+            Job: The job. Raises KeyError if there's none by that ID, or it has expired.
+        """
+
+        with self._lock:
+            self._expire()
+
+            return self._jobs[job_id]
+
+    def pop(self, job_id: str) -> Job:
+        """Like get, but forgets the job."""
+
+        with self._lock:
+            self._expire()
+
+            return self._jobs.pop(job_id)
+
+    def _expire(self) -> None:
+        """Drops jobs that finished more than ttl_s ago. Expects the lock to be held."""
+
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.ttl_s
+        ]
+
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _evict(self) -> None:
+        """Drops the oldest jobs beyond max_jobs, finished ones first. Expects the lock to be held."""
+
+        finished = [job_id for job_id, job in self._jobs.items() if job.future.done()]
+
+        for job_id in finished[:max(len(self._jobs) - self.max_jobs, 0)]:
+            del self._jobs[job_id]
+
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
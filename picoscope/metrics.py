@@ -0,0 +1,183 @@
+"""Latency histograms and counters, exposed in Prometheus text format.
+
+Cheap enough to leave on: recording is two perf_counter calls, a bisect
+and a locked increment.
+
+Example:
+    with METRICS.timer(metric='stage', label='prepare'):
+        pulse_.prepare(pulsing_params=pulsing_params)
+
+    METRICS.increment('acquisitions')
+    text = METRICS.render()
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from picoscope import constants
+
+PREFIX: str = 'picoscope'
+
+# Name of the label per histogram, and a description of each.
+HISTOGRAMS: Dict[str, Tuple[str, str]] = {
+    'stage': ('stage', 'Time spent per stage of handling a request [s].'),
+    'sdk_call': ('function', 'Time spent per call to the picoscope driver [s].')
+}
+COUNTERS: Dict[str, str] = {
+    'acquisitions': 'Averaged waveforms acquired.',
+    'shots': 'Individual waveforms collected, i.e. acquisitions times avg_num.',
+    'connects': 'Calls to Picoscope.connect.',
+    'reconnects': 'Connections made by an acquisition because the picoscope was not connected.',
+    'supervisor_reconnects': 'Connections restored by the connection supervisor.',
+    'overflows': 'Waveforms that exceeded the voltage range.'
+}
+
+
+class Histogram:
+    """Cumulative latency histogram, as in Prometheus.
+
+    Attributes:
+        buckets (Tuple[float, ...]): Upper bounds of the buckets [s], ascending.
+        counts (List[int]): No. of observations per bucket, not cumulative,
+            plus one for those above the last bound.
+        sum (float): Sum of all observations [s].
+        count (int): No. of observations.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets: Tuple[float, ...] = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.sum: float = 0.
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Prometheus' le-labelled bucket counts, incl. '+Inf'."""
+
+        bounds = [repr(float(bound)) for bound in self.buckets] + ['+Inf']
+        totals, total = [], 0
+
+        for count in self.counts:
+            total += count
+            totals.append(total)
+
+        return list(zip(bounds, totals))
+
+
+class Metrics:
+    """Thread-safe registry of latency histograms and counters."""
+
+    def __init__(self, buckets: Tuple[float, ...] = constants.METRIC_BUCKETS_S):
+        """
+        Args:
+            buckets (Tuple[float, ...], optional): Upper bounds of the histogram
+                buckets [s]. Defaults to constants.METRIC_BUCKETS_S.
+        """
+
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+
+        self._lock: threading.Lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], Histogram] = dict()
+        self._counters: Dict[str, int] = {name: 0 for name in COUNTERS}
+
+    def observe(self, metric: str, label: str, seconds: float) -> None:
+        """Records a latency.
+
+        Args:
+            metric (str): One of HISTOGRAMS.
+            label (str): E.g. the stage or SDK function.
+            seconds (float): The latency [s].
+        """
+
+        with self._lock:
+            histogram = self._histograms.get((metric, label))
+
+            if histogram is None:
+                histogram = self._histograms[(metric, label)] = Histogram(buckets=self.buckets)
+
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, metric: str, label: str) -> Iterator[None]:
+        """Records how long the body of a with-statement takes, see observe."""
+
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(metric=metric, label=label, seconds=time.perf_counter() - start)
+
+    def timed(self, metric: str, label: str, fn: Callable) -> Callable:
+        """Wraps fn so that every call to it is recorded, see observe."""
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.observe(metric=metric, label=label, seconds=time.perf_counter() - start)
+
+        return wrapper
+
+    def increment(self, counter: str, n: int = 1) -> None:
+        """Adds n to one of COUNTERS."""
+
+        with self._lock:
+            self._counters[counter] += n
+
+    def count(self, counter: str) -> int:
+        return self._counters[counter]
+
+    def histogram(self, metric: str, label: str) -> Histogram:
+        """The histogram of a metric and label, None if nothing's been observed."""
+        return self._histograms.get((metric, label))
+
+    def render(self) -> str:
+        """All metrics in Prometheus' text exposition format.
+
+        Returns:
+            str: The /metrics page.
+        """
+
+        lines: List[str] = []
+
+        with self._lock:
+            for metric, (label_name, description) in HISTOGRAMS.items():
+                name = f'{PREFIX}_{metric}_seconds'
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+
+                for (metric_, label), histogram in sorted(self._histograms.items()):
+                    if metric_ != metric:
+                        continue
+
+                    labels = f'{label_name}="{label}"'
+                    lines += [
+                        f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+                        for bound, count in histogram.cumulative()
+                    ]
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum!r}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+            for counter, description in COUNTERS.items():
+                name = f'{PREFIX}_{counter}_total'
+                lines += [
+                    f'# HELP {name} {description}',
+                    f'# TYPE {name} counter',
+                    f'{name} {self._counters[counter]}'
+                ]
+
+        return '\n'.join(lines) + '\n'
+
+
+METRICS: Metrics = Metrics()  # Shared by the whole process, rendered on /metrics
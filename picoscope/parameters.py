@@ -16,6 +16,17 @@ def builtin_voltage_ranges() -> np.ndarray:
     return np.asarray([2e-2, 5e-2, 1e-1, 2e-1, 5e-1, 1., 2., 5., 10., 20.])
 
 
+def channel_input_ranges_mV() -> np.ndarray:
+    """Maps enumerated voltage range to the corresponding full scale [mV].
+
+    Same lookup as picosdk.functions.adc2mV.
+
+    Returns:
+        np.ndarray: Full scale of each enumerated voltage range.
+    """
+    return np.asarray([10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000])
+
+
 def available_sampling_intervals() -> np.ndarray:
     """For mapping raw sampling intervals (seconds) to enumerated sampling intervals.
 
@@ -41,6 +52,18 @@ class Channel(AutoEnum):
     D = auto()
 
 
+class WaveType(AutoEnum):
+    SINE = auto()
+    SQUARE = auto()
+    TRIANGLE = auto()
+    RAMP_UP = auto()
+    RAMP_DOWN = auto()
+    SINC = auto()
+    GAUSSIAN = auto()
+    HALF_SINE = auto()
+    DC_VOLTAGE = auto()
+
+
 class SweepType(AutoEnum):
     UP = auto()
     DOWN = auto()
@@ -70,17 +93,43 @@ class TriggerType(AutoEnum):
     TRIG_TYPE = auto()
 
 
-class WaveType(Enum):
-    SINE = 0
-    SQUARE = 1
-    DC_VOLTAGE = 3
+class WaitStrategy(Enum):
+    """How Picoscope.wait_ready waits for a block to finish.
+
+    SPIN: Calls IsReady back to back. Lowest latency, pins a core.
+    POLL: Calls IsReady every constants.POLL_INTERVAL_S.
+    ESTIMATE: Sleeps through most of the driver's time-indisposed
+        estimate returned by RunBlock, then polls.
+    CALLBACK: Sleeps until the driver's block-ready callback fires.
+    """
 
+    SPIN = 'spin'
+    POLL = 'poll'
+    ESTIMATE = 'estimate'
+    CALLBACK = 'callback'
 
-@dataclass
+
+class DownsamplingMode(Enum):
+    """How GetValues downsamples before transferring, refer to programmer's guide.
+
+    NONE: Every sample.
+    DECIMATE: Every downsampling_ratio-th sample.
+    AVERAGE: The mean of every downsampling_ratio samples, which also
+        lowers the noise.
+    """
+
+    NONE = 0
+    DECIMATE = 2
+    AVERAGE = 4
+
+
+@dataclass(frozen=True)
 class PulsingParams:
     """All the params that should should be passed
     to a pulsing picoscope, no more, no less.
 
+    Frozen so that it can be used as a cache key.
+
     All other parameters are lower-level and thus not be tinkered
     with on the fly, but rather by ssh-ing into the container.
 
@@ -89,11 +138,29 @@ class PulsingParams:
             and starting collecting data [us].
         voltage_range (int): A proxy for gain of receiving transducer [V].
         duration (int): Duration of which data is collected [us].
+        avg_num (int, optional): The number of waveforms to average across.
+            Defaults to constants.AVG_NUM.
+        std (bool, optional): Whether to also return the per-sample standard
+            deviation across the averaged waveforms. Defaults to False.
+        channels (str, optional): Letters of the channels to capture in the
+            same shot, e.g. 'BA'. The first is the receiving transducer's,
+            all share voltage_range. Defaults to constants.CHANNELS.
+        downsampling_mode (str, optional): How the device downsamples
+            before transferring, see DownsamplingMode, e.g. 'average'.
+            Defaults to constants.DOWNSAMPLING_MODE.
+        downsampling_ratio (int, optional): No. of samples per downsampled
+            value. Ignored if not downsampling. Defaults to
+            constants.DOWNSAMPLING_RATIO.
     """
 
     delay: int
     voltage_range: int
     duration: int
+    avg_num: int = constants.AVG_NUM
+    std: bool = False
+    channels: str = constants.CHANNELS
+    downsampling_mode: str = constants.DOWNSAMPLING_MODE
+    downsampling_ratio: int = constants.DOWNSAMPLING_RATIO
 
 
 @dataclass
@@ -1,13 +1,20 @@
 """Bindings for C driver functions for interfacing with picoscope."""
 
 import ctypes
-from typing import Callable, Dict, List
+from dataclasses import replace
+import numpy as np
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
 
 from picosdk.errors import PicoSDKCtypesError
-from picosdk.functions import adc2mV, assert_pico_ok
-from picosdk.ps2000a import ps2000a
+from picosdk.functions import assert_pico_ok
 
 from picoscope import constants, parameters, utils
+from picoscope.buffers import CaptureBuffers
+from picoscope.metrics import METRICS
+from picoscope.plan import AcquisitionPlan, n_samples_from_duration
+from picoscope.simulator import SimulatedPs2000a, SimulationProperties
 
 
 class Picoscope:
@@ -18,15 +25,30 @@ class Picoscope:
 
     Attributes:
         avg_num (int): The number of waveforms to average across for each pulse.
+        rapid_block (bool): Whether to collect all avg_num waveforms in a single
+            RunBlock (rapid block mode) rather than one RunBlock per waveform.
+            Reprograms the signal generator, see set_sig_gen.
+        pipelined (bool): W/o rapid block, whether to alternate between two
+            memory segments so that each waveform can be processed while
+            the next is captured, see pulse.Pulse.
         input_channel (Channel): The channel to which the _receiving_
-            transducer is connected. Defaults to Channel.B. 
+            transducer is connected. Defaults to Channel.B. Captured
+            alone until a plan sets channels.
         signal_properties (SignalProperties): The signal configuration parameters.
             Are generally not modified between experiments.
         sampling_interval (float): The desired sampling interval.
             Defaults to 2E-9 (equal to 500MS/s sampling rate). 
+        wait_strategy (WaitStrategy): How to wait for data collection to finish.
+            Defaults to constants.WAIT_STRATEGY.
+        wait_s (float): How long the last call to wait_ready waited [s].
+        serial (str): Serial no. of the unit to open, e.g. 'JO123/0456'.
+            None opens the first unit found.
     """
 
     avg_num: int = constants.AVG_NUM
+    rapid_block: bool = constants.RAPID_BLOCK
+    pipelined: bool = constants.PIPELINED
+    wait_strategy: parameters.WaitStrategy = parameters.WaitStrategy(constants.WAIT_STRATEGY)
     sampling_interval: float = constants.SAMPLING_INTERVAL
     input_channel: int = parameters.Channel.B.value
     enum_sampling_interval: int = utils.to_enum(
@@ -34,34 +56,72 @@ class Picoscope:
         arr_fn=parameters.available_sampling_intervals
     )
 
-    def __init__(self, fns: Dict[str, Callable]) -> None:
+    def __init__(self, fns: Dict[str, Callable], serial: str = None) -> None:
         """
         Args:
             fns (Dict[str, Callable]): Mapping of a readable name to SDK functions.
+            serial (str, optional): Serial no. of the unit to open.
+                Defaults to None, i.e. the first unit found.
         """
 
+        # Every SDK call is timed, see metrics. BlockReady is a type, not a call.
+        fns = {
+            name: fn if name == 'BlockReady' else METRICS.timed(metric='sdk_call', label=name, fn=fn)
+            for name, fn in fns.items()
+        }
+
         self.OpenUnit: Callable = fns['OpenUnit']
         self.SetChannel: Callable = fns['SetChannel']
         self.GetTimebase2: Callable = fns['GetTimebase2']
         self.SetSimpleTrigger: Callable = fns['SetSimpleTrigger']
         self.RunBlock: Callable = fns['RunBlock']
         self.SigGenSoftwareControl: Callable = fns['SigGenSoftwareControl']
+        self.SetSigGenBuiltIn: Callable = fns['SetSigGenBuiltIn']
         self.IsReady: Callable = fns['IsReady']
         self.SetDataBuffer: Callable = fns['SetDataBuffer']
         self.GetValues: Callable = fns['GetValues']
+        self.GetValuesBulk: Callable = fns['GetValuesBulk']
         self.Stop: Callable = fns['Stop']
         self.CloseUnit: Callable = fns['CloseUnit']
         self.GetAnalogueOffset: Callable = fns['GetAnalogueOffset']
         self.SetNoOfCaptures: Callable = fns['SetNoOfCaptures']
         self.MemorySegments: Callable = fns['MemorySegments']
         self.PingUnit: Callable = fns['PingUnit']
+        self.MaximumValue: Callable = fns['MaximumValue']
+        self.BlockReady: Callable = fns['BlockReady']
+        self.EnumerateUnits: Callable = fns['EnumerateUnits']
+
+        # Per instance, so that several units can be open at once.
+        self.serial: str = serial
+        self._c_serial: ctypes.c_char_p = ctypes.c_char_p(serial.encode()) if serial else None
+        self._c_handle: ctypes.c_int16 = ctypes.c_int16()
+        self._c_overflow: ctypes.c_int16 = ctypes.c_int16()
 
         self._n_samples: int = None
         self._is_connected: bool = False
-        self._c_buffer: ctypes.Array = None
+        self._buffers: CaptureBuffers = CaptureBuffers()
+        self._c_overflows: ctypes.Array = None
         self._enum_voltage_range: int = None
+        self._max_adc: int = None
         self._segment_index: int = 0  # Not None bc it's called during pulse preparation.
+        self._channels: Tuple[int, ...] = (Picoscope.input_channel, )
+        self._downsampling_mode: int = parameters.DownsamplingMode.NONE.value
+        self._downsampling_ratio: int = 1
         self._trigger_properties: parameters.TriggerProperties = parameters.TriggerProperties()
+        self._programmed: Dict[str, tuple] = dict()  # Settings currently on the device
+
+        self.wait_s: float = None
+        self._c_time_indisposed_ms = ctypes.c_int32(constants.TIME_INDISPOSED_MS)
+        self._run_block_time: float = None
+        self._block_ready: threading.Event = threading.Event()
+        # Keeping a reference, otherwise it's garbage collected while the driver holds it.
+        self._c_block_ready_callback = self.BlockReady(self._on_block_ready)
+        self._wait_fns: Dict[parameters.WaitStrategy, Callable] = {
+            parameters.WaitStrategy.SPIN: self._wait_spin,
+            parameters.WaitStrategy.POLL: self._wait_poll,
+            parameters.WaitStrategy.ESTIMATE: self._wait_estimate,
+            parameters.WaitStrategy.CALLBACK: self._wait_callback
+        }
 
     @property
     def n_samples(self) -> int:
@@ -82,8 +142,24 @@ class Picoscope:
             duration (int): The duration of the window where we collect data [us].
         """
 
-        _n_samples = duration * constants.US_TO_S / Picoscope.sampling_interval
-        self._n_samples: int = int(round(_n_samples, -2))
+        self._n_samples: int = n_samples_from_duration(
+            duration=duration,
+            sampling_interval=Picoscope.sampling_interval
+        )
+
+    @property
+    def n_downsampled(self) -> int:
+        """Number of values transferred per channel and pulse, i.e. after downsampling.
+
+        Returns:
+            int: n_samples, or fewer if downsampling.
+        """
+        return self._n_samples // self._downsampling_ratio
+
+    @property
+    def effective_sampling_interval(self) -> float:
+        """Time between the values transferred, i.e. after downsampling [s]."""
+        return Picoscope.sampling_interval * self._downsampling_ratio
 
     @property
     def enum_voltage_range(self) -> int:
@@ -104,6 +180,39 @@ class Picoscope:
             arr_fn=parameters.builtin_voltage_ranges
         )
 
+    @property
+    def max_adc(self) -> int:
+        """The ADC count corresponding to full scale of the voltage range.
+
+        Queried from the device on first access after connecting.
+
+        Returns:
+            int: Maximum ADC count.
+        """
+
+        if self._max_adc is None:
+            c_max_adc = ctypes.c_int16()
+            status = self.MaximumValue(self._c_handle, ctypes.byref(c_max_adc))
+
+            assert_pico_ok(status)
+
+            self._max_adc = c_max_adc.value
+
+        return self._max_adc
+
+    @property
+    def mV_per_adc(self) -> float:
+        """Conversion factor from raw amplitude (in ADCs) to mV.
+
+        Returns:
+            float: mV per ADC count at the current voltage range.
+        """
+        return float(utils.adc_to_mV(
+            adc=1,
+            enum_voltage_range=self.enum_voltage_range,
+            max_adc=self.max_adc
+        ))
+
     @property
     def trigger_properties(self) -> parameters.TriggerProperties:
         return self._trigger_properties
@@ -134,6 +243,72 @@ class Picoscope:
         """
         self._segment_index = segment
 
+    @property
+    def n_segments(self) -> int:
+        """Number of memory segments waveforms are collected into.
+
+        One per waveform in rapid block mode. Otherwise waveforms are
+        collected one at a time, reusing the same segment, or alternating
+        between two if pipelined.
+
+        Returns:
+            int: Number of memory segments.
+        """
+
+        if self.rapid_block:
+            return self.avg_num
+
+        return 2 if self.pipelined else 1
+
+    @property
+    def n_captures(self) -> int:
+        """Number of waveforms collected per RunBlock, all of them in rapid block mode."""
+        return self.avg_num if self.rapid_block else 1
+
+    @property
+    def channels(self) -> Tuple[int, ...]:
+        """Enumerated channels captured in each shot, the receiving transducer's first.
+
+        Defaults to input_channel only.
+
+        Returns:
+            Tuple[int, ...]: Enumerated channels.
+        """
+        return self._channels
+
+    def apply_plan(self, plan: AcquisitionPlan) -> None:
+        """Adopts the values of a precompiled acquisition plan.
+
+        Only updates the python-side state; the device is programmed
+        by the preparation functions.
+
+        Args:
+            plan (AcquisitionPlan): The plan to apply.
+        """
+
+        self.avg_num = plan.avg_num
+        self._n_samples = plan.n_samples
+        self._channels = plan.channels
+        self._downsampling_mode = plan.downsampling_mode
+        self._downsampling_ratio = plan.downsampling_ratio
+        self._enum_voltage_range = plan.enum_voltage_range
+        self._trigger_properties.delay = plan.trigger_delay
+
+    def _is_programmed(self, setting: str, value: tuple) -> bool:
+        """Checks whether the device already has _setting_ programmed to _value_.
+
+        Lets the preparation functions skip SDK calls whose inputs
+        haven't changed since they were last issued.
+
+        Args:
+            setting (str): Name of the setting, usually the SDK function.
+            value (tuple): The inputs to the SDK function.
+
+        Returns:
+            bool: True if the setting is unchanged.
+        """
+        return self._programmed.get(setting) == value
+
     @property
     def is_connected(self):
         """Checks whether picoscope is connected.
@@ -145,7 +320,7 @@ class Picoscope:
             bool: True if connected, False if not.
         """
 
-        status = self.PingUnit(constants.C_HANDLE)
+        status = self.PingUnit(self._c_handle)
 
         try:
             assert_pico_ok(status)
@@ -156,6 +331,13 @@ class Picoscope:
 
         return self._is_connected
 
+    @property
+    def was_connected(self) -> bool:
+        """Whether the picoscope was connected as of the last connect, disconnect
+        or is_connected, w/o pinging it.
+        """
+        return self._is_connected
+
     def connect(self) -> None:
         """Connects to oscilloscope.
 
@@ -164,13 +346,19 @@ class Picoscope:
             mistifyingly always fails on the first try.
         """
 
+        METRICS.increment('connects')
+        self._max_adc = None
+        self._buffers.invalidate()
+        self._programmed.clear()
+
         for _ in range(3):
             try:
                 status = self.OpenUnit(
-                    ctypes.byref(constants.C_HANDLE),
-                    constants.C_SERIAL
+                    ctypes.byref(self._c_handle),
+                    self._c_serial
                 )
                 assert_pico_ok(status)
+                self._is_connected = True
 
                 return
             
@@ -181,36 +369,88 @@ class Picoscope:
 
         raise Exception('Picoscope connection unsuccessful.')
 
-    def set_averaging(self) -> None:
-        """Sets the number of waveforms to be collected for averaging."""
+    def enumerate_serials(self) -> List[str]:
+        """Serial nos. of all units attached that aren't already open.
 
-        status = self.SetNoOfCaptures(constants.C_HANDLE, Picoscope.avg_num)
+        Doesn't need a connection, so can be called on any instance.
+
+        Returns:
+            List[str]: Serial nos., e.g. ['JO123/0456', 'JO789/0123'].
+        """
+
+        c_count = ctypes.c_int16()
+        c_serials = ctypes.create_string_buffer(constants.SERIALS_BUFFER_LENGTH)
+        c_length = ctypes.c_int16(constants.SERIALS_BUFFER_LENGTH)
+        status = self.EnumerateUnits(ctypes.byref(c_count), c_serials, ctypes.byref(c_length))
 
         assert_pico_ok(status)
 
-        # Split memory to allow for storing multiple waveforms.
-        n_max_samples = ctypes.c_int32(self._n_samples)
-        status = self.MemorySegments(
-            constants.C_HANDLE,
-            Picoscope.avg_num,
-            ctypes.byref(n_max_samples)
-        )
-        
+        serials = c_serials.value.decode()
+
+        return serials.split(',') if c_count.value else []
+
+    def set_averaging(self) -> None:
+        """Sets the number of waveforms to be collected for averaging.
+
+        In rapid block mode memory is split into one segment per waveform
+        and the device collects all of them after a single RunBlock.
+        Otherwise it collects one per RunBlock, see n_segments.
+        """
+
+        segments = (self.n_segments, self._n_samples)
+
+        if not self._is_programmed('MemorySegments', segments):
+            # Split memory to allow for storing multiple waveforms.
+            # Has to precede SetNoOfCaptures, which can't exceed the no. of segments.
+            n_max_samples = ctypes.c_int32(self._n_samples)
+            status = self.MemorySegments(
+                self._c_handle,
+                self.n_segments,
+                ctypes.byref(n_max_samples)
+            )
+
+            assert_pico_ok(status)
+
+            self._programmed['MemorySegments'] = segments
+            self._programmed.pop('SetNoOfCaptures', None)
+            self._buffers.invalidate()
+
+        n_captures = (self.n_captures, )
+
+        if self._is_programmed('SetNoOfCaptures', n_captures):
+            return
+
+        status = self.SetNoOfCaptures(self._c_handle, *n_captures)
+
         assert_pico_ok(status)
 
+        self._programmed['SetNoOfCaptures'] = n_captures
+
     def set_channel(self) -> None:
-        """Sets various input channel parameters."""
-
-        status = self.SetChannel(
-            constants.C_HANDLE,
-            Picoscope.input_channel,
-            constants.IS_ENABLED,
-            constants.COUPLING,
-            self.enum_voltage_range,
-            constants.ANALOG_OFFSET
-        )
+        """Sets various input channel parameters.
 
-        assert_pico_ok(status)
+        Enables the channels to be captured and the trigger's source, and
+        disables all others, as every enabled channel takes a share of the
+        sampling rate and memory.
+        """
+
+        for channel in range(constants.N_CHANNELS):
+            setting = (
+                channel,
+                channel in self._channels or channel == self._trigger_properties.channel,
+                constants.COUPLING,
+                self.enum_voltage_range,
+                constants.ANALOG_OFFSET
+            )
+
+            if self._is_programmed(f'SetChannel{channel}', setting):
+                continue
+
+            status = self.SetChannel(self._c_handle, *setting)
+
+            assert_pico_ok(status)
+
+            self._programmed[f'SetChannel{channel}'] = setting
 
     def check_timebase(self) -> None:
         """Checks whether set sampling interval is valid.
@@ -218,11 +458,16 @@ class Picoscope:
         Refer to Programmer's guide for details.
         """
 
+        setting = (Picoscope.enum_sampling_interval, self._n_samples)
+
+        if self._is_programmed('GetTimebase2', setting):
+            return
+
         time_interval_ns = ctypes.c_float()
         returned_max_samples = ctypes.c_int32()
 
         status = self.GetTimebase2(
-            constants.C_HANDLE,
+            self._c_handle,
             Picoscope.enum_sampling_interval,
             self._n_samples,
             ctypes.byref(time_interval_ns),
@@ -233,11 +478,12 @@ class Picoscope:
 
         assert_pico_ok(status)
 
+        self._programmed['GetTimebase2'] = setting
+
     def set_trigger(self) -> None:
         """Cocks the gun."""
 
-        status = self.SetSimpleTrigger(
-            constants.C_HANDLE,
+        setting = (
             self._trigger_properties.enable_trigger,
             self._trigger_properties.channel,
             self._trigger_properties.threshold,
@@ -246,96 +492,256 @@ class Picoscope:
             self._trigger_properties.autoTrigger_ms
         )
 
+        if self._is_programmed('SetSimpleTrigger', setting):
+            return
+
+        status = self.SetSimpleTrigger(self._c_handle, *setting)
+
         assert_pico_ok(status)
 
+        self._programmed['SetSimpleTrigger'] = setting
+
     def run_block(self) -> None:
         """Specifies how data should be collected."""
 
         post_trigger_samples = self._n_samples
+        use_callback = self.wait_strategy == parameters.WaitStrategy.CALLBACK
+
+        self._block_ready.clear()
+        self._run_block_time = time.perf_counter()
 
         status = self.RunBlock(
-            constants.C_HANDLE,
+            self._c_handle,
             constants.PRE_TRIGGER_SAMPLES,
             post_trigger_samples,
             Picoscope.enum_sampling_interval,
             constants.C_OVERSAMPLE,
-            None,
+            ctypes.byref(self._c_time_indisposed_ms),
             self.segment_index,
-            None,
+            self._c_block_ready_callback if use_callback else None,
             None
         )
 
         assert_pico_ok(status)
 
+    def set_sig_gen(self) -> None:
+        """Has the signal generator send n_captures pulses per trigger.
+
+        A software trigger only fires the pulser once, but in rapid block
+        mode every memory segment needs a trigger of its own, or it's
+        filled by the auto trigger, i.e. w/ noise. So the generator is
+        programmed for a burst of n_captures square pulses at
+        constants.SIG_GEN_FREQUENCY instead. W/o rapid block it's left as
+        configured, unless it was programmed for a burst before, in which
+        case it's set back to a single pulse.
+        """
+
+        if not self.rapid_block and 'SetSigGenBuiltIn' not in self._programmed:
+            return
+
+        setting = (
+            constants.SIG_GEN_OFFSET_UV,
+            constants.SIG_GEN_PK_TO_PK_UV,
+            parameters.WaveType.SQUARE.value,
+            constants.SIG_GEN_FREQUENCY,  # Start and stop frequency, i.e. no sweep
+            constants.SIG_GEN_FREQUENCY,
+            0.,  # Increment
+            0.,  # Dwell time
+            parameters.SweepType.UP.value,
+            0,  # No extra operations
+            self.n_captures,  # Shots
+            0,  # Sweeps
+            parameters.TriggerType.RISING.value,
+            parameters.TriggerSource.SIGGEN_SOFT_TRIG.value,
+            constants.EXT_IN_THRESHOLD
+        )
+
+        if self._is_programmed('SetSigGenBuiltIn', setting):
+            return
+
+        status = self.SetSigGenBuiltIn(self._c_handle, *setting)
+
+        assert_pico_ok(status)
+
+        self._programmed['SetSigGenBuiltIn'] = setting
+
     def pull_trigger(self) -> None:
-        """Pulls the trigger: Sends a signal to the pulser."""
+        """Pulls the trigger: Sends a signal to the pulser, n_captures in rapid block mode, see set_sig_gen."""
 
-        status = self.SigGenSoftwareControl(constants.C_HANDLE, 0)
+        status = self.SigGenSoftwareControl(self._c_handle, 0)
 
         assert_pico_ok(status)
 
-    def wait_ready(self) -> None:
-        """A thread lock, waits for data collection to finish before data is collected."""
+    def _on_block_ready(self, handle: int, status: int, p_parameter: int) -> None:
+        """Called by the driver, from its own thread, once a block is collected."""
+        self._block_ready.set()
+
+    def is_ready(self) -> bool:
+        """Asks the driver whether data collection has finished.
+
+        Returns:
+            bool: True if finished.
+        """
 
         ready = ctypes.c_int16(0)
-        check = ctypes.c_int16(0)
+        status = self.IsReady(self._c_handle, ctypes.byref(ready))
 
-        while ready.value == check.value:
-            status = self.IsReady(constants.C_HANDLE, ctypes.byref(ready))
+        assert_pico_ok(status)
 
-            assert_pico_ok(status)
+        return bool(ready.value)
 
-    def set_buffer(self) -> None:
-        """Create data buffer and register with driver."""
+    def estimated_remaining_s(self) -> float:
+        """How much of the driver's time-indisposed estimate returned by RunBlock
+        is left, scaled by constants.ESTIMATE_FRACTION [s], 0 if none.
+        """
 
-        self._c_buffer: ctypes.Array = (ctypes.c_int16 * self._n_samples)()
-        buffer_length: int = self._n_samples
+        estimate_s = self._c_time_indisposed_ms.value * 1e-3 * constants.ESTIMATE_FRACTION
 
-        status = self.SetDataBuffer(
-            constants.C_HANDLE,
-            Picoscope.input_channel,
-            ctypes.byref(self._c_buffer),
-            buffer_length,
-            self.segment_index,
-            constants.DOWNSAMPLING_MODE
-        )
+        return max(self._run_block_time + estimate_s - time.perf_counter(), 0.)
 
-        assert_pico_ok(status)
+    def _wait_spin(self) -> None:
+        while not self.is_ready():
+            pass
+
+    def _wait_poll(self) -> None:
+        while not self.is_ready():
+            time.sleep(constants.POLL_INTERVAL_S)
+
+    def _wait_estimate(self) -> None:
+        remaining_s = self.estimated_remaining_s()
+
+        if remaining_s > 0:
+            time.sleep(remaining_s)
+
+        self._wait_poll()
+
+    def _wait_callback(self) -> None:
+        # Not waiting indefinitely in case the callback is lost; polling instead.
+        timeout_ms = self._c_time_indisposed_ms.value \
+            + self._trigger_properties.autoTrigger_ms * self.n_captures
+        self._block_ready.wait(timeout=timeout_ms * 1e-3)
+
+        self._wait_poll()
+
+    def wait_ready(self) -> float:
+        """A thread lock, waits for data collection to finish before data is collected.
+
+        How it waits is set by wait_strategy.
+
+        Returns:
+            float: Time spent waiting [s], also stored as wait_s.
+        """
+
+        start = time.perf_counter()
+        self._wait_fns[self.wait_strategy]()
+        self.wait_s = time.perf_counter() - start
+
+        return self.wait_s
 
     def get_data(self) -> None:
-        """Pulls the data from the oscilloscope."""
+        """Pulls the data from the oscilloscope, downsampled by the device if so planned."""
 
         c_max_samples = ctypes.c_int32(self._n_samples)
 
         status = self.GetValues(
-            constants.C_HANDLE,
+            self._c_handle,
             constants.START_INDEX,
             ctypes.byref(c_max_samples), 
-            constants.DOWNSAMPLING_RATIO,
-            constants.DOWNSAMPLING_MODE,
+            self._downsampling_ratio,
+            self._downsampling_mode,
             self.segment_index,
-            ctypes.byref(constants.C_OVERFLOW)
+            ctypes.byref(self._c_overflow)
         )
 
         assert_pico_ok(status)
 
+        if self._c_overflow.value:
+            METRICS.increment('overflows')
+
+    def set_buffers(self) -> None:
+        """Allocate one data buffer per channel and memory segment and register them with driver.
+
+        The buffers are sized for the downsampled length, and reused as long
+        as the channels, the number of segments, n_downsampled and the
+        downsampling mode stay the same, in which case this is a no-op.
+        """
+
+        self._buffers.allocate(channels=self._channels, n_segments=self.n_segments, n_samples=self.n_downsampled)
+
+        # Buffers are registered for a downsampling mode.
+        if not self._is_programmed('SetDataBuffer', (self._downsampling_mode, )):
+            self._buffers.invalidate()
+
+        if self._buffers.is_registered:
+            return
+
+        for channel in self._channels:
+            for segment in range(self.n_segments):
+                status = self.SetDataBuffer(
+                    self._c_handle,
+                    channel,
+                    self._buffers.c_pointer(channel=channel, segment=segment),
+                    self.n_downsampled,
+                    segment,
+                    self._downsampling_mode
+                )
+
+                assert_pico_ok(status)
+
+        self._buffers.is_registered = True
+        self._programmed['SetDataBuffer'] = (self._downsampling_mode, )
+
+    def get_data_bulk(self) -> None:
+        """Pulls the data from all memory segments in a single transfer."""
+
+        c_n_samples = ctypes.c_uint32(self._n_samples)
+        self._c_overflows = (ctypes.c_int16 * self.n_segments)()
+
+        status = self.GetValuesBulk(
+            self._c_handle,
+            ctypes.byref(c_n_samples),
+            0,
+            self.n_segments - 1,
+            self._downsampling_ratio,
+            self._downsampling_mode,
+            ctypes.byref(self._c_overflows)
+        )
+
+        assert_pico_ok(status)
+
+        METRICS.increment('overflows', n=sum(map(bool, self._c_overflows)))
+
     def stop(self) -> None:
         """Stops the picoscope, a necessary step at the end of each pulse."""
 
-        status = self.Stop(constants.C_HANDLE)
+        status = self.Stop(self._c_handle)
 
         assert_pico_ok(status)
 
-    def to_mV(self) -> List[float]:
-        """Converts raw amplitude (in ADCs) to mV.
-        
+    @property
+    def adc_values(self) -> np.ndarray:
+        """Raw amplitudes (in ADCs) of all channels and memory segments as collected by the driver.
+
+        The registered buffer itself, i.e. no data is copied.
+
         Returns:
-            list[float]: Amplitudes in mV.
+            np.ndarray: Raw amplitudes, dtype int16, shape
+                (len(channels), n_segments, n_downsampled).
         """
+        return self._buffers.block
 
-        c_max_ADC = ctypes.c_int16(self._n_samples)
+    def to_mV(self) -> np.ndarray:
+        """Converts raw amplitude (in ADCs) of all channels and memory segments to mV.
+        
+        Returns:
+            np.ndarray: Amplitudes in mV, shape (len(channels), n_segments, n_downsampled).
+        """
 
-        return adc2mV(self._c_buffer, self.enum_voltage_range, c_max_ADC)
+        return utils.adc_to_mV(
+            adc=self.adc_values,
+            enum_voltage_range=self.enum_voltage_range,
+            max_adc=self.max_adc
+        )
 
     def disconnect(self) -> None:
         """Closes the oscilloscope connection, the opposite of connect().
@@ -343,7 +749,11 @@ class Picoscope:
         Generally speaking, this should only be used for tests.
         """
 
-        status = self.CloseUnit(constants.C_HANDLE)
+        self._max_adc = None
+        self._is_connected = False
+        self._buffers.invalidate()
+        self._programmed.clear()
+        status = self.CloseUnit(self._c_handle)
 
         assert_pico_ok(status)
 
@@ -354,7 +764,16 @@ class Picoscope2000(Picoscope):
     Confusingly, they are 2000A-level, despite being appended by a 'b'.
     """
 
-    def __init__(self):
+    def __init__(self, serial: str = None):
+        """
+        Args:
+            serial (str, optional): Serial no. of the unit to open.
+                Defaults to None, i.e. the first unit found.
+        """
+
+        # Imported here so that the driver library is only needed when it's used.
+        from picosdk.ps2000a import ps2000a
+
         functions: Dict[str, Callable] = {
             'OpenUnit': ps2000a.ps2000aOpenUnit,
             'SetChannel': ps2000a.ps2000aSetChannel,
@@ -362,15 +781,67 @@ class Picoscope2000(Picoscope):
             'SetSimpleTrigger': ps2000a.ps2000aSetSimpleTrigger,
             'RunBlock': ps2000a.ps2000aRunBlock,
             'SigGenSoftwareControl': ps2000a.ps2000aSigGenSoftwareControl,
+            'SetSigGenBuiltIn': ps2000a.ps2000aSetSigGenBuiltIn,
             'IsReady': ps2000a.ps2000aIsReady,
             'SetDataBuffer': ps2000a.ps2000aSetDataBuffer,
             'GetValues': ps2000a.ps2000aGetValues,
+            'GetValuesBulk': ps2000a.ps2000aGetValuesBulk,
             'Stop': ps2000a.ps2000aStop,
             'CloseUnit': ps2000a.ps2000aCloseUnit,
             'GetAnalogueOffset': ps2000a.ps2000aGetAnalogueOffset,
             'SetNoOfCaptures': ps2000a.ps2000aSetNoOfCaptures,
             'MemorySegments': ps2000a.ps2000aMemorySegments,
-            'PingUnit': ps2000a.ps2000aPingUnit
+            'PingUnit': ps2000a.ps2000aPingUnit,
+            'MaximumValue': ps2000a.ps2000aMaximumValue,
+            'BlockReady': ps2000a.BlockReadyType,
+            'EnumerateUnits': ps2000a.ps2000aEnumerateUnits
         }
 
-        super(Picoscope2000, self).__init__(fns=functions)
+        super(Picoscope2000, self).__init__(fns=functions, serial=serial)
+
+
+class PicoscopeSimulated(Picoscope):
+    """Simulated 2000A-level picoscope, for use w/o a picoscope plugged in.
+
+    See simulator.SimulatedPs2000a.
+    """
+
+    def __init__(self, properties: SimulationProperties = SimulationProperties(), serial: str = None):
+        """
+        Args:
+            properties (SimulationProperties, optional): Parameters of the
+                simulated device and sample. Defaults to SimulationProperties().
+            serial (str, optional): Serial no. of the simulated unit.
+                Defaults to None, i.e. properties.serial.
+        """
+
+        if serial is not None:
+            properties = replace(properties, serial=serial)
+
+        self.simulator: SimulatedPs2000a = SimulatedPs2000a(properties=properties)
+
+        super(PicoscopeSimulated, self).__init__(fns=self.simulator.functions(), serial=serial)
+
+
+BACKENDS: Dict[str, Callable[..., Picoscope]] = {
+    'ps2000a': Picoscope2000,
+    'simulated': PicoscopeSimulated
+}
+
+
+def make_picoscope(backend: str = constants.BACKEND, serial: str = None) -> Picoscope:
+    """Instantiates the picoscope for a backend.
+
+    Args:
+        backend (str, optional): One of BACKENDS. Defaults to constants.BACKEND.
+        serial (str, optional): Serial no. of the unit. Defaults to None,
+            i.e. the first unit found.
+
+    Returns:
+        Picoscope: The picoscope instance.
+    """
+
+    if backend not in BACKENDS:
+        raise ValueError(f'Unknown backend {backend}, choose from {list(BACKENDS)}.')
+
+    return BACKENDS[backend](serial=serial)
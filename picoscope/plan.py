@@ -0,0 +1,147 @@
+"""Acquisition plans: everything derived from PulsingParams, computed once."""
+
+from dataclasses import astuple, dataclass
+from functools import lru_cache
+from typing import List, Tuple
+
+from picoscope import constants, parameters, utils
+
+
+def n_samples_from_duration(duration: float, sampling_interval: float = constants.SAMPLING_INTERVAL) -> int:
+    """Number of samples collected per single pulse.
+
+    Args:
+        duration (float): The duration of the window where we collect data [us].
+        sampling_interval (float, optional): Time between samples [s].
+            Defaults to constants.SAMPLING_INTERVAL.
+
+    Returns:
+        int: Number of samples, rounded to the nearest hundred.
+    """
+
+    n_samples = duration * constants.US_TO_S / sampling_interval
+
+    return int(round(n_samples, -2))
+
+
+@dataclass(frozen=True)
+class AcquisitionPlan:
+    """Device-level values derived from a PulsingParams instance.
+
+    Immutable so that it can be cached and shared between requests.
+
+    Attributes:
+        avg_num (int): The number of waveforms to average across.
+        n_samples (int): Number of samples per single pulse.
+        channels (Tuple[int, ...]): Enumerated channels to capture, the
+            receiving transducer's first.
+        downsampling_mode (int): Enumerated downsampling mode, see DownsamplingMode.
+        downsampling_ratio (int): Samples per downsampled value, 1 if not downsampling.
+        enum_voltage_range (int): Enumerated voltage range of the input channel.
+        trigger_delay (int): Samples between trigger and first sample.
+        keep_variance (bool): Whether to keep track of the per-sample variance.
+    """
+
+    # In order of how costly they are to reconfigure, see reconfiguration_order.
+    avg_num: int
+    n_samples: int
+    channels: Tuple[int, ...]
+    downsampling_mode: int
+    downsampling_ratio: int
+    enum_voltage_range: int
+    trigger_delay: int
+    keep_variance: bool
+
+
+def enumerate_channels(channels: str) -> Tuple[int, ...]:
+    """Parses channel letters to enumerated channels.
+
+    Args:
+        channels (str): Letters of the channels, e.g. 'BA'. Duplicates are
+            dropped, see utils.parse_channels.
+
+    Returns:
+        Tuple[int, ...]: Enumerated channels, in the same order.
+    """
+
+    return tuple(parameters.Channel[letter].value for letter in utils.parse_channels(channels=channels))
+
+
+def enumerate_downsampling(mode: str, ratio: int) -> Tuple[int, int]:
+    """Parses a downsampling mode and validates the ratio.
+
+    Args:
+        mode (str): Name of a DownsamplingMode, e.g. 'average'.
+        ratio (int): Samples per downsampled value.
+
+    Returns:
+        Tuple[int, int]: Enumerated mode and ratio, the latter 1 if not downsampling.
+    """
+
+    try:
+        mode_ = parameters.DownsamplingMode[mode.upper()]
+
+    except KeyError:
+        raise ValueError(
+            f'Invalid downsampling mode {mode}, choose from {[m.name.lower() for m in parameters.DownsamplingMode]}.'
+        )
+
+    if mode_ == parameters.DownsamplingMode.NONE:
+        return mode_.value, 1
+
+    if ratio < 1 or ratio != int(ratio):
+        raise ValueError(f'Invalid downsampling ratio {ratio}, should be a positive integer.')
+
+    return mode_.value, int(ratio)
+
+
+@lru_cache(maxsize=constants.PLAN_CACHE_SIZE)
+def compile_plan(pulsing_params: parameters.PulsingParams) -> AcquisitionPlan:
+    """Derives an acquisition plan from pulsing parameters.
+
+    Cached, as consecutive requests mostly use identical parameters.
+
+    Args:
+        pulsing_params (PulsingParams): Parameters for pulsing.
+
+    Returns:
+        AcquisitionPlan: The derived plan.
+    """
+
+    trigger_properties = parameters.TriggerProperties()
+    trigger_properties.set_delay(delay_us=pulsing_params.delay)
+
+    downsampling_mode, downsampling_ratio = enumerate_downsampling(
+        mode=pulsing_params.downsampling_mode,
+        ratio=pulsing_params.downsampling_ratio
+    )
+
+    return AcquisitionPlan(
+        avg_num=int(pulsing_params.avg_num),
+        n_samples=n_samples_from_duration(duration=pulsing_params.duration),
+        channels=enumerate_channels(channels=pulsing_params.channels),
+        downsampling_mode=downsampling_mode,
+        downsampling_ratio=downsampling_ratio,
+        enum_voltage_range=utils.to_enum(
+            val=pulsing_params.voltage_range,
+            arr_fn=parameters.builtin_voltage_ranges
+        ),
+        trigger_delay=trigger_properties.delay,
+        keep_variance=bool(pulsing_params.std)
+    )
+
+
+def reconfiguration_order(plans: List[AcquisitionPlan]) -> List[int]:
+    """Order in which to run plans to minimise device reconfiguration.
+
+    Sorts lexicographically by the plan fields, so that plans sharing the
+    costliest settings (memory segments and buffers) run back to back, and
+    identical plans need no reconfiguration at all.
+
+    Args:
+        plans (List[AcquisitionPlan]): Plans in the order they were requested.
+
+    Returns:
+        List[int]: Indices into plans.
+    """
+    return sorted(range(len(plans)), key=lambda index: astuple(plans[index]))
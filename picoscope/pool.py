@@ -0,0 +1,279 @@
+"""Several picoscopes side by side, each with an acquisition owner of its own."""
+
+from collections import defaultdict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from enum import Enum
+import os
+import time
+from typing import Dict, Iterator, List, Tuple, Union
+
+from picoscope import constants, pulse
+from picoscope.acquisition import AcquisitionOwner
+from picoscope.archive import Archive
+from picoscope.averaging import AveragedWaveform
+from picoscope.history import History
+from picoscope.parameters import PulsingParams
+from picoscope.picoscope import Picoscope, make_picoscope
+from picoscope.supervisor import ConnectionSupervisor
+
+DEFAULT_DEVICE: str = 'default'  # Device ID of a unit opened w/o a serial no.
+
+
+class Readiness(Enum):
+    """Where a device is at with its warm start, see DevicePool.warm_start.
+
+    COLD: Not warm started, it connects and prepares on its first request.
+    WARMING: Connecting, preparing and pulsing once.
+    READY: Warm started.
+    FAILED: The warm start failed, it connects again on its first request.
+    """
+
+    COLD = 'cold'
+    WARMING = 'warming'
+    READY = 'ready'
+    FAILED = 'failed'
+
+
+@dataclass
+class Device:
+    """A picoscope along with everything that's kept per unit.
+
+    Attributes:
+        id (str): Identifies the device in requests, its serial no.
+        picoscope_ (Picoscope): Picoscope instance. Only to be accessed
+            through owner.
+        owner (AcquisitionOwner): Serialises access to picoscope_.
+        history (History): Recent acquisitions.
+        archive (Archive, optional): On-disk archive, None if not archiving.
+        warm_start (Future, optional): Resolves to the duration of the warm
+            start [s] once done, None if not warm started.
+        supervisor (ConnectionSupervisor, optional): Keeps an eye on the
+            connection, None if not supervised.
+    """
+
+    id: str
+    picoscope_: Picoscope
+    owner: AcquisitionOwner
+    history: History
+    archive: Archive = None
+    warm_start: Future = None
+    supervisor: ConnectionSupervisor = None
+
+    @property
+    def readiness(self) -> Readiness:
+        if self.warm_start is None:
+            return Readiness.COLD
+
+        if not self.warm_start.done():
+            return Readiness.WARMING
+
+        return Readiness.FAILED if self.warm_start.exception() is not None else Readiness.READY
+
+    def health(self) -> Dict[str, Union[str, float]]:
+        """Http-ready readiness and, if supervised, connection status, w/o touching the device."""
+
+        health = {'device': self.id, 'readiness': self.readiness.value}
+
+        if health['readiness'] == Readiness.READY.value:
+            health['warm_start_s'] = self.warm_start.result()
+        elif health['readiness'] == Readiness.FAILED.value:
+            health['error'] = str(self.warm_start.exception())
+
+        if self.supervisor is not None:
+            health['connection'] = self.supervisor.status()
+
+        return health
+
+
+def warm_start(picoscope_: Picoscope, pulsing_params: PulsingParams) -> float:
+    """Connects, prepares and pulses once, so that the first request is as fast as the rest.
+
+    The waveform is thrown away, i.e. not recorded to history or archive.
+
+    Args:
+        picoscope_ (Picoscope): Picoscope instance.
+        pulsing_params (PulsingParams): Parameters to prepare with.
+
+    Returns:
+        float: How long it took [s].
+    """
+
+    start = time.perf_counter()
+    pulse.acquire(picoscope_=picoscope_, pulsing_params=pulsing_params)
+
+    return time.perf_counter() - start
+
+
+def make_device(serial: str = None, backend: str = constants.BACKEND, archive_dir: str = None) -> Device:
+    """Instantiates a unit w/o connecting to it.
+
+    Args:
+        serial (str, optional): Serial no. of the unit. Defaults to None,
+            i.e. the first unit found.
+        backend (str, optional): See picoscope.BACKENDS. Defaults to constants.BACKEND.
+        archive_dir (str, optional): Directory to archive to, one
+            subdirectory per unit. Defaults to None, i.e. no archiving.
+
+    Returns:
+        Device: The device.
+    """
+
+    device_id = serial or DEFAULT_DEVICE
+    picoscope_ = make_picoscope(backend=backend, serial=serial)
+    history = History()
+    archive = Archive(directory=os.path.join(archive_dir, device_id.replace('/', '_'))) if archive_dir else None
+
+    return Device(
+        id=device_id,
+        picoscope_=picoscope_,
+        owner=AcquisitionOwner(picoscope_=picoscope_, history=history, archive=archive),
+        history=history,
+        archive=archive
+    )
+
+
+class DevicePool:
+    """All picoscopes served by the app, by device ID.
+
+    Every device has its own worker thread (see AcquisitionOwner), so
+    independent devices acquire concurrently while calls to the same
+    device are still serialised.
+
+    Example:
+        pool = DevicePool.open(serials=['JO123/0456', 'JO789/0123'])
+        device = pool.get('JO123/0456')
+        waveform = device.owner.acquire(pulsing_params=pulsing_params)
+    """
+
+    def __init__(self, devices: List[Device]):
+        """
+        Args:
+            devices (List[Device]): The devices, the first being the default.
+        """
+
+        if not devices:
+            raise ValueError('A device pool needs at least one device.')
+
+        self._devices: Dict[str, Device] = {device.id: device for device in devices}
+
+    @classmethod
+    def open(
+        cls,
+        serials: List[str] = constants.SERIALS,
+        backend: str = constants.BACKEND,
+        archive_dir: str = constants.ARCHIVE_DIR
+    ) -> 'DevicePool':
+        """Instantiates a pool of the configured units, or all attached ones.
+
+        Args:
+            serials (List[str], optional): Serial nos. of the units. If empty,
+                all units attached are used, or if none are found a single
+                default device. Defaults to constants.SERIALS.
+            backend (str, optional): See picoscope.BACKENDS. Defaults to constants.BACKEND.
+            archive_dir (str, optional): Directory to archive to.
+                Defaults to constants.ARCHIVE_DIR.
+
+        Returns:
+            DevicePool: The pool, not connected.
+        """
+
+        if not serials:
+            serials = make_picoscope(backend=backend).enumerate_serials() or [None]
+
+        return cls(devices=[
+            make_device(serial=serial, backend=backend, archive_dir=archive_dir)
+            for serial in serials
+        ])
+
+    def __iter__(self) -> Iterator[Device]:
+        return iter(self._devices.values())
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._devices)
+
+    @property
+    def default(self) -> Device:
+        """The device requests go to if they don't specify one."""
+        return next(iter(self._devices.values()))
+
+    def get(self, device_id: str = None) -> Device:
+        """A device by ID.
+
+        Args:
+            device_id (str, optional): Device ID. Defaults to None, i.e. the default device.
+
+        Returns:
+            Device: The device. Raises KeyError if there's none by that ID.
+        """
+        return self.default if device_id is None else self._devices[device_id]
+
+    @property
+    def is_healthy(self) -> bool:
+        """Whether no device is warming up or failed to, see Device.readiness."""
+        return all(device.readiness in (Readiness.COLD, Readiness.READY) for device in self)
+
+    def warm_start(self, pulsing_params: PulsingParams) -> None:
+        """Warm starts all devices in the background, each on its own worker thread.
+
+        Requests queued in the meantime wait for the warm start of their device.
+        See Device.readiness for progress.
+
+        Args:
+            pulsing_params (PulsingParams): Parameters to prepare with.
+        """
+
+        for device in self:
+            device.warm_start = device.owner.submit(
+                warm_start,
+                picoscope_=device.picoscope_,
+                pulsing_params=pulsing_params
+            )
+
+    def supervise(self, interval_s: float = constants.HEARTBEAT_INTERVAL_S) -> None:
+        """Starts a connection supervisor per device, see picoscope.supervisor.
+
+        Args:
+            interval_s (float, optional): Time between heartbeats [s].
+                Defaults to constants.HEARTBEAT_INTERVAL_S.
+        """
+
+        for device in self:
+            device.supervisor = ConnectionSupervisor(owner=device.owner, interval_s=interval_s).start()
+
+    def acquire_batch(self, requests: List[Tuple[str, PulsingParams]]) -> List[AveragedWaveform]:
+        """Acquires a batch spread across devices, the devices in parallel.
+
+        Each device runs its share with AcquisitionOwner.submit_acquire_batch,
+        so every acquisition is recorded as for single ones.
+
+        Args:
+            requests (List[Tuple[str, PulsingParams]]): Device ID (None for
+                the default device) and parameters of each acquisition.
+
+        Returns:
+            List[AveragedWaveform]: The averaged waveforms, in the order requested.
+        """
+
+        indices: Dict[str, List[int]] = defaultdict(list)
+
+        for index, (device_id, _) in enumerate(requests):
+            indices[self.get(device_id).id].append(index)
+
+        futures: Dict[str, Future] = {
+            device_id: self._devices[device_id].owner.submit_acquire_batch(
+                pulsing_params=[requests[index][1] for index in indices_]
+            )
+            for device_id, indices_ in indices.items()
+        }
+        waveforms: List[AveragedWaveform] = [None] * len(requests)
+
+        for device_id, future in futures.items():
+            for index, waveform in zip(indices[device_id], future.result()):
+                waveforms[index] = waveform
+
+        return waveforms
@@ -0,0 +1,339 @@
+"""Server-side signal processing of averaged waveforms, down to a handful of features.
+
+Every function works along the last axis, so a single call processes
+all channels (or any stack of waveforms) at once. Filtering is done in
+the frequency domain with numpy's FFT, i.e. w/o a dependency on scipy.
+
+Times are relative to the trigger [us], i.e. include the delay the
+waveform was collected at; frequencies are in MHz.
+
+Example:
+    processing_params = ProcessingParams(features='peak,tof', band='1,5')
+    features = process(
+        waveform=waveform,
+        processing_params=processing_params,
+        delay_us=pulsing_params.delay,
+        sampling_interval=picoscope_.sampling_interval
+    )
+"""
+
+from dataclasses import dataclass
+import numpy as np
+from typing import Dict, List, Tuple, Union
+
+from picoscope import constants
+from picoscope.averaging import AveragedWaveform
+
+FEATURES: Tuple[str, ...] = ('peak', 'tof', 'energy', 'envelope', 'spectrum')
+
+Features = Dict[str, Union[float, List[float], Dict]]
+
+
+@dataclass(frozen=True)
+class ProcessingParams:
+    """What to compute from a waveform, as sent along with the pulsing params.
+
+    Args:
+        features (str): Comma-separated FEATURES to return:
+            peak: Amplitude [mV] and time [us] of the envelope's maximum.
+            tof: Time of flight [us], when the envelope first reaches
+                _threshold_ times its maximum.
+            energy: Energy per gate [mV^2 us].
+            envelope: The Hilbert envelope [mV].
+            spectrum: FFT magnitude [mV] and its frequencies [MHz].
+        band (str, optional): Band-pass applied before anything else,
+            'low,high' [MHz]. Defaults to None, i.e. no filtering.
+        gates (str, optional): Windows to compute the energy in,
+            'start-end' [us], separated by ';'. Defaults to None, i.e.
+            the whole waveform.
+        threshold (float, optional): Fraction of the peak for tof.
+            Defaults to constants.TOF_THRESHOLD.
+        include_waveform (bool, optional): Whether to return the waveform
+            along with the features. Defaults to False.
+    """
+
+    features: str
+    band: str = None
+    gates: str = None
+    threshold: float = constants.TOF_THRESHOLD
+    include_waveform: bool = False
+
+    def __post_init__(self):
+        unknown = set(self.feature_names) - set(FEATURES)
+
+        if unknown or not self.feature_names:
+            raise ValueError(f'Features should be some of {FEATURES}, got {self.features!r}.')
+
+        if not 0 < self.threshold <= 1:
+            raise ValueError(f'Threshold should be in (0, 1], got {self.threshold}.')
+
+        # Fail on malformed band and gates when parsing the request, not after pulsing.
+        self.band_MHz, self.gates_us
+
+    @property
+    def feature_names(self) -> Tuple[str, ...]:
+        return tuple(feature.strip() for feature in self.features.split(',') if feature.strip())
+
+    @property
+    def band_MHz(self) -> Tuple[float, float]:
+        """Lower and upper edge of the pass band [MHz], None if not filtering."""
+
+        if self.band is None:
+            return None
+
+        low, high = map(float, self.band.split(','))
+
+        if not 0 <= low < high:
+            raise ValueError(f'Band should be low,high with 0 <= low < high, got {self.band!r}.')
+
+        return low, high
+
+    @property
+    def gates_us(self) -> Tuple[Tuple[float, float], ...]:
+        """Start and end of each gate [us], None for the whole waveform."""
+
+        if self.gates is None:
+            return None
+
+        gates = tuple(tuple(map(float, gate.split('-'))) for gate in self.gates.split(';') if gate.strip())
+
+        if any(len(gate) != 2 or gate[0] >= gate[1] for gate in gates):
+            raise ValueError(f'Gates should be start-end with start < end, got {self.gates!r}.')
+
+        return gates
+
+
+def bandpass(waveform_mV: np.ndarray, sampling_interval: float, low_MHz: float, high_MHz: float) -> np.ndarray:
+    """Zero-phase band-pass, zeroing all frequency components outside [low_MHz, high_MHz].
+
+    Args:
+        waveform_mV (np.ndarray): Waveform(s) [mV], samples along the last axis.
+        sampling_interval (float): Time between samples [s].
+        low_MHz (float): Lower edge of the pass band [MHz].
+        high_MHz (float): Upper edge of the pass band [MHz].
+
+    Returns:
+        np.ndarray: The filtered waveform(s) [mV], same shape as waveform_mV.
+    """
+
+    n_samples = waveform_mV.shape[-1]
+    spectrum = np.fft.rfft(waveform_mV, axis=-1)
+    frequencies_MHz = np.fft.rfftfreq(n_samples, d=sampling_interval) / 1E6
+    spectrum[..., (frequencies_MHz < low_MHz) | (frequencies_MHz > high_MHz)] = 0
+
+    return np.fft.irfft(spectrum, n=n_samples, axis=-1)
+
+
+def envelope(waveform_mV: np.ndarray) -> np.ndarray:
+    """Magnitude of the analytic signal, i.e. the Hilbert envelope.
+
+    Args:
+        waveform_mV (np.ndarray): Waveform(s) [mV], samples along the last axis.
+
+    Returns:
+        np.ndarray: The envelope(s) [mV], same shape as waveform_mV.
+    """
+
+    n_samples = waveform_mV.shape[-1]
+    # Doubles the positive frequencies and drops the negative ones.
+    weights = np.zeros(n_samples)
+    weights[0] = 1
+    weights[1:(n_samples + 1) // 2] = 2
+
+    if n_samples % 2 == 0:
+        weights[n_samples // 2] = 1
+
+    return np.abs(np.fft.ifft(np.fft.fft(waveform_mV, axis=-1) * weights, axis=-1))
+
+
+def spectrum(waveform_mV: np.ndarray, sampling_interval: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Single-sided FFT magnitude, scaled so that a sine of amplitude A peaks at A.
+
+    Args:
+        waveform_mV (np.ndarray): Waveform(s) [mV], samples along the last axis.
+        sampling_interval (float): Time between samples [s].
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Frequencies [MHz] and the magnitude
+            at each [mV], the latter with the same leading axes as waveform_mV.
+    """
+
+    n_samples = waveform_mV.shape[-1]
+    magnitude = np.abs(np.fft.rfft(waveform_mV, axis=-1)) * 2 / n_samples
+    magnitude[..., 0] /= 2
+
+    return np.fft.rfftfreq(n_samples, d=sampling_interval) / 1E6, magnitude
+
+
+def peak(envelope_mV: np.ndarray, times_us: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Amplitude and time of the maximum of the envelope.
+
+    Args:
+        envelope_mV (np.ndarray): Envelope(s) [mV], samples along the last axis.
+        times_us (np.ndarray): Time of each sample [us].
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Peak amplitude [mV] and time [us]
+            per envelope.
+    """
+
+    indices = np.argmax(envelope_mV, axis=-1)
+
+    return np.take_along_axis(envelope_mV, indices[..., None], axis=-1)[..., 0], times_us[indices]
+
+
+def time_of_flight(envelope_mV: np.ndarray, times_us: np.ndarray, threshold: float) -> np.ndarray:
+    """Time at which the envelope first reaches _threshold_ times its maximum.
+
+    Interpolates linearly between the samples either side of the crossing.
+
+    Args:
+        envelope_mV (np.ndarray): Envelope(s) [mV], samples along the last axis.
+        times_us (np.ndarray): Time of each sample [us].
+        threshold (float): Fraction of the maximum, in (0, 1].
+
+    Returns:
+        np.ndarray: Time of flight [us] per envelope.
+    """
+
+    levels = threshold * np.max(envelope_mV, axis=-1, keepdims=True)
+    # Where the envelope is at its maximum it reaches the level, so there's always a crossing.
+    after = np.argmax(envelope_mV >= levels, axis=-1)
+    before = np.maximum(after - 1, 0)
+
+    amps_after = np.take_along_axis(envelope_mV, after[..., None], axis=-1)[..., 0]
+    amps_before = np.take_along_axis(envelope_mV, before[..., None], axis=-1)[..., 0]
+    rise = amps_after - amps_before
+    fraction = np.divide(
+        amps_after - levels[..., 0], rise,
+        out=np.zeros_like(rise), where=rise > 0
+    )
+
+    return times_us[after] - fraction * (times_us[after] - times_us[before])
+
+
+def gated_energy(
+    waveform_mV: np.ndarray,
+    times_us: np.ndarray,
+    gates_us: Tuple[Tuple[float, float], ...]
+) -> np.ndarray:
+    """Energy, i.e. the integral of the squared amplitude, in each gate.
+
+    Args:
+        waveform_mV (np.ndarray): Waveform(s) [mV], samples along the last axis.
+        times_us (np.ndarray): Time of each sample [us], evenly spaced.
+        gates_us (Tuple[Tuple[float, float], ...]): Start and end of each
+            gate [us], the end not included.
+
+    Returns:
+        np.ndarray: Energy [mV^2 us], gates along the last axis.
+    """
+
+    interval_us = times_us[1] - times_us[0] if len(times_us) > 1 else 0.
+    cumulative = np.concatenate(
+        [np.zeros(waveform_mV.shape[:-1] + (1, )), np.cumsum(waveform_mV**2, axis=-1)],
+        axis=-1
+    )
+    bounds = np.searchsorted(times_us, np.asarray(gates_us, dtype=float).reshape(-1, 2))
+
+    return (cumulative[..., bounds[:, 1]] - cumulative[..., bounds[:, 0]]) * interval_us
+
+
+def process_stack(
+    waveforms_mV: np.ndarray,
+    processing_params: ProcessingParams,
+    delay_us: float,
+    sampling_interval: float
+) -> List[Features]:
+    """Computes the requested features of waveforms sharing a time axis, all at once.
+
+    Args:
+        waveforms_mV (np.ndarray): Waveforms [mV], shape (n_waveforms, n_samples).
+        processing_params (ProcessingParams): What to compute.
+        delay_us (float): Time of the first sample after the trigger [us].
+        sampling_interval (float): Time between samples [s].
+
+    Returns:
+        List[Features]: The features per waveform, by name.
+    """
+
+    waveforms_mV = np.atleast_2d(np.asarray(waveforms_mV, dtype=float))
+    times_us = delay_us + np.arange(waveforms_mV.shape[-1]) * sampling_interval / constants.US_TO_S
+    features = processing_params.feature_names
+    computed: Dict[str, np.ndarray] = dict()
+
+    if processing_params.band is not None:
+        waveforms_mV = bandpass(waveforms_mV, sampling_interval, *processing_params.band_MHz)
+
+    if {'peak', 'tof', 'envelope'} & set(features):
+        envelopes_mV = envelope(waveforms_mV)
+
+    if 'peak' in features:
+        computed['peak_mV'], computed['peak_us'] = peak(envelope_mV=envelopes_mV, times_us=times_us)
+
+    if 'tof' in features:
+        computed['tof_us'] = time_of_flight(
+            envelope_mV=envelopes_mV,
+            times_us=times_us,
+            threshold=processing_params.threshold
+        )
+
+    if 'energy' in features:
+        gates_us = processing_params.gates_us or ((times_us[0], np.inf), )
+        computed['energy'] = gated_energy(waveform_mV=waveforms_mV, times_us=times_us, gates_us=gates_us)
+
+    if 'envelope' in features:
+        computed['envelope'] = envelopes_mV
+
+    if 'spectrum' in features:
+        frequencies_MHz, computed['spectrum'] = spectrum(waveform_mV=waveforms_mV, sampling_interval=sampling_interval)
+
+    stack: List[Features] = [
+        {name: values[index].tolist() for name, values in computed.items()}
+        for index in range(waveforms_mV.shape[0])
+    ]
+
+    if 'spectrum' in features:
+        for features_ in stack:
+            features_['frequencies_MHz'] = frequencies_MHz.tolist()
+
+    return stack
+
+
+def process(
+    waveform: AveragedWaveform,
+    processing_params: ProcessingParams,
+    delay_us: float,
+    sampling_interval: float
+) -> Features:
+    """Computes the requested features of an averaged waveform, see ProcessingParams.
+
+    Args:
+        waveform (AveragedWaveform): The result of a pulse.
+        processing_params (ProcessingParams): What to compute.
+        delay_us (float): Time of the first sample after the trigger [us],
+            i.e. PulsingParams.delay.
+        sampling_interval (float): Time between samples [s].
+
+    Returns:
+        Features: The features by name. If several channels were captured,
+            those of each by channel letter under 'channels', all computed
+            in the same pass.
+    """
+
+    letters = list(waveform.channels) if waveform.channels is not None else []
+    waveforms_mV = np.stack([waveform_.mean_mV for waveform_ in waveform.channels.values()]) \
+        if letters else waveform.mean_mV[None]
+
+    stack = process_stack(
+        waveforms_mV=waveforms_mV,
+        processing_params=processing_params,
+        delay_us=delay_us,
+        sampling_interval=sampling_interval
+    )
+    features: Features = dict(stack[0])
+
+    if letters:
+        features['channels'] = dict(zip(letters, stack))
+
+    return features
@@ -1,10 +1,15 @@
 """Implementation of pulsing."""
 
-import numpy as np
-from typing import Callable, Dict, List
+from dataclasses import dataclass, replace
+import time
+from typing import Callable, Dict, Iterator, List
 
-from picoscope.parameters import PulsingParams
+from picoscope import constants
+from picoscope.averaging import Accumulator, AveragedWaveform
+from picoscope.metrics import METRICS
+from picoscope.parameters import Channel, PulsingParams
 from picoscope.picoscope import Picoscope2000
+from picoscope.plan import AcquisitionPlan, compile_plan, reconfiguration_order
 from picoscope.utils import parse_payload
 
 
@@ -39,20 +44,31 @@ class Pulse:
         """
 
         self.picoscope_: Picoscope2000 = picoscope_
+        self.keep_variance: bool = False
         self.preparation_fns: List[Callable] = [
             picoscope_.set_averaging,
+            picoscope_.set_sig_gen,
             picoscope_.set_channel,
             picoscope_.set_trigger,
             picoscope_.check_timebase
         ]
-        self.pulsing_fns: List[Callable] =[
-            picoscope_.set_buffer,
+        self.arming_fns: List[Callable] = [
             picoscope_.run_block,
-            picoscope_.pull_trigger,
+            picoscope_.pull_trigger
+        ]
+        self.collection_fns: List[Callable] = [
             picoscope_.wait_ready,
             picoscope_.get_data,
             picoscope_.stop
         ]
+        self.pulsing_fns: List[Callable] = self.arming_fns + self.collection_fns
+        self.rapid_block_fns: List[Callable] = [
+            picoscope_.run_block,
+            picoscope_.pull_trigger,
+            picoscope_.wait_ready,
+            picoscope_.get_data_bulk,
+            picoscope_.stop
+        ]
 
     def prepare(self, pulsing_params: PulsingParams) -> None:
         """Sets up oscilloscope prior to pulsing.
@@ -62,12 +78,14 @@ class Pulse:
             pulsing_params (PulsingParams): Parameters for pulsing.
         """
 
-        self.picoscope_.n_samples = pulsing_params.duration
-        self.picoscope_.enum_voltage_range = pulsing_params.voltage_range
-        self.picoscope_.trigger_properties = pulsing_params.delay
-        
-        for fn in self.preparation_fns:
-            fn()
+        with METRICS.timer(metric='stage', label='prepare'):
+            plan: AcquisitionPlan = compile_plan(pulsing_params=pulsing_params)
+            self.picoscope_.apply_plan(plan=plan)
+            self.keep_variance = plan.keep_variance
+
+            # Each only issues its SDK call(s) if the setting has changed.
+            for fn in self.preparation_fns:
+                fn()
 
     def _pulse(self) -> None:
         """Calls all pulsing functions in sequence
@@ -77,41 +95,296 @@ class Pulse:
         """
 
         for fn in self.pulsing_fns:
-            fn()
+            with METRICS.timer(metric='stage', label=fn.__name__):
+                fn()
+
+    def _pulse_rapid_block(self) -> None:
+        """Arms the oscilloscope once and collects all waveforms in one go.
+
+        The device fills one memory segment per trigger, after which all
+        segments are pulled with a single bulk transfer.
+        """
+
+        self.picoscope_.segment_index = 0
+
+        for fn in self.rapid_block_fns:
+            with METRICS.timer(metric='stage', label=fn.__name__):
+                fn()
+
+    def _pulse_pipelined(self, accumulators: List[Accumulator]) -> None:
+        """Collects one waveform per RunBlock, alternating between two memory segments.
+
+        Each shot is armed as soon as the previous one has been transferred,
+        and the previous one is accumulated while the device captures. The
+        driver can't transfer while capturing, so a cycle takes capture plus
+        transfer, w/o conversion.
+
+        Args:
+            accumulators (List[Accumulator]): One per channel.
+        """
+
+        previous: int = None
+
+        for shot in range(self.picoscope_.avg_num):
+            with METRICS.timer(metric='stage', label='cycle'):
+                self.picoscope_.segment_index = shot % self.picoscope_.n_segments
+
+                for fn in self.arming_fns:
+                    with METRICS.timer(metric='stage', label=fn.__name__):
+                        fn()
+
+                if previous is not None:
+                    self.accumulate(accumulators=accumulators, segment=previous)
+
+                for fn in self.collection_fns:
+                    with METRICS.timer(metric='stage', label=fn.__name__):
+                        fn()
 
-    def pulse(self) -> np.ndarray:
+                previous = self.picoscope_.segment_index
+
+        self.accumulate(accumulators=accumulators, segment=previous)
+
+    def pulse(self) -> AveragedWaveform:
         """Class wrapper for pulsing.
+
+        Raw amplitudes are accumulated as they are collected and only
+        converted to mV once averaged. W/o rapid block, each waveform's full
+        cycle is timed as stage 'cycle', see metrics.
         
         Returns:
-            np.ndarray: The averaged waveform.
+            AveragedWaveform: The averaged waveform of the first channel,
+                with those of all channels under channels if there are several.
         """
 
-        waveforms_mV = np.zeros((self.picoscope_.avg_num, self.picoscope_.n_samples))
+        accumulators: List[Accumulator] = self.make_accumulators()
+        self.picoscope_.set_buffers()
 
-        for segment in range(self.picoscope_.avg_num):
-            self.picoscope_.segment_index = segment
-            self._pulse()
-            waveforms_mV[segment, :] = self.picoscope_.to_mV()
+        if self.picoscope_.rapid_block:
+            self._pulse_rapid_block()
+            self.accumulate(accumulators=accumulators)
+        elif self.picoscope_.pipelined:
+            self._pulse_pipelined(accumulators=accumulators)
+        else:
+            self.picoscope_.segment_index = 0
 
-        return waveforms_mV
+            for _ in range(self.picoscope_.avg_num):
+                with METRICS.timer(metric='stage', label='cycle'):
+                    self._pulse()
+                    self.accumulate(accumulators=accumulators)
 
+        return self.to_waveform(accumulators=accumulators)
 
-def pulse(picoscope_: Picoscope2000, pulsing_params: PulsingParams) -> Dict[str, List[float]]:
-    """Wrapper for acoustic pulsing.
+    def make_accumulators(self) -> List[Accumulator]:
+        """Empty accumulators for the prepared acquisition, one per channel."""
+
+        return [
+            Accumulator(n_samples=self.picoscope_.n_downsampled, keep_variance=self.keep_variance)
+            for _ in self.picoscope_.channels
+        ]
+
+    def to_waveform(self, accumulators: List[Accumulator]) -> AveragedWaveform:
+        """Converts the accumulated shots to the result of a pulse, see pulse."""
+
+        with METRICS.timer(metric='stage', label='to_waveform'):
+            mV_per_adc = self.picoscope_.mV_per_adc
+            sampling_interval = self.picoscope_.effective_sampling_interval
+            waveforms = [
+                accumulator.to_waveform(mV_per_adc=mV_per_adc, sampling_interval=sampling_interval)
+                for accumulator in accumulators
+            ]
+
+        METRICS.increment('acquisitions')
+        METRICS.increment('shots', n=accumulators[0].count)
+
+        if len(waveforms) == 1:
+            return waveforms[0]
+
+        return replace(waveforms[0], channels={
+            Channel(channel).name: waveform
+            for channel, waveform in zip(self.picoscope_.channels, waveforms)
+        })
+
+    def accumulate(self, accumulators: List[Accumulator], segment: int = None) -> None:
+        """Adds the last collected waveforms to the accumulator of their channel.
+
+        Args:
+            accumulators (List[Accumulator]): One per channel.
+            segment (int, optional): Only add the waveform in this memory
+                segment. Defaults to None, i.e. those in all segments.
+        """
+
+        with METRICS.timer(metric='stage', label='accumulate'):
+            for accumulator, adc in zip(accumulators, self.picoscope_.adc_values):
+                accumulator.add(adc if segment is None else adc[segment])
+
+
+def acquire(picoscope_: Picoscope2000, pulsing_params: PulsingParams, check_connection: bool = True) -> AveragedWaveform:
+    """Connects if need be, prepares and pulses.
 
     Args:
         picoscope_ (Picoscope2000): Picoscope instance.
         pulsing_params (PulsingParams): Parameters for pulsing.
+        check_connection (bool, optional): Whether to ping the device first.
+            If not, it's only connected if it has never been (or was found
+            not to be), e.g. when a supervisor keeps an eye on it, see
+            picoscope.supervisor. Defaults to True.
 
     Returns:
-        list[float]: Results from pulse.
+        AveragedWaveform: The averaged waveform.
     """
 
-    if not picoscope_.is_connected:
+    with METRICS.timer(metric='stage', label='is_connected'):
+        is_connected = picoscope_.is_connected if check_connection else picoscope_.was_connected
+
+    if not is_connected:
+        METRICS.increment('reconnects')
         picoscope_.connect()
 
     pulse_ = Pulse(picoscope_=picoscope_)
     pulse_.prepare(pulsing_params=pulsing_params)
-    waveforms_mV = pulse_.pulse()
 
-    return parse_payload(field=waveforms_mV)
+    return pulse_.pulse()
+
+
+def acquire_batch(
+    picoscope_: Picoscope2000,
+    pulsing_params: List[PulsingParams],
+    check_connection: bool = True,
+    record: Callable[..., None] = None
+) -> List[AveragedWaveform]:
+    """Pulses once per set of parameters, back to back.
+
+    The sets are run in the order that minimises device reconfiguration,
+    but the results are returned in the order they were passed.
+
+    Args:
+        picoscope_ (Picoscope2000): Picoscope instance.
+        pulsing_params (List[PulsingParams]): Parameters for each pulse.
+        check_connection (bool, optional): See acquire. Defaults to True.
+        record (Callable, optional): Called right after each pulse with its
+            pulsing_params, waveform, timestamp (unix time at its start [s])
+            and acquire_s (its duration [s]), e.g. AcquisitionOwner.record.
+            Defaults to None.
+
+    Returns:
+        List[AveragedWaveform]: The averaged waveform per set of parameters.
+    """
+
+    with METRICS.timer(metric='stage', label='is_connected'):
+        is_connected = picoscope_.is_connected if check_connection else picoscope_.was_connected
+
+    if not is_connected:
+        METRICS.increment('reconnects')
+        picoscope_.connect()
+
+    pulse_ = Pulse(picoscope_=picoscope_)
+    plans = [compile_plan(pulsing_params=params) for params in pulsing_params]
+    waveforms: List[AveragedWaveform] = [None] * len(pulsing_params)
+
+    for index in reconfiguration_order(plans=plans):
+        timestamp = time.time()
+        start = time.perf_counter()
+        pulse_.prepare(pulsing_params=pulsing_params[index])
+        waveforms[index] = pulse_.pulse()
+
+        if record is not None:
+            record(
+                pulsing_params=pulsing_params[index],
+                waveform=waveforms[index],
+                timestamp=timestamp,
+                acquire_s=time.perf_counter() - start
+            )
+
+    return waveforms
+
+
+def pulse(picoscope_: Picoscope2000, pulsing_params: PulsingParams) -> Dict[str, List[float]]:
+    """Wrapper for acoustic pulsing.
+
+    Args:
+        picoscope_ (Picoscope2000): Picoscope instance.
+        pulsing_params (PulsingParams): Parameters for pulsing.
+
+    Returns:
+        list[float]: Results from pulse.
+    """
+
+    waveform = acquire(picoscope_=picoscope_, pulsing_params=pulsing_params)
+
+    return parse_payload(waveform=waveform)
+
+
+@dataclass
+class Frame:
+    """A single waveform from a stream, along with its timing.
+
+    Attributes:
+        index (int): Frame number, counting from zero.
+        timestamp (float): Unix time at which the frame was collected [s].
+        lateness_s (float): How long after its planned time the frame
+            was started [s].
+        n_late (int): No. of frames so far that started late, i.e. more than
+            constants.STREAM_LATE_FRACTION of a period after their planned time.
+        n_dropped (int): No. of planned frames skipped so far because
+            collection couldn't keep up with the repetition rate.
+        waveform (AveragedWaveform): The averaged waveform.
+    """
+
+    index: int
+    timestamp: float
+    lateness_s: float
+    n_late: int
+    n_dropped: int
+    waveform: AveragedWaveform
+
+
+def stream(acquire_fn: Callable[[], AveragedWaveform], rate: float, n_frames: int = None) -> Iterator[Frame]:
+    """Pulses repeatedly at a fixed repetition rate.
+
+    Frames are collected on a monotonic schedule. If a frame takes longer
+    than a period, the slots it overran are dropped rather than collected
+    back to back.
+
+    Args:
+        acquire_fn (Callable[[], AveragedWaveform]): Collects one frame, e.g.
+            acquire() with its arguments bound. Preparing the oscilloscope
+            for every frame is free if nothing changed in between.
+        rate (float): Repetition rate [Hz].
+        n_frames (int, optional): Stop after this many frames.
+            Defaults to None, i.e. until the consumer stops iterating.
+
+    Yields:
+        Frame: The next frame.
+    """
+
+    period = 1 / rate
+    n_late = n_dropped = index = 0
+    planned = time.monotonic()
+
+    while n_frames is None or index < n_frames:
+        delay = planned - time.monotonic()
+
+        if delay > 0:
+            time.sleep(delay)
+
+        lateness_s = time.monotonic() - planned
+        n_late += lateness_s > period * constants.STREAM_LATE_FRACTION
+        timestamp = time.time()
+        waveform = acquire_fn()
+
+        yield Frame(
+            index=index,
+            timestamp=timestamp,
+            lateness_s=lateness_s,
+            n_late=n_late,
+            n_dropped=n_dropped,
+            waveform=waveform
+        )
+
+        index += 1
+        planned += period
+        overrun = int((time.monotonic() - planned) // period)
+
+        if overrun > 0:
+            n_dropped += overrun
+            planned += overrun * period
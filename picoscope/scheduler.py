@@ -0,0 +1,365 @@
+"""Periodic pulsing, driven by the server rather than by a client's requests.
+
+Each schedule pulses a device at a fixed interval on a monotonic clock,
+for a set duration or until cancelled, and delivers every shot to a sink
+that clients fetch from in bulk. The planned and actual start of every
+shot are recorded, so jitter can be told apart from the signal.
+
+Example:
+    scheduler = Scheduler()
+    scheduler.create(name='cycling', owner=device.owner, device_id=device.id,
+                     pulsing_params=pulsing_params, interval_s=10.)
+    ...
+    shots = scheduler.get('cycling').sink.since(index=-1)
+"""
+
+from collections import deque
+from dataclasses import asdict, dataclass
+from enum import Enum
+import json
+import math
+import os
+import threading
+import time
+from typing import Deque, Dict, List, Union
+
+from picoscope import constants
+from picoscope.acquisition import AcquisitionOwner
+from picoscope.averaging import AveragedWaveform
+from picoscope.parameters import PulsingParams
+from picoscope.utils import parse_payload
+
+
+@dataclass
+class Shot:
+    """A single acquisition of a schedule.
+
+    Attributes:
+        index (int): Slot no., counting from zero. Slots skipped because the
+            previous shot overran are dropped, so indices can have gaps.
+        planned_at (float): Unix time the shot was planned for [s].
+        started_at (float): Unix time the device started on it [s], on the
+            same (monotonic) clock as planned_at.
+        waveform (AveragedWaveform, optional): The averaged waveform, None if it failed.
+        error (str, optional): Why it failed, None if it didn't.
+    """
+
+    index: int
+    planned_at: float
+    started_at: float
+    waveform: AveragedWaveform = None
+    error: str = None
+
+    @property
+    def lateness_s(self) -> float:
+        """How long after its planned time the shot started [s]."""
+        return self.started_at - self.planned_at
+
+    def to_dict(self) -> Dict[str, Union[int, float, str, List[float]]]:
+        """Http-ready representation, with the waveform under the same keys as /get_wave."""
+
+        dict_ = {
+            'index': self.index,
+            'planned_at': self.planned_at,
+            'started_at': self.started_at,
+            'lateness_s': self.lateness_s
+        }
+
+        if self.waveform is not None:
+            dict_.update(parse_payload(waveform=self.waveform))
+
+        if self.error is not None:
+            dict_['error'] = self.error
+
+        return dict_
+
+
+class MemorySink:
+    """Keeps the most recent shots in memory. Thread safe."""
+
+    def __init__(self, max_shots: int = constants.SCHEDULE_BUFFER_SIZE):
+        """
+        Args:
+            max_shots (int, optional): Max. no. of shots kept, the oldest are
+                dropped beyond that. Defaults to constants.SCHEDULE_BUFFER_SIZE.
+        """
+
+        self._shots: Deque[Shot] = deque(maxlen=max_shots)
+        self._lock: threading.Lock = threading.Lock()
+
+    def append(self, shot: Shot) -> None:
+        with self._lock:
+            self._shots.append(shot)
+
+    def since(self, index: int = -1) -> List[Shot]:
+        """Shots kept with an index above _index_, oldest first.
+
+        Args:
+            index (int, optional): Index of the last shot fetched. Defaults to
+                -1, i.e. all.
+
+        Returns:
+            List[Shot]: The shots.
+        """
+
+        with self._lock:
+            return [shot for shot in self._shots if shot.index > index]
+
+
+class FileSink:
+    """Appends shots to a JSON lines file, one line per shot as in Shot.to_dict.
+
+    Nothing is kept in memory, so since() is always empty.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): The file. Created along with its directory if need be.
+        """
+
+        self.path: str = path
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def append(self, shot: Shot) -> None:
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(shot.to_dict()) + '\n')
+
+    def since(self, index: int = -1) -> List[Shot]:
+        return []
+
+
+Sink = Union[MemorySink, FileSink]
+
+
+class ScheduleStatus(Enum):
+    RUNNING = 'running'
+    DONE = 'done'
+    CANCELLED = 'cancelled'
+
+
+class Schedule:
+    """Pulses a device every interval_s, on a thread of its own.
+
+    Shots are queued with the device's AcquisitionOwner at their planned
+    time, so they run in between other requests. If a shot takes longer than
+    the interval, the slots it overran are dropped rather than collected
+    back to back, as in pulse.stream.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        owner: AcquisitionOwner,
+        device_id: str,
+        pulsing_params: PulsingParams,
+        interval_s: float,
+        duration_s: float = None,
+        sink: Sink = None
+    ):
+        """
+        Args:
+            name (str): Identifies the schedule.
+            owner (AcquisitionOwner): Owner of the device to pulse.
+            device_id (str): ID of the device.
+            pulsing_params (PulsingParams): Parameters for pulsing.
+            interval_s (float): Time between the planned starts of shots [s].
+            duration_s (float, optional): Stop after this long [s]. Defaults
+                to None, i.e. until cancelled.
+            sink (Sink, optional): Where shots are delivered. Defaults to a MemorySink.
+        """
+
+        if not (math.isfinite(interval_s) and interval_s > 0) \
+                or (duration_s is not None and not (math.isfinite(duration_s) and duration_s > 0)):
+            raise ValueError(f'Invalid interval of {interval_s}s or duration of {duration_s}s.')
+
+        self.name: str = name
+        self.owner: AcquisitionOwner = owner
+        self.device_id: str = device_id
+        self.pulsing_params: PulsingParams = pulsing_params
+        self.interval_s: float = interval_s
+        self.duration_s: float = duration_s
+        self.sink: Sink = MemorySink() if sink is None else sink
+        self.started_at: float = None
+        self.n_shots: int = 0
+        self.n_failed: int = 0
+        self.n_dropped: int = 0
+        self.max_lateness_s: float = 0.
+
+        self._total_lateness_s: float = 0.
+        self._start: float = None  # time.monotonic() at started_at
+        self._cancelled: threading.Event = threading.Event()
+        self._was_cancelled: bool = False  # Before it was done
+        self._thread: threading.Thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def status(self) -> ScheduleStatus:
+        if self._thread.is_alive():
+            return ScheduleStatus.RUNNING
+
+        return ScheduleStatus.CANCELLED if self._was_cancelled else ScheduleStatus.DONE
+
+    def start(self) -> 'Schedule':
+        """Starts pulsing, the first shot right away. Returns self."""
+
+        self._start = time.monotonic()
+        self.started_at = time.time()
+        self._thread.start()
+
+        return self
+
+    def cancel(self) -> None:
+        """Stops pulsing. A shot in flight is still delivered."""
+        self._cancelled.set()
+
+    def join(self, timeout: float = None) -> None:
+        self._thread.join(timeout=timeout)
+
+    def _to_unix(self, monotonic: float) -> float:
+        return self.started_at + monotonic - self._start
+
+    def _shot(self, index: int, planned: float) -> Shot:
+        """Acquires a shot. Runs on the owner's worker thread, so it's delivered by the caller."""
+
+        started = time.monotonic()
+        shot = Shot(index=index, planned_at=self._to_unix(planned), started_at=self._to_unix(started))
+
+        try:
+            shot.waveform = self.owner.run_acquisition(pulsing_params=self.pulsing_params)
+
+        except Exception as e:
+            shot.error = str(e)
+
+        return shot
+
+    def _deliver(self, shot: Shot) -> None:
+        """Counts a shot and hands it to the sink, off the owner's worker thread."""
+
+        self.n_shots += 1
+        self.n_failed += shot.error is not None
+        self._total_lateness_s += shot.lateness_s
+        self.max_lateness_s = max(self.max_lateness_s, shot.lateness_s)
+        self.sink.append(shot)
+
+    def _run(self) -> None:
+        index = 0
+
+        while self.duration_s is None or index * self.interval_s < self.duration_s:
+            planned = self._start + index * self.interval_s
+
+            if self._cancelled.wait(timeout=max(planned - time.monotonic(), 0.)):
+                self._was_cancelled = True
+
+                return
+
+            self._deliver(shot=self.owner.submit(self._shot, index=index, planned=planned).result())
+
+            index += 1
+            overrun = int((time.monotonic() - (self._start + index * self.interval_s)) // self.interval_s)
+
+            if overrun > 0:
+                self.n_dropped += overrun
+                index += overrun
+
+    def to_dict(self) -> Dict[str, Union[str, float, int, Dict]]:
+        """Http-ready status, w/o the shots."""
+
+        dict_ = {
+            'name': self.name,
+            'device': self.device_id,
+            'status': self.status.value,
+            'pulsing_params': asdict(self.pulsing_params),
+            'interval_s': self.interval_s,
+            'duration_s': self.duration_s,
+            'started_at': self.started_at,
+            'n_shots': self.n_shots,
+            'n_failed': self.n_failed,
+            'n_dropped': self.n_dropped,
+            'mean_lateness_s': self._total_lateness_s / self.n_shots if self.n_shots else None,
+            'max_lateness_s': self.max_lateness_s
+        }
+
+        if isinstance(self.sink, FileSink):
+            dict_['path'] = self.sink.path
+
+        return dict_
+
+
+class Scheduler:
+    """Schedules by name. Thread safe.
+
+    Schedules are kept, incl. their shots, until removed, also after
+    they're done.
+    """
+
+    def __init__(self, directory: str = constants.SCHEDULE_DIR):
+        """
+        Args:
+            directory (str, optional): Where file sinks write to, one file per
+                schedule. Defaults to constants.SCHEDULE_DIR.
+        """
+
+        self.directory: str = directory
+
+        self._schedules: Dict[str, Schedule] = dict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._schedules.values()))
+
+    def create(self, name: str, sink: str = 'memory', **kwargs) -> Schedule:
+        """Creates a schedule and starts it.
+
+        Args:
+            name (str): Identifies the schedule. Letters, digits, '-' and '_' only.
+            sink (str, optional): 'memory' or 'file', the latter writing to
+                <directory>/<name>.jsonl. Defaults to 'memory'.
+            **kwargs: Other Schedule arguments, i.e. owner, device_id,
+                pulsing_params, interval_s and optionally duration_s.
+
+        Returns:
+            Schedule: The schedule, running. Raises ValueError if the name is
+                invalid or taken, or the sink unknown.
+        """
+
+        if not name or not name.replace('-', '').replace('_', '').isalnum():
+            raise ValueError(f'Invalid schedule name {name}.')
+
+        sinks = {
+            'memory': MemorySink,
+            'file': lambda: FileSink(path=os.path.join(self.directory, f'{name}.jsonl'))
+        }
+
+        if sink not in sinks:
+            raise ValueError(f'Unknown sink {sink}, choose from {list(sinks)}.')
+
+        with self._lock:
+            if name in self._schedules:
+                raise ValueError(f'There is already a schedule named {name}.')
+
+            schedule = Schedule(name=name, sink=sinks[sink](), **kwargs)
+            self._schedules[name] = schedule
+
+        return schedule.start()
+
+    def get(self, name: str) -> Schedule:
+        """A schedule by name. Raises KeyError if there's none."""
+
+        with self._lock:
+            return self._schedules[name]
+
+    def remove(self, name: str) -> Schedule:
+        """Cancels a schedule, if still running, and forgets it.
+
+        Returns:
+            Schedule: The schedule. Raises KeyError if there's none by that name.
+        """
+
+        with self._lock:
+            schedule = self._schedules.pop(name)
+
+        schedule.cancel()
+
+        return schedule
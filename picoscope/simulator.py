@@ -0,0 +1,471 @@
+"""Simulated ps2000a driver, for developing and benchmarking w/o a picoscope.
+
+Mimics the signatures and status codes of the picosdk ps2000a functions
+used by Picoscope, as well as the timing of the device: RunBlock takes as
+long as it takes the pulser to fire once per capture, IsReady reports
+accordingly and GetValues takes as long as the USB transfer would.
+Waveforms are ultrasonic echoes with gaussian noise, synthesized into
+whichever buffers are registered.
+"""
+
+import ctypes
+from dataclasses import dataclass
+import itertools
+import numpy as np
+import threading
+import time
+from typing import Callable, Dict, Iterator, Tuple, Union
+
+from picosdk.constants import PICO_STATUS
+
+from picoscope.parameters import DownsamplingMode, channel_input_ranges_mV
+
+CArg = Union[int, ctypes._SimpleCData, ctypes._Pointer]
+
+
+@dataclass(frozen=True)
+class SimulationProperties:
+    """Parameters of the simulated device and sample.
+
+    Attributes:
+        center_frequency (float): Center frequency of the transducer [Hz].
+        n_cycles (float): Length of each echo in cycles of center_frequency.
+        echo_times_us (Tuple[float, ...]): Time of each echo after the trigger [us].
+        echo_amplitudes_V (Tuple[float, ...]): Peak amplitude of each echo [V].
+        noise_V (float): Standard deviation of gaussian noise [V].
+        pulse_repetition_rate (float): Rate at which the pulser triggers
+            the oscilloscope [Hz].
+        transfer_rate (float): USB transfer rate [samples/s].
+        call_latency_s (float): Overhead of every driver call [s].
+        memory_samples (int): Sample memory of the device.
+        max_segments (int): Maximum number of memory segments.
+        max_adc (int): ADC count at full scale.
+        seed (int, optional): Seed for the noise. Defaults to None.
+        serial (str): Serial no. of the simulated unit.
+    """
+
+    center_frequency: float = 2.25E6
+    n_cycles: float = 3.
+    echo_times_us: Tuple[float, ...] = (30., 60., 90.)
+    echo_amplitudes_V: Tuple[float, ...] = (0.4, 0.2, 0.1)
+    noise_V: float = 0.01
+    pulse_repetition_rate: float = 1E3
+    transfer_rate: float = 3E7
+    call_latency_s: float = 5E-5
+    memory_samples: int = 64_000_000
+    max_segments: int = 10_000
+    max_adc: int = 32512
+    seed: int = None
+    serial: str = 'SIM00/0001'
+
+
+def _value(arg: CArg) -> int:
+    """The python value of an argument, whether passed as ctypes or not."""
+    return getattr(arg, 'value', arg)
+
+
+def _obj(arg: ctypes._Pointer) -> ctypes._SimpleCData:
+    """The object a ctypes.byref() argument refers to."""
+    return arg._obj
+
+
+def sampling_interval(timebase: int) -> float:
+    """Sampling interval of a 2000A-level picoscope, refer to programmer's guide.
+
+    Args:
+        timebase (int): Enumerated sampling interval.
+
+    Returns:
+        float: Sampling interval [s].
+    """
+
+    if timebase < 3:
+        return 2**timebase / 1E9
+
+    return (timebase - 2) / 125E6
+
+
+def downsample(adc: np.ndarray, mode: int, ratio: int) -> np.ndarray:
+    """Downsampling as done by GetValues, refer to programmer's guide.
+
+    Args:
+        adc (np.ndarray): Raw amplitudes [ADC counts].
+        mode (int): Enumerated DownsamplingMode.
+        ratio (int): Samples per downsampled value.
+
+    Returns:
+        np.ndarray: Downsampled amplitudes [ADC counts], len(adc) // ratio
+            of them unless mode is NONE.
+    """
+
+    if mode == DownsamplingMode.NONE.value:
+        return adc
+
+    n_values = len(adc) // ratio
+
+    if mode == DownsamplingMode.DECIMATE.value:
+        return adc[:n_values * ratio:ratio]
+
+    return np.round(adc[:n_values * ratio].reshape(n_values, ratio).mean(axis=1))
+
+
+class SimulatedPs2000a:
+    """Stand-in for picosdk.ps2000a.ps2000a.
+
+    Only the functions used by Picoscope are implemented, with the same
+    arguments, returning the same status codes. Each instance is a unit
+    of its own, with a handle unique to the process.
+    """
+
+    _handles: Iterator[int] = itertools.count(start=1)
+
+    def __init__(self, properties: SimulationProperties = SimulationProperties()):
+        """
+        Args:
+            properties (SimulationProperties, optional): Parameters of the
+                simulated device and sample. Defaults to SimulationProperties().
+        """
+
+        self.properties: SimulationProperties = properties
+
+        self._rng: np.random.Generator = np.random.default_rng(seed=properties.seed)
+        self._handle: int = 0  # 0 means closed
+        self._n_segments: int = 1
+        self._n_captures: int = 1
+        self._ranges: Dict[int, int] = dict()
+        self._trigger_delay: int = 0
+        self._trigger_source: int = None
+        self._timebase: int = 0
+        self._n_samples: int = 0
+        self._buffers: Dict[Tuple[int, int], Tuple[ctypes._Pointer, int, int]] = dict()  # Incl. mode
+        self._ready_at: float = None
+        self._sig_gen_shots: int = 1  # Pulses per software trigger
+        self._n_triggered: int = 0  # Captures of the running block triggered by the pulser, the rest auto trigger
+        self._captured: Tuple[int, int] = None  # Segments of the last block, from & to
+        self._clean: Dict[Tuple, np.ndarray] = dict()
+
+    def functions(self) -> Dict[str, Callable]:
+        """Mapping of a readable name to simulated SDK functions, see Picoscope.__init__."""
+
+        names = [
+            'OpenUnit', 'SetChannel', 'GetTimebase2', 'SetSimpleTrigger', 'RunBlock',
+            'SigGenSoftwareControl', 'SetSigGenBuiltIn', 'IsReady', 'SetDataBuffer', 'GetValues', 'GetValuesBulk',
+            'Stop', 'CloseUnit', 'GetAnalogueOffset', 'SetNoOfCaptures', 'MemorySegments',
+            'PingUnit', 'MaximumValue', 'BlockReady', 'EnumerateUnits'
+        ]
+
+        return {name: getattr(self, name) for name in names}
+
+    def _call(self, handle: CArg) -> int:
+        """Common to all calls on an open unit: latency and handle check."""
+
+        time.sleep(self.properties.call_latency_s)
+
+        if self._handle == 0 or _value(handle) != self._handle:
+            return PICO_STATUS['PICO_INVALID_HANDLE']
+
+        return PICO_STATUS['PICO_OK']
+
+    def EnumerateUnits(self, count: ctypes._Pointer, serials: ctypes.Array, serial_length: ctypes._Pointer) -> int:
+        time.sleep(self.properties.call_latency_s)
+        is_available = self._handle == 0
+        serials_ = self.properties.serial.encode() if is_available else b''
+
+        if len(serials_) >= _obj(serial_length).value:
+            return PICO_STATUS['PICO_INVALID_PARAMETER']
+
+        _obj(count).value = int(is_available)
+        serials.value = serials_
+        _obj(serial_length).value = len(serials_)
+
+        return PICO_STATUS['PICO_OK']
+
+    def OpenUnit(self, handle: ctypes._Pointer, serial: Union[ctypes.c_char_p, None]) -> int:
+        time.sleep(self.properties.call_latency_s)
+        serial = _value(serial)
+
+        if serial is not None and serial.decode() != self.properties.serial:
+            _obj(handle).value = 0
+
+            return PICO_STATUS['PICO_NOT_FOUND']
+
+        self._handle = next(SimulatedPs2000a._handles)
+        _obj(handle).value = self._handle
+
+        return PICO_STATUS['PICO_OK']
+
+    def CloseUnit(self, handle: CArg) -> int:
+        status = self._call(handle)
+        self._handle = 0
+        self._buffers.clear()
+
+        return status
+
+    def PingUnit(self, handle: CArg) -> int:
+        return self._call(handle)
+
+    def MaximumValue(self, handle: CArg, value: ctypes._Pointer) -> int:
+        status = self._call(handle)
+        _obj(value).value = self.properties.max_adc
+
+        return status
+
+    def SetChannel(self, handle: CArg, channel: int, enabled: int, coupling: int,
+                   range_: int, analog_offset: float) -> int:
+        status = self._call(handle)
+
+        if not 0 <= range_ < len(channel_input_ranges_mV()):
+            return PICO_STATUS['PICO_INVALID_VOLTAGE_RANGE']
+
+        if enabled:
+            self._ranges[channel] = range_
+        else:
+            self._ranges.pop(channel, None)
+
+        return status
+
+    def GetAnalogueOffset(self, handle: CArg, range_: int, coupling: int,
+                          maximum_voltage: ctypes._Pointer, minimum_voltage: ctypes._Pointer) -> int:
+        status = self._call(handle)
+        _obj(maximum_voltage).value = _obj(minimum_voltage).value = 0.
+
+        return status
+
+    def MemorySegments(self, handle: CArg, n_segments: int, n_max_samples: ctypes._Pointer) -> int:
+        status = self._call(handle)
+
+        if not 0 < n_segments <= self.properties.max_segments:
+            return PICO_STATUS['PICO_TOO_MANY_SEGMENTS']
+
+        self._n_segments = n_segments
+        self._buffers.clear()
+        _obj(n_max_samples).value = self.properties.memory_samples // n_segments
+
+        return status
+
+    def SetNoOfCaptures(self, handle: CArg, n_captures: int) -> int:
+        status = self._call(handle)
+
+        if n_captures > self._n_segments:
+            return PICO_STATUS['PICO_NOT_ENOUGH_SEGMENTS']
+
+        self._n_captures = n_captures
+
+        return status
+
+    def GetTimebase2(self, handle: CArg, timebase: int, n_samples: int, time_interval_ns: ctypes._Pointer,
+                     oversample: CArg, max_samples: ctypes._Pointer, segment_index: int) -> int:
+        status = self._call(handle)
+        n_max_samples = self.properties.memory_samples // self._n_segments
+
+        if n_samples > n_max_samples:
+            return PICO_STATUS['PICO_TOO_MANY_SAMPLES']
+
+        _obj(time_interval_ns).value = sampling_interval(timebase=timebase) * 1E9
+        _obj(max_samples).value = n_max_samples
+
+        return status
+
+    def SetSimpleTrigger(self, handle: CArg, enable: int, source: int, threshold: int,
+                         direction: int, delay: int, auto_trigger_ms: int) -> int:
+        status = self._call(handle)
+        self._trigger_delay = delay
+        self._trigger_source = source
+
+        return status
+
+    def SetSigGenBuiltIn(self, handle: CArg, offset_voltage: int, pk_to_pk: int, wave_type: int,
+                         start_frequency: float, stop_frequency: float, increment: float, dwell_time: float,
+                         sweep_type: int, operation: int, shots: int, sweeps: int, trigger_type: int,
+                         trigger_source: int, ext_in_threshold: int) -> int:
+        status = self._call(handle)
+        self._sig_gen_shots = max(shots, 1)
+
+        return status
+
+    def SigGenSoftwareControl(self, handle: CArg, state: int) -> int:
+        status = self._call(handle)
+        self._n_triggered += self._sig_gen_shots
+
+        return status
+
+    def SetDataBuffer(self, handle: CArg, channel: int, buffer: ctypes._Pointer, buffer_length: int,
+                      segment_index: int, mode: int) -> int:
+        status = self._call(handle)
+
+        if segment_index >= self._n_segments:
+            return PICO_STATUS['PICO_SEGMENT_OUT_OF_RANGE']
+
+        if not isinstance(buffer, ctypes._Pointer):  # I.e. passed through ctypes.byref()
+            buffer = ctypes.cast(ctypes.addressof(_obj(buffer)), ctypes.POINTER(ctypes.c_int16))
+
+        self._buffers[(channel, segment_index)] = (buffer, buffer_length, mode)
+
+        return status
+
+    def RunBlock(self, handle: CArg, n_pre_trigger_samples: int, n_post_trigger_samples: int,
+                 timebase: int, oversample: CArg, time_indisposed_ms: ctypes._Pointer,
+                 segment_index: int, lp_ready: Callable, p_parameter: None) -> int:
+        status = self._call(handle)
+
+        if segment_index + self._n_captures > self._n_segments:
+            return PICO_STATUS['PICO_SEGMENT_OUT_OF_RANGE']
+
+        self._timebase = timebase
+        self._n_samples = n_pre_trigger_samples + n_post_trigger_samples
+        self._captured = (segment_index, segment_index + self._n_captures - 1)
+        self._n_triggered = 0
+
+        # One trigger from the pulser per capture.
+        duration_s = self._n_captures / self.properties.pulse_repetition_rate \
+            + self._n_samples * sampling_interval(timebase=timebase)
+        self._ready_at = time.perf_counter() + duration_s
+
+        if time_indisposed_ms is not None:
+            _obj(time_indisposed_ms).value = int(duration_s * 1E3)
+
+        if lp_ready is not None:
+            timer = threading.Timer(duration_s, lp_ready, args=(self._handle, PICO_STATUS['PICO_OK'], None))
+            timer.daemon = True
+            timer.start()
+
+        return status
+
+    def _is_ready(self) -> bool:
+        return self._ready_at is not None and time.perf_counter() >= self._ready_at
+
+    def IsReady(self, handle: CArg, ready: ctypes._Pointer) -> int:
+        status = self._call(handle)
+        _obj(ready).value = int(self._is_ready())
+
+        return status
+
+    def BlockReady(self, fn: Callable) -> Callable:
+        """Stand-in for ps2000a.BlockReadyType. No C callback needed."""
+        return fn
+
+    def _clean_signal(self, n_samples: int, delay: int, timebase: int) -> np.ndarray:
+        """Noiseless echoes [V], cached as they only depend on the window."""
+
+        key = (n_samples, delay, timebase)
+
+        if key not in self._clean:
+            properties = self.properties
+            time_s = (delay + np.arange(n_samples)) * sampling_interval(timebase=timebase)
+            width_s = properties.n_cycles / properties.center_frequency / 2
+            signal = np.zeros(n_samples)
+
+            for echo_time_us, amplitude in zip(properties.echo_times_us, properties.echo_amplitudes_V):
+                offset = time_s - echo_time_us * 1E-6
+                signal += amplitude * np.exp(-0.5 * (offset / width_s)**2) \
+                    * np.sin(2 * np.pi * properties.center_frequency * offset)
+
+            self._clean[key] = signal
+
+        return self._clean[key]
+
+    def _fill(self, segment: int, n_samples: int, mode: int, ratio: int) -> int:
+        """Synthesizes a capture into every buffer registered for _segment_ and _mode_.
+
+        Returns:
+            int: Overflow bit field, a bit per channel that went out of range.
+        """
+
+        overflow = 0
+        signal = self._clean_signal(n_samples=n_samples, delay=self._trigger_delay, timebase=self._timebase)
+
+        # Auto triggered, so no echo, if the pulser wasn't or the trigger's source is disabled.
+        if segment - self._captured[0] >= self._n_triggered or self._trigger_source not in self._ranges:
+            signal = np.zeros(n_samples)
+        max_adc = self.properties.max_adc
+
+        for (channel, segment_index), (buffer, buffer_length, mode_) in self._buffers.items():
+            if segment_index != segment or channel not in self._ranges or mode_ != mode:
+                continue
+
+            full_scale_V = channel_input_ranges_mV()[self._ranges[channel]] * 1E-3
+            noisy = signal + self._rng.normal(scale=self.properties.noise_V, size=n_samples)
+            adc = np.round(noisy / full_scale_V * max_adc)
+
+            if np.any(np.abs(adc) > max_adc):
+                overflow |= 1 << channel
+
+            adc = downsample(adc=adc, mode=mode, ratio=ratio)
+            n_written = min(len(adc), buffer_length)
+            view = np.ctypeslib.as_array(buffer, shape=(buffer_length,))
+            view[:n_written] = np.clip(adc[:n_written], -max_adc, max_adc)
+
+        return overflow
+
+    def _transfer(self, segments: range, n_samples: int, mode: int, ratio: int) -> Tuple[int, int, list]:
+        """Fills the buffers of _segments_, taking as long as the downsampled values take over USB.
+
+        Returns:
+            Tuple[int, int, list]: Status, no. of values per buffer and
+                overflow bit field per segment.
+        """
+
+        if not self._is_ready():
+            return PICO_STATUS['PICO_BUSY'], 0, []
+
+        if self._captured is None or segments.start < self._captured[0] or segments.stop - 1 > self._captured[1]:
+            return PICO_STATUS['PICO_NO_SAMPLES_AVAILABLE'], 0, []
+
+        if mode != DownsamplingMode.NONE.value and ratio < 1:
+            return PICO_STATUS['PICO_INVALID_PARAMETER'], 0, []
+
+        n_values = n_samples if mode == DownsamplingMode.NONE.value else n_samples // ratio
+        n_channels = len({channel for channel, _ in self._buffers if channel in self._ranges})
+        time.sleep(len(segments) * n_values * n_channels / self.properties.transfer_rate)
+        overflows = [self._fill(segment=segment, n_samples=n_samples, mode=mode, ratio=ratio) for segment in segments]
+
+        return PICO_STATUS['PICO_OK'], n_values, overflows
+
+    def GetValues(self, handle: CArg, start_index: int, n_samples: ctypes._Pointer, downsampling_ratio: int,
+                  downsampling_mode: int, segment_index: int, overflow: ctypes._Pointer) -> int:
+        status = self._call(handle)
+
+        if status != PICO_STATUS['PICO_OK']:
+            return status
+
+        status, n_values, overflows = self._transfer(
+            segments=range(segment_index, segment_index + 1),
+            n_samples=min(_obj(n_samples).value, self._n_samples),
+            mode=downsampling_mode,
+            ratio=downsampling_ratio
+        )
+
+        if status == PICO_STATUS['PICO_OK']:
+            _obj(n_samples).value = n_values
+            _obj(overflow).value = overflows[0]
+
+        return status
+
+    def GetValuesBulk(self, handle: CArg, n_samples: ctypes._Pointer, from_segment_index: int,
+                      to_segment_index: int, downsampling_ratio: int, downsampling_mode: int,
+                      overflow: ctypes._Pointer) -> int:
+        status = self._call(handle)
+
+        if status != PICO_STATUS['PICO_OK']:
+            return status
+
+        status, n_values, overflows = self._transfer(
+            segments=range(from_segment_index, to_segment_index + 1),
+            n_samples=min(_obj(n_samples).value, self._n_samples),
+            mode=downsampling_mode,
+            ratio=downsampling_ratio
+        )
+
+        if status == PICO_STATUS['PICO_OK']:
+            _obj(n_samples).value = n_values
+
+            for index, overflow_ in enumerate(overflows):
+                _obj(overflow)[index] = overflow_
+
+        return status
+
+    def Stop(self, handle: CArg) -> int:
+        status = self._call(handle)
+        self._ready_at = None
+
+        return status
@@ -0,0 +1,191 @@
+"""Keeps an eye on a device's connection, so that requests don't have to.
+
+Heartbeats go through the device's AcquisitionOwner like any other call,
+so they never interleave with a measurement, and only when the device
+has been idle for a while, so they never delay one either. The status
+is cached for http routes to read w/o touching the device.
+
+Example:
+    supervisor = ConnectionSupervisor(owner=device.owner).start()
+    is_connected = supervisor.is_connected
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Union
+
+from picoscope import constants
+from picoscope.acquisition import AcquisitionOwner
+from picoscope.metrics import METRICS
+
+
+class ConnectionSupervisor:
+    """Heartbeats a device when idle and reconnects with exponential backoff if it's lost.
+
+    Once started, the owner's acquisitions no longer ping the device before
+    pulsing (see AcquisitionOwner.check_connection); a successful
+    acquisition counts as a heartbeat.
+
+    Attributes:
+        is_connected (bool): Status as of the last heartbeat or acquisition,
+            None until the first.
+        checked_at (float): Unix time of the last status [s], None until the first.
+        n_reconnects (int): No. of times the connection was restored.
+        n_failed_reconnects (int): No. of attempts to reconnect that failed.
+    """
+
+    def __init__(
+        self,
+        owner: AcquisitionOwner,
+        interval_s: float = constants.HEARTBEAT_INTERVAL_S,
+        max_backoff_s: float = constants.RECONNECT_MAX_BACKOFF_S
+    ):
+        """
+        Args:
+            owner (AcquisitionOwner): Owner of the device to supervise.
+            interval_s (float, optional): Time between heartbeats [s].
+                Defaults to constants.HEARTBEAT_INTERVAL_S.
+            max_backoff_s (float, optional): Max. time between attempts to
+                reconnect [s], which doubles from interval_s with every
+                failed one. Defaults to constants.RECONNECT_MAX_BACKOFF_S.
+        """
+
+        self.owner: AcquisitionOwner = owner
+        self.interval_s: float = interval_s
+        self.max_backoff_s: float = max_backoff_s
+        self.is_connected: bool = None
+        self.checked_at: float = None
+        self.n_reconnects: int = 0
+        self.n_failed_reconnects: int = 0
+
+        self._downtime_s: float = 0.
+        self._down_since: float = None  # time.monotonic() at which the connection was lost
+        self._stopped: threading.Event = threading.Event()
+        self._thread: threading.Thread = threading.Thread(target=self._supervise, daemon=True)
+
+    @property
+    def downtime_s(self) -> float:
+        """Total time the device was found disconnected, incl. any ongoing outage [s]."""
+
+        down_since = self._down_since
+
+        return self._downtime_s + (0. if down_since is None else time.monotonic() - down_since)
+
+    def status(self) -> Dict[str, Union[bool, float, int]]:
+        """Http-ready status, w/o touching the device."""
+
+        return {
+            'is_connected': self.is_connected,
+            'checked_at': self.checked_at,
+            'reconnects': self.n_reconnects,
+            'failed_reconnects': self.n_failed_reconnects,
+            'downtime_s': self.downtime_s
+        }
+
+    def start(self) -> 'ConnectionSupervisor':
+        """Starts heartbeating, the first one right away. Returns self."""
+
+        self.owner.check_connection = False
+        self._thread.start()
+
+        return self
+
+    def stop(self) -> None:
+        """Stops heartbeating and has acquisitions ping the device again."""
+
+        self._stopped.set()
+        self._thread.join()
+        self.owner.check_connection = True
+
+    def _update(self, is_connected: bool) -> None:
+        now = time.monotonic()
+
+        if is_connected and self._down_since is not None:
+            self._downtime_s += now - self._down_since
+            self._down_since = None
+        elif not is_connected and self._down_since is None:
+            self._down_since = now
+
+        self.is_connected = is_connected
+        self.checked_at = time.time()
+
+    def _unless_leased(self, fn: Callable) -> Any:
+        """fn's return value, or None w/o calling it if an acquisition holds a lease. Runs on the worker."""
+        return None if self.owner.is_leased else fn()
+
+    def heartbeat(self) -> bool:
+        """Pings the device, through the owner.
+
+        Returns:
+            bool: Whether it's connected. None if skipped, as a multi-step
+                acquisition was found in flight, see AcquisitionOwner.lease.
+        """
+
+        picoscope_ = self.owner.picoscope_
+
+        with METRICS.timer(metric='stage', label='heartbeat'):
+            is_connected = self.owner.run(self._unless_leased, lambda: picoscope_.is_connected)
+
+        if is_connected is not None:
+            self._update(is_connected=is_connected)
+
+        return is_connected
+
+    def reconnect(self) -> bool:
+        """Connects the device again, through the owner.
+
+        Returns:
+            bool: Whether it worked. None if skipped, as for heartbeat.
+        """
+
+        def connect() -> bool:
+            self.owner.picoscope_.connect()
+
+            return True
+
+        try:
+            is_connected = self.owner.run(self._unless_leased, connect) and self.heartbeat()
+
+        except Exception:
+            is_connected = False
+
+        if is_connected:
+            self.n_reconnects += 1
+            METRICS.increment('supervisor_reconnects')
+        elif is_connected is not None:
+            self.n_failed_reconnects += 1
+
+        return is_connected
+
+    def _supervise(self) -> None:
+        delay_s = 0.
+        backoff_s = self.interval_s
+
+        while not self._stopped.wait(timeout=delay_s):
+            delay_s = self.interval_s
+            acquired_at = self.owner.acquired_at
+
+            # Never queued behind, or in between, measurements.
+            if not self.owner.is_idle:
+                continue
+
+            if acquired_at is not None and time.monotonic() - acquired_at < self.interval_s:
+                self._update(is_connected=True)
+
+                continue
+
+            is_connected = self.heartbeat()
+
+            if is_connected is False:
+                is_connected = self.reconnect()
+
+            if is_connected is None:  # An acquisition got in first
+                continue
+
+            if is_connected:
+                backoff_s = self.interval_s
+
+                continue
+
+            delay_s = backoff_s
+            backoff_s = min(backoff_s * 2, self.max_backoff_s)
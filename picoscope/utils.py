@@ -1,12 +1,18 @@
 """Utility functions. Don't hate the player, hate the game.
 
-All functions—aside from to_enum—have to do with parsing between
+All functions—aside from adc_to_mV and to_enum—have to do with parsing between
 pythonic syntax and data sent/received through http.
 """
 
-from dataclasses import fields
+from dataclasses import fields, replace
 import numpy as np
-from typing import Callable, Dict, List, Type, Union
+from typing import Callable, Dict, List, Tuple, Type, Union
+
+from picoscope import constants, decimation, processing
+from picoscope.averaging import AveragedWaveform
+from picoscope.metrics import METRICS
+from picoscope.parameters import Channel, PulsingParams, channel_input_ranges_mV
+from picoscope.processing import ProcessingParams
 
 
 def bool_to_requests(bool_: bool) -> str:
@@ -61,23 +67,243 @@ def parse_dict_vals(dict_: Dict[str, str], type_: Union[float, int] = float) ->
     return dict([key, type_(val)] for key, val in dict_.items())
 
 
-def parse_payload(field: np.ndarray, key: str = 'amps') -> Dict[str, List[float]]:
-    """Parses _field_ to a http-payload-ready format.
+def requests_to_type(val: Union[str, float, bool], type_: Type) -> Union[float, int, bool]:
+    """Parses a single incoming http value to _type_, the inverse of bool_to_requests for booleans.
+
+    Args:
+        val (Union[str, float, bool]): Incoming value, str if sent as form
+            data, already typed if sent as json.
+        type_ (Type): Desired data type: float, int, bool or str. Ints are
+            only parsed as such if they are whole, otherwise as float.
+
+    Returns:
+        Union[float, int, bool]: The parsed value.
+    """
+
+    if type_ is bool:
+        return val if isinstance(val, bool) else str(val).lower() in ('1', '1.0', 'true')
+
+    if type_ is str:
+        return str(val)
+
+    val = float(val)
+
+    # Some fields annotated as int take fractions too, e.g. voltage_range.
+    return int(val) if type_ is int and val.is_integer() else val
+
+
+def parse_dataclass_vals(dataclass_: Type, dict_: Dict[str, str]) -> Dict[str, Union[float, int, bool]]:
+    """Parses dict_ values to the types of the matching fields of _dataclass_.
+
+    Keys that don't match a field are left as they are.
+
+    Args:
+        dataclass_ (Type): Dataclass object, i.e. not an instance of it.
+        dict_ (Dict[str, str]): Incoming dictionary.
+
+    Returns:
+        Dict[str, Union[float, int, bool]]
+    """
+
+    types = {f.name: f.type for f in fields(dataclass_)}
+
+    return {key: requests_to_type(val=val, type_=types[key]) if key in types else val for key, val in dict_.items()}
+
+
+def parse_payload(waveform: AveragedWaveform, key: str = 'amps') -> Dict[str, List[float]]:
+    """Parses _waveform_ to a http-payload-ready format.
     
     Args:
-        field (np.ndarray): A numerical array (here, usually waveform).
+        waveform (AveragedWaveform): The result of a pulse.
         key (str, optional): Dataclass field name.
 
     Returns:
-        Dict[str, List[float]]: Http-ready data.
+        Dict[str, List[float]]: Http-ready data. Includes the standard
+            deviation under 'std' if it was computed, the time between
+            samples [s] under 'sampling_interval' if known, and if several
+            channels were captured, a payload per channel under 'channels'.
     """
 
     payload: Dict[str, List[float]] = dict()
-    payload[key] = np.mean(field, axis=0).tolist()
+    payload[key] = waveform.mean_mV.tolist()
+
+    if waveform.sampling_interval is not None:
+        payload['sampling_interval'] = waveform.sampling_interval
+
+    if waveform.std_mV is not None:
+        payload['std'] = waveform.std_mV.tolist()
+
+    if waveform.channels is not None:
+        payload['channels'] = {
+            letter: parse_payload(waveform=waveform_, key=key)
+            for letter, waveform_ in waveform.channels.items()
+        }
 
     return payload
 
 
+def parse_channels(channels: str) -> str:
+    """Normalizes channel letters, e.g. 'ba' to 'BA'.
+
+    Raises ValueError if a letter isn't a channel of the unit.
+
+    Args:
+        channels (str): Letters of the channels. Duplicates are dropped.
+
+    Returns:
+        str: Upper case letters, unique and in the same order.
+    """
+
+    letters = ''.join(dict.fromkeys(channels.upper()))
+
+    if not letters or any(letter not in Channel.__members__ for letter in letters):
+        raise ValueError(f'Invalid channels {channels}, choose from {[c.name for c in Channel]}.')
+
+    if max(Channel[letter].value for letter in letters) >= constants.N_CHANNELS:
+        raise ValueError(f'Invalid channels {channels} for a unit with {constants.N_CHANNELS} channels.')
+
+    return letters
+
+
+def parse_pulsing_params(raw_pulsing_params: Dict[str, str]) -> PulsingParams:
+    """Parses incoming http values to PulsingParams, ignoring other keys.
+
+    Raises ValueError if the channels are invalid, see parse_channels.
+
+    Args:
+        raw_pulsing_params (Dict[str, str]): Incoming http values.
+
+    Returns:
+        PulsingParams: Parameters for pulsing.
+    """
+
+    pulsing_params_parsed: Dict[str, float] = parse_dataclass_vals(
+        dataclass_=PulsingParams,
+        dict_=raw_pulsing_params
+    )
+
+    pulsing_params: PulsingParams = dataclass_from_dict(
+        dict_=pulsing_params_parsed,
+        dataclass_=PulsingParams
+    )
+
+    return replace(pulsing_params, channels=parse_channels(channels=pulsing_params.channels))
+
+
+def parse_processing_params(raw_values: Dict[str, str]) -> ProcessingParams:
+    """Parses incoming http values to ProcessingParams, ignoring other keys.
+
+    Raises ValueError if they're malformed.
+
+    Args:
+        raw_values (Dict[str, str]): Incoming http values.
+
+    Returns:
+        ProcessingParams: What to compute, None if no _features_ were asked for.
+    """
+
+    if 'features' not in raw_values:
+        return None
+
+    return dataclass_from_dict(
+        dict_=parse_dataclass_vals(dataclass_=ProcessingParams, dict_=raw_values),
+        dataclass_=ProcessingParams
+    )
+
+
+def parse_preview(raw_values: Dict[str, str]) -> Tuple[int, str]:
+    """Parses the incoming http values asking for a display-decimated waveform.
+
+    Raises ValueError if they're malformed.
+
+    Args:
+        raw_values (Dict[str, str]): Incoming http values.
+
+    Returns:
+        Tuple[int, str]: Max. no. of points, _preview_, and the method,
+            _preview_method_, see picoscope.decimation. None if no preview
+            was asked for.
+    """
+
+    if 'preview' not in raw_values:
+        return None
+
+    n_points = int(float(raw_values['preview']))
+    method = raw_values.get('preview_method', constants.PREVIEW_METHOD)
+
+    if n_points < 1 or method not in decimation.METHODS:
+        raise ValueError(f'Invalid preview of {n_points} points by {method}.')
+
+    return n_points, method
+
+
+def waveform_payload(
+    waveform: AveragedWaveform,
+    pulsing_params: PulsingParams,
+    processing_params: ProcessingParams = None,
+    preview: Tuple[int, str] = None
+) -> Dict[str, List[float]]:
+    """The JSON payload of a pulse: the waveform, its features, or both.
+
+    Args:
+        waveform (AveragedWaveform): The result of the pulse.
+        pulsing_params (PulsingParams): Parameters it was collected with.
+        processing_params (ProcessingParams, optional): What to compute,
+            None for the waveform only. Defaults to None.
+        preview (Tuple[int, str], optional): No. of points and method to
+            decimate the waveform to for display, see parse_preview.
+            Defaults to None, i.e. every sample.
+
+    Returns:
+        Dict[str, List[float]]: As parse_payload (or preview_payload),
+            and/or the features under 'features'.
+    """
+
+    if processing_params is None or processing_params.include_waveform:
+        payload = parse_payload(waveform=waveform) if preview is None else decimation.preview_payload(
+            waveform=waveform,
+            n_points=preview[0],
+            delay_us=pulsing_params.delay,
+            method=preview[1]
+        )
+
+    if processing_params is None:
+        return payload
+
+    with METRICS.timer(metric='stage', label='process'):
+        features = processing.process(
+            waveform=waveform,
+            processing_params=processing_params,
+            delay_us=pulsing_params.delay,
+            sampling_interval=waveform.sampling_interval
+        )
+
+    if not processing_params.include_waveform:
+        return {'features': features}
+
+    return {'features': features, **payload}
+
+
+def adc_to_mV(adc: np.ndarray, enum_voltage_range: int, max_adc: int) -> np.ndarray:
+    """Vectorized conversion of raw amplitudes (in ADCs) to mV.
+
+    Equivalent to picosdk.functions.adc2mV, but operates on a whole
+    array at once rather than element by element.
+
+    Args:
+        adc (np.ndarray): Raw amplitudes of any shape [ADC counts].
+        enum_voltage_range (int): Enumerated voltage range of the channel.
+        max_adc (int): The ADC count corresponding to full scale.
+
+    Returns:
+        np.ndarray: Amplitudes in mV, same shape as adc.
+    """
+
+    full_scale_mV = channel_input_ranges_mV()[enum_voltage_range]
+
+    return adc * (full_scale_mV / max_adc)
+
+
 def to_enum(val: Union[int, float], arr_fn: Callable) -> int:
     """Parses val to enum based on arr_fn.
 
@@ -0,0 +1,94 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+import threading
+import time
+from types import SimpleNamespace
+
+from picoscope import pulse
+from picoscope.acquisition import AcquisitionOwner
+from picoscope.archive import Archive
+from picoscope.averaging import AveragedWaveform
+from picoscope.history import History
+from picoscope.parameters import PulsingParams
+
+N_REQUESTS: int = 8
+ACQUISITION_TIME_S: float = 0.05
+
+pulsing_params: PulsingParams = PulsingParams(
+    delay = 26,
+    voltage_range = 1,
+    duration = 8
+)
+
+
+@pytest.fixture
+def owner(monkeypatch: pytest.MonkeyPatch):
+    """Owner with a stand-in acquisition that records which threads call it."""
+
+    calls = []
+
+    def acquire(picoscope_, pulsing_params: PulsingParams, check_connection: bool = True) -> AveragedWaveform:
+        calls.append(threading.get_ident())
+        time.sleep(ACQUISITION_TIME_S)
+
+        return AveragedWaveform(mean_mV=np.full(10, pulsing_params.delay), mV_per_adc=1., avg_num=1)
+
+    monkeypatch.setattr(pulse, 'acquire', acquire)
+    owner = AcquisitionOwner(picoscope_=None)
+    owner.calls = calls
+
+    return owner
+
+
+def test_identical_requests_are_coalesced(owner: AcquisitionOwner):
+    with ThreadPoolExecutor(max_workers=N_REQUESTS) as executor:
+        results = list(executor.map(lambda _: owner.acquire(pulsing_params), range(N_REQUESTS)))
+
+    assert len(owner.calls) < N_REQUESTS
+    assert all(result is results[0] for result in results)
+
+
+def test_different_requests_are_serialised(owner: AcquisitionOwner):
+    params = [PulsingParams(delay=delay, voltage_range=1, duration=8) for delay in range(N_REQUESTS)]
+
+    with ThreadPoolExecutor(max_workers=N_REQUESTS) as executor:
+        results = list(executor.map(owner.acquire, params))
+
+    assert len(owner.calls) == N_REQUESTS
+    assert len(set(owner.calls)) == 1  # All on the worker thread
+    assert [result.mean_mV[0] for result in results] == list(range(N_REQUESTS))
+
+
+def test_finished_acquisition_is_not_reused(owner: AcquisitionOwner):
+    owner.acquire(pulsing_params)
+    owner.acquire(pulsing_params)
+
+    assert len(owner.calls) == 2
+
+
+def test_run_reraises(owner: AcquisitionOwner):
+    with pytest.raises(ZeroDivisionError):
+        owner.run(lambda: 1 / 0)
+
+
+def test_leased_owner_is_not_idle(owner: AcquisitionOwner):
+    assert owner.is_idle
+
+    with owner.lease():
+        owner.run(lambda: None)  # Worker idle in between steps
+
+        assert not owner.is_idle
+
+    assert owner.is_idle
+
+
+def test_acquisitions_are_recorded(owner: AcquisitionOwner, tmp_path):
+    owner.picoscope_ = SimpleNamespace(wait_s=0.)
+    owner.history = History()
+    owner.archive = Archive(directory=str(tmp_path))
+    owner.acquire(pulsing_params)
+    owner.archive.flush()
+
+    assert len(owner.history) == len(owner.archive) == 1
+    assert next(owner.archive.records()).timestamp == owner.history.latest().timestamp
@@ -0,0 +1,88 @@
+"""Runs the async pulsing flow against the simulated driver, no picoscope needed."""
+
+import asyncio
+import numpy as np
+import pytest
+
+from picoscope import pulse
+from picoscope.acquisition import AcquisitionOwner
+from picoscope.aio import AsyncAcquirer
+from picoscope.history import History
+from picoscope.parameters import PulsingParams
+from picoscope.picoscope import PicoscopeSimulated
+from picoscope.simulator import SimulationProperties
+
+TICK_S: float = 1E-3
+
+pulsing_params: PulsingParams = PulsingParams(
+    delay=26,
+    voltage_range=1,
+    duration=8,
+    avg_num=8
+)
+properties: SimulationProperties = SimulationProperties(
+    echo_times_us=(30., ),
+    echo_amplitudes_V=(0.4, ),
+    pulse_repetition_rate=2E2,
+    call_latency_s=0.,
+    seed=0
+)
+
+
+@pytest.fixture
+def acquirer():
+    picoscope_ = PicoscopeSimulated(properties=properties)
+    acquirer = AsyncAcquirer(owner=AcquisitionOwner(picoscope_=picoscope_, history=History()))
+
+    yield acquirer
+
+    acquirer.owner.run(picoscope_.disconnect)
+
+
+@pytest.mark.parametrize('rapid_block, pipelined', [(True, False), (False, False), (False, True)])
+def test_acquire(acquirer: AsyncAcquirer, rapid_block: bool, pipelined: bool):
+    picoscope_ = acquirer.owner.picoscope_
+    picoscope_.rapid_block = rapid_block
+    picoscope_.pipelined = pipelined
+    waveform = asyncio.run(acquirer.acquire(pulsing_params=pulsing_params))
+    expected = acquirer.owner.run(pulse.acquire, picoscope_=picoscope_, pulsing_params=pulsing_params)
+
+    assert waveform.avg_num == pulsing_params.avg_num
+    assert waveform.mean_mV.shape == expected.mean_mV.shape
+    assert waveform.sampling_interval == expected.sampling_interval
+    assert np.argmax(waveform.mean_mV) == pytest.approx(np.argmax(expected.mean_mV), abs=5)
+    assert picoscope_.wait_s > 0
+    assert acquirer.owner.history.latest().waveform is waveform
+
+
+def test_loop_is_not_blocked(acquirer: AsyncAcquirer):
+    """Other tasks keep running while the device collects."""
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+
+            while True:
+                await asyncio.sleep(TICK_S)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        await acquirer.acquire(pulsing_params=pulsing_params)
+        ticker.cancel()
+
+        return ticks
+
+    # 8 shots at 200Hz take 40ms, so a blocked loop would tick once or twice at most.
+    assert asyncio.run(run()) > 10
+
+
+def test_identical_requests_are_coalesced(acquirer: AsyncAcquirer):
+    async def run():
+        return await asyncio.gather(*[acquirer.acquire(pulsing_params=pulsing_params) for _ in range(4)])
+
+    waveforms = asyncio.run(run())
+
+    assert all(waveform is waveforms[0] for waveform in waveforms)
+    assert len(acquirer.owner.history) == 1
@@ -0,0 +1,102 @@
+"""Talks http to the asyncio front end. Like test_app.py, needs PICOSCOPE_BACKEND=simulated."""
+
+import asyncio
+import json
+from typing import Tuple
+
+from aio_app import serve
+
+REQUEST: str = 'delay=26&voltage_range=1&duration=8'
+
+
+async def fetch(
+    port: int,
+    method: str,
+    target: str,
+    body: str = '',
+    content_type: str = 'application/x-www-form-urlencoded',
+    headers: str = ''
+) -> Tuple[int, str]:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write((
+        f'{method} {target} HTTP/1.1\r\nHost: localhost\r\n{headers}'
+        f'Content-Type: {content_type}\r\n'
+        f'Content-Length: {len(body)}\r\n\r\n{body}'
+    ).encode())
+    await writer.drain()
+    response = (await reader.read()).decode()
+    writer.close()
+    head, _, body = response.partition('\r\n\r\n')
+
+    return int(head.split()[1]), body
+
+
+def run(*requests: Tuple[str, ...]) -> list:
+    """Sends the requests concurrently to a fresh server."""
+
+    async def main():
+        server = await serve(host='127.0.0.1', port=0)
+        port = server.sockets[0].getsockname()[1]
+
+        async with server:
+            return await asyncio.gather(*[fetch(port, *request) for request in requests])
+
+    return asyncio.run(main())
+
+
+def test_base_route():
+    [(status, body)] = run(('GET', '/', ''))
+
+    assert status == 200
+    assert body.startswith('Asyncio picoscope server running.')
+
+
+def test_not_found():
+    responses = run(
+        ('GET', '/some_nonexistent_url', ''),
+        ('GET', '/get_wave', ''),
+        ('GET', '/?device=nonexistent', '')
+    )
+
+    assert [status for status, _ in responses] == [404] * 3
+
+
+def test_bad_request():
+    responses = run(
+        ('POST', '/get_wave', 'delay=26'),
+        ('POST', '/get_wave', '[1, 2]', 'application/json'),
+        ('POST', '/get_wave', '26', 'application/json'),
+        ('POST', '/get_wave', '{', 'application/json'),
+        ('GET', '/history?start=yesterday', '')
+    )
+
+    assert [status for status, _ in responses] == [400] * 5
+
+
+def test_unsupported_framing():
+    form = 'application/x-www-form-urlencoded'
+    responses = run(
+        ('POST', '/get_wave', REQUEST, form, 'Transfer-Encoding: chunked\r\n'),
+        ('POST', '/get_wave', REQUEST, form, 'Expect: 100-continue\r\n')
+    )
+
+    assert [status for status, _ in responses] == [411, 417]
+
+
+def test_pulse():
+    [(status, body), (status_devices, devices)] = run(
+        ('POST', '/get_wave', f'{REQUEST}&features=peak&include_waveform=1'),
+        ('GET', '/devices', '')
+    )
+    payload = json.loads(body)
+
+    assert status == status_devices == 200
+    assert len(payload['amps']) > 0
+    assert 'peak_mV' in payload['features']
+    assert len(json.loads(devices)) >= 1
+
+    [(status, body), (_, history)] = run(('GET', '/latest', ''), ('GET', '/history', ''))
+
+    assert status == 200
+    assert json.loads(body)['amps'] == payload['amps']
+    assert len(json.loads(history)) >= 1
@@ -2,10 +2,12 @@ from dataclasses import asdict
 import flask
 from flask.testing import FlaskClient
 import json
+import numpy as np
 import os
 import pytest
-from time import time
+from time import sleep, time
 
+from picoscope import encoding
 from picoscope.parameters import PulsingParams
 from app import configure_routes
 
@@ -92,6 +94,212 @@ def test_pulse(client_with_pico_connected_yield: FlaskClient):
 
 
 
+def test_pulse_binary(client_with_pico_connected_yield: FlaskClient):
+    response = client_with_pico_connected_yield.post(
+        '/get_wave',
+        data=asdict(pulsing_params),
+        headers={'Accept': encoding.FLOAT32}
+    )
+    waveform = np.frombuffer(response.get_data(), dtype=response.headers['X-Dtype'])
+
+    assert response.status_code == 200
+    assert waveform.shape == (int(response.headers['X-Shape']),)
+
+
+def test_pulse_compressed(client_with_pico_connected_yield: FlaskClient):
+    response = client_with_pico_connected_yield.post(
+        '/get_wave',
+        data=asdict(pulsing_params),
+        headers={'Accept': encoding.DELTA_ZLIB, 'X-Precision': '1'}
+    )
+    codes = encoding.delta_decompress(body=response.get_data(), dtype=response.headers['X-Dtype'])
+
+    assert response.status_code == 200
+    assert float(response.headers['X-Scale']) == 1.
+    assert codes.shape == (int(response.headers['X-Shape']),)
+
+
+def test_pulse_multi_channel(client_with_pico_connected_yield: FlaskClient):
+    data = {**asdict(pulsing_params), 'channels': 'BA'}
+    payload = json.loads(client_with_pico_connected_yield.post('/get_wave', data=data).get_data())
+
+    assert list(payload['channels']) == ['B', 'A']
+    assert payload['channels']['B']['amps'] == payload['amps']
+
+    response = client_with_pico_connected_yield.post('/get_wave', data=data, headers={'Accept': encoding.INT16})
+
+    assert response.headers['X-Channels'] == 'B,A'
+    assert response.headers['X-Shape'] == f"2,{len(payload['amps'])}"
+
+
+def test_pulse_features(client_with_pico_connected_yield: FlaskClient):
+    data = {**asdict(pulsing_params), 'features': 'peak,tof,energy', 'gates': '28-32;32-34'}
+    payload = json.loads(client_with_pico_connected_yield.post('/get_wave', data=data).get_data())
+
+    assert 'amps' not in payload
+    assert pulsing_params.delay <= payload['features']['peak_us'] <= pulsing_params.delay + pulsing_params.duration
+    assert len(payload['features']['energy']) == 2
+
+    data['include_waveform'] = '1'
+    response = client_with_pico_connected_yield.post('/get_wave', data=data, headers={'Accept': encoding.INT16})
+    payload = json.loads(response.get_data())
+
+    assert 'features' in payload and 'amps' in payload
+
+    data['features'] = 'loudness'
+    response = client_with_pico_connected_yield.post('/get_wave', data=data)
+
+    assert response.status_code == 400
+
+
+def test_pulse_downsampled(client_with_pico_connected_yield: FlaskClient):
+    data = {**asdict(pulsing_params), 'downsampling_mode': 'average', 'downsampling_ratio': 4}
+    payload = json.loads(client_with_pico_connected_yield.post('/get_wave', data=data).get_data())
+    full = json.loads(client_with_pico_connected_yield.post('/get_wave', data=asdict(pulsing_params)).get_data())
+
+    assert len(payload['amps']) == len(full['amps']) // 4
+    assert payload['sampling_interval'] == 4 * full['sampling_interval']
+
+
+def test_pulse_preview(client_with_pico_connected_yield: FlaskClient):
+    data = {**asdict(pulsing_params), 'preview': 100, 'preview_method': 'lttb'}
+    payload = json.loads(client_with_pico_connected_yield.post('/get_wave', data=data).get_data())
+
+    assert len(payload['amps']) == len(payload['times_us']) == 100
+
+    data['preview_method'] = 'bicubic'
+
+    assert client_with_pico_connected_yield.post('/get_wave', data=data).status_code == 400
+
+
+def test_jobs(client_with_pico_connected_yield: FlaskClient):
+    response = client_with_pico_connected_yield.post('/jobs', data=asdict(pulsing_params))
+    job_id = json.loads(response.get_data())['job']
+
+    assert response.status_code == 202
+
+    for _ in range(100):
+        status = json.loads(client_with_pico_connected_yield.get(f'/jobs/{job_id}').get_data())
+
+        if status['status'] == 'done':
+            break
+
+        sleep(0.05)
+
+    assert isinstance(status['result']['amps'], list)
+    assert client_with_pico_connected_yield.delete(f'/jobs/{job_id}').status_code == 200
+    assert client_with_pico_connected_yield.get(f'/jobs/{job_id}').status_code == 404
+
+
+def test_schedules(client_with_pico_connected_yield: FlaskClient):
+    values = {**asdict(pulsing_params), 'name': 'test', 'interval_s': 0.05, 'duration_s': 0.2}
+    response = client_with_pico_connected_yield.post('/schedules', data=values)
+
+    assert response.status_code == 201
+    assert client_with_pico_connected_yield.post('/schedules', data=values).status_code == 400  # Name taken
+
+    for _ in range(100):
+        status = json.loads(client_with_pico_connected_yield.get('/schedules/test').get_data())
+
+        if status['status'] == 'done':
+            break
+
+        sleep(0.05)
+
+    assert status['n_shots'] + status['n_dropped'] == 4
+    assert isinstance(status['shots'][0]['amps'], list)
+    assert 'lateness_s' in status['shots'][0]
+    assert [schedule['name'] for schedule in json.loads(client_with_pico_connected_yield.get('/schedules').get_data())] \
+        == ['test']
+    assert client_with_pico_connected_yield.delete('/schedules/test').status_code == 200
+    assert client_with_pico_connected_yield.get('/schedules/test').status_code == 404
+
+
+def test_batch_pulse(client_with_pico_connected_yield: FlaskClient):
+    batch = [asdict(pulsing_params), {**asdict(pulsing_params), 'duration': 4}]
+    response = client_with_pico_connected_yield.post('/get_waves', json=batch)
+    payloads = json.loads(response.get_data())
+
+    assert response.status_code == 200
+    assert len(payloads) == len(batch)
+    assert len(payloads[0]['amps']) > len(payloads[1]['amps'])
+
+    for body in [[], {}, [1], [asdict(pulsing_params), 'delay']]:
+        assert client_with_pico_connected_yield.post('/get_waves', json=body).status_code == 400
+
+
+def test_batch_pulse_binary_multi_channel(client_with_pico_connected_yield: FlaskClient):
+    batch = [{**asdict(pulsing_params), 'channels': 'BA'}, asdict(pulsing_params)]
+    response = client_with_pico_connected_yield.post('/get_waves', json=batch, headers={'Accept': encoding.FLOAT32})
+    lengths = [int(length) for length in response.headers['X-Lengths'].split(',')]
+
+    assert response.status_code == 200
+    assert response.headers['X-Channel-Counts'] == '2,1'
+    assert lengths[0] == 2 * lengths[1]
+    assert np.frombuffer(response.get_data(), dtype=response.headers['X-Dtype']).size == sum(lengths)
+
+
+def test_latest(client_with_pico_connected_yield: FlaskClient):
+    client_with_pico_connected_yield.post('/get_wave', data=asdict(pulsing_params))
+    response = client_with_pico_connected_yield.get('/latest')
+    entry = json.loads(response.get_data())
+
+    assert response.status_code == 200
+    assert entry['pulsing_params']['delay'] == pulsing_params.delay
+    assert 'acquire_s' in entry['timings']
+
+
+def test_metrics(client_with_pico_connected_yield: FlaskClient):
+    client_with_pico_connected_yield.post('/get_wave', data=asdict(pulsing_params))
+    response = client_with_pico_connected_yield.get('/metrics')
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert 'picoscope_stage_seconds_count{stage="prepare"}' in text
+    assert 'picoscope_sdk_call_seconds_count{function="RunBlock"}' in text
+
+
+def test_devices(client_with_pico_connected_yield: FlaskClient):
+    response = client_with_pico_connected_yield.get('/devices')
+    devices = json.loads(response.get_data())
+
+    assert response.status_code == 200
+    assert devices[0]['is_connected'] == '1'
+
+
+def test_health(base_client: FlaskClient):
+    response = base_client.get('/health')
+    health = json.loads(response.get_data())
+
+    # Not warm started unless PICOSCOPE_WARM_START is set.
+    assert response.status_code == 200
+    assert health['devices'][0]['readiness'] == 'cold'
+
+
+def test_unknown_device(client_with_pico_connected_yield: FlaskClient):
+    response = client_with_pico_connected_yield.get('/is_connected', query_string={'device': 'not a serial'})
+
+    assert response.status_code == 404
+
+
+def test_stream(client_with_pico_connected_yield: FlaskClient):
+    n_frames = 3
+    response = client_with_pico_connected_yield.post(
+        '/stream',
+        data={**asdict(pulsing_params), 'rate': 10, 'n_frames': n_frames}
+    )
+    events = response.get_data(as_text=True).strip().split('\n\n')
+    frames = [json.loads(event[len('data: '):]) for event in events]
+
+    assert response.status_code == 200
+    assert [frame['frame'] for frame in frames] == list(range(n_frames))
+
+    for values in [{'rate': 0}, {'rate': -1}, {'rate': 'nan'}, {'rate': 'inf'}, {'n_frames': 0}, {'n_frames': 'x'}]:
+        data = {**asdict(pulsing_params), **values}
+
+        assert client_with_pico_connected_yield.post('/stream', data=data).status_code == 400
+
+
 @pytest.fixture
 def client_with_pico_connected_no_yield(base_client: FlaskClient):
     base_client.get('/connect')
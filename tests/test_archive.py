@@ -0,0 +1,132 @@
+from dataclasses import replace
+import numpy as np
+import pytest
+
+from picoscope.archive import Archive, quantize
+from picoscope.averaging import AveragedWaveform
+from picoscope.history import Entry
+from picoscope.parameters import PulsingParams
+
+CHUNK_SAMPLES: int = 25
+N_SAMPLES: int = 10
+MV_PER_ADC: float = 0.03
+
+pulsing_params: PulsingParams = PulsingParams(
+    delay = 26,
+    voltage_range = 0.1,
+    duration = 8,
+    avg_num = 4
+)
+
+
+def make_entry(timestamp: float) -> Entry:
+    return Entry(
+        waveform=AveragedWaveform(
+            mean_mV=np.linspace(-1, 1, N_SAMPLES) * timestamp,
+            mV_per_adc=MV_PER_ADC,
+            avg_num=pulsing_params.avg_num
+        ),
+        pulsing_params=pulsing_params,
+        timestamp=timestamp,
+        timings={'acquire_s': 0.01}
+    )
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = Archive(directory=str(tmp_path), chunk_samples=CHUNK_SAMPLES)
+
+    for timestamp in range(5):
+        archive.append(make_entry(timestamp=float(timestamp)))
+
+    archive.flush()
+
+    return archive
+
+
+def test_quantize_raw_is_exact():
+    adc = np.array([-32512, -1, 0, 1, 32512])
+    counts, scale = quantize(waveform_mV=adc * MV_PER_ADC, mV_per_adc=MV_PER_ADC)
+
+    assert counts.dtype == np.int16
+    assert scale == MV_PER_ADC
+    np.testing.assert_array_equal(counts, adc)
+
+
+def test_quantize_keeps_fractions():
+    waveform_mV = np.array([0.25, -0.5, 1.125]) * MV_PER_ADC
+    counts, scale = quantize(waveform_mV=waveform_mV, mV_per_adc=MV_PER_ADC)
+
+    np.testing.assert_allclose(counts * scale, waveform_mV)
+
+
+def test_append(archive: Archive):
+    assert len(archive) == 5
+    # Two waveforms per chunk.
+    assert list(archive.index()['chunk']) == [0, 0, 1, 1, 2]
+
+
+def test_records(archive: Archive):
+    records = list(archive.records(start=1, end=3))
+
+    assert [record.timestamp for record in records] == [1., 2., 3.]
+    assert records[0].pulsing_params == pulsing_params
+    assert isinstance(records[0].counts, np.memmap)
+    np.testing.assert_allclose(records[-1].mean_mV, make_entry(timestamp=3.).waveform.mean_mV, atol=1E-3)
+
+
+def test_downsampling_is_archived(tmp_path):
+    archive = Archive(directory=str(tmp_path), chunk_samples=CHUNK_SAMPLES)
+    entry = make_entry(timestamp=1.)
+    entry.pulsing_params = replace(pulsing_params, downsampling_mode='average', downsampling_ratio=4)
+    archive.append(entry)
+    archive.flush()
+    [record] = archive.records()
+
+    assert record.pulsing_params == entry.pulsing_params
+    assert record.to_dict()['pulsing_params']['downsampling_ratio'] == 4
+
+
+def test_channels_are_archived_separately(tmp_path):
+    archive = Archive(directory=str(tmp_path), chunk_samples=CHUNK_SAMPLES)
+    entry = make_entry(timestamp=1.)
+    entry.pulsing_params = replace(pulsing_params, channels='BA', std=True)
+    entry.waveform.channels = {
+        'B': entry.waveform,
+        'A': replace(entry.waveform, mean_mV=-entry.waveform.mean_mV)
+    }
+    archive.append(entry)
+    archive.flush()
+    records = list(archive.records())
+
+    assert [record.channel for record in records] == ['B', 'A']
+    assert all(record.pulsing_params == entry.pulsing_params for record in records)
+    np.testing.assert_allclose(records[1].mean_mV, -entry.waveform.mean_mV, atol=1E-3)
+    assert records[1].to_dict()['channel'] == 'A'
+
+
+def test_reopen(archive: Archive):
+    reopened = Archive(directory=archive.directory, chunk_samples=CHUNK_SAMPLES)
+    reopened.append(make_entry(timestamp=5.))
+    reopened.flush()
+
+    assert len(reopened) == 6
+    assert [record.timestamp for record in reopened.records(start=4)] == [4., 5.]
+
+
+def test_too_long_isnt_archived(archive: Archive):
+    entry = make_entry(timestamp=6.)
+    entry.waveform.mean_mV = np.zeros(CHUNK_SAMPLES + 1)
+    archive.append(entry)
+    archive.flush()
+
+    assert len(archive) == 5
+
+
+def test_too_many_channels_arent_truncated(archive: Archive):
+    entry = make_entry(timestamp=6.)
+    entry.pulsing_params = replace(pulsing_params, channels='B' * 9)
+    archive.append(entry)
+    archive.flush()
+
+    assert len(archive) == 5
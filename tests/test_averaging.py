@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from picoscope.averaging import Accumulator
+
+AVG_NUM: int = 50
+N_SAMPLES: int = 1000
+MV_PER_ADC: float = 1000 / 32512
+
+rng = np.random.default_rng(seed=0)
+waveforms: np.ndarray = rng.integers(-32512, 32512, size=(AVG_NUM, N_SAMPLES), dtype=np.int16)
+
+
+@pytest.fixture
+def accumulator():
+    return Accumulator(n_samples=N_SAMPLES, keep_variance=True)
+
+
+def test_mean_block(accumulator: Accumulator):
+    accumulator.add(waveforms)
+
+    assert accumulator.count == AVG_NUM
+    assert np.allclose(accumulator.mean, waveforms.mean(axis=0))
+
+
+def test_mean_one_at_a_time_equals_block(accumulator: Accumulator):
+    for waveform in waveforms:
+        accumulator.add(waveform)
+
+    assert np.allclose(accumulator.mean, waveforms.mean(axis=0))
+    assert np.allclose(accumulator.std, waveforms.std(axis=0, ddof=1))
+
+
+def test_std(accumulator: Accumulator):
+    accumulator.add(waveforms[:10])
+    accumulator.add(waveforms[10:])
+
+    assert np.allclose(accumulator.std, waveforms.std(axis=0, ddof=1))
+
+
+def test_no_overflow():
+    accumulator = Accumulator(n_samples=N_SAMPLES)
+    saturated = np.full((AVG_NUM, N_SAMPLES), np.iinfo(np.int16).max, dtype=np.int16)
+    accumulator.add(saturated)
+
+    assert np.all(accumulator.mean == np.iinfo(np.int16).max)
+
+
+def test_std_not_kept():
+    accumulator = Accumulator(n_samples=N_SAMPLES)
+    accumulator.add(waveforms)
+
+    assert accumulator.std is None
+
+
+def test_to_waveform(accumulator: Accumulator):
+    accumulator.add(waveforms)
+    waveform = accumulator.to_waveform(mV_per_adc=MV_PER_ADC)
+
+    assert waveform.avg_num == AVG_NUM
+    assert np.allclose(waveform.mean_mV, waveforms.mean(axis=0) * MV_PER_ADC)
+    assert np.allclose(waveform.std_mV, waveforms.std(axis=0, ddof=1) * MV_PER_ADC)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from picoscope.buffers import CaptureBuffers
+
+CHANNELS = (1, 0)
+N_SEGMENTS: int = 4
+N_SAMPLES: int = 3000
+
+
+@pytest.fixture
+def buffers():
+    buffers = CaptureBuffers()
+    buffers.allocate(channels=CHANNELS, n_segments=N_SEGMENTS, n_samples=N_SAMPLES)
+
+    return buffers
+
+
+def test_allocate(buffers: CaptureBuffers):
+    assert buffers.shape == (len(CHANNELS), N_SEGMENTS, N_SAMPLES)
+    assert buffers.block.dtype == np.int16
+    assert buffers.block.flags.c_contiguous
+
+
+def test_allocate_same_shape_reuses_block(buffers: CaptureBuffers):
+    block = buffers.block
+    buffers.is_registered = True
+    buffers.allocate(channels=CHANNELS, n_segments=N_SEGMENTS, n_samples=N_SAMPLES)
+
+    assert buffers.block is block
+    assert buffers.is_registered
+
+
+def test_allocate_new_shape_invalidates(buffers: CaptureBuffers):
+    buffers.is_registered = True
+    buffers.allocate(channels=CHANNELS, n_segments=N_SEGMENTS, n_samples=2 * N_SAMPLES)
+
+    assert buffers.shape == (len(CHANNELS), N_SEGMENTS, 2 * N_SAMPLES)
+    assert not buffers.is_registered
+
+
+def test_allocate_new_channels_invalidates(buffers: CaptureBuffers):
+    buffers.is_registered = True
+    buffers.allocate(channels=CHANNELS[::-1], n_segments=N_SEGMENTS, n_samples=N_SAMPLES)
+
+    assert buffers.channels == CHANNELS[::-1]
+    assert not buffers.is_registered
+
+
+def test_c_pointer_writes_to_block(buffers: CaptureBuffers):
+    c_pointer = buffers.c_pointer(channel=0, segment=1)
+    c_pointer[0] = 42
+
+    assert buffers.block[1, 1, 0] == 42
+    assert np.count_nonzero(buffers.block) == 1
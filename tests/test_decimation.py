@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from picoscope.averaging import AveragedWaveform
+from picoscope.decimation import decimate, lttb, min_max, preview_payload
+
+SAMPLING_INTERVAL: float = 4E-9
+
+rng: np.random.Generator = np.random.default_rng(seed=0)
+values: np.ndarray = np.sin(np.linspace(0, 20 * np.pi, 10_001)) + rng.normal(scale=0.1, size=10_001)
+values[1234] = 5.  # A spike no preview should miss
+
+
+@pytest.mark.parametrize('method', [min_max, lttb])
+def test_keeps_extremes(method):
+    indices = method(values, 500)
+
+    assert len(indices) <= 500
+    assert np.all(np.diff(indices) > 0)
+    assert 1234 in indices
+
+
+def test_min_max():
+    indices = min_max(values, 500)
+
+    assert np.argmin(values) in indices
+    assert indices[-1] < len(values)
+
+
+def test_lttb():
+    indices = lttb(values, 500)
+
+    assert len(indices) == 500
+    assert indices[0] == 0 and indices[-1] == len(values) - 1
+
+
+@pytest.mark.parametrize('method', ['minmax', 'lttb'])
+def test_short_waveforms_are_kept(method: str):
+    np.testing.assert_array_equal(decimate(values[:10], n_points=500, method=method), np.arange(10))
+
+
+def test_decimate_invalid():
+    with pytest.raises(ValueError):
+        decimate(values, n_points=500, method='bicubic')
+
+    with pytest.raises(ValueError):
+        decimate(values, n_points=0)
+
+
+def test_preview_payload():
+    waveform = AveragedWaveform(mean_mV=values, mV_per_adc=1., avg_num=1, sampling_interval=SAMPLING_INTERVAL)
+    payload = preview_payload(waveform=waveform, n_points=100, delay_us=26)
+
+    assert len(payload['amps']) == len(payload['times_us']) <= 100
+    assert payload['times_us'][0] >= 26
+    assert payload['times_us'][-1] <= 26 + (len(values) - 1) * SAMPLING_INTERVAL * 1E6 + 1E-9
+    assert 'channels' not in payload
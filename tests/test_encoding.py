@@ -0,0 +1,166 @@
+import io
+import numpy as np
+import pytest
+import zlib
+
+from picoscope import encoding
+
+MV_PER_ADC: float = 1000 / 32512
+SAMPLING_INTERVAL: float = 4E-9
+
+waveform_mV: np.ndarray = np.linspace(-500, 500, 3000)
+
+
+@pytest.mark.parametrize('mimetype', [encoding.FLOAT32, encoding.INT16, encoding.NPY, encoding.DELTA_ZLIB])
+def test_encode_waveform_headers(mimetype: str):
+    _, headers = encoding.encode_waveform(
+        waveform_mV=waveform_mV,
+        mimetype=mimetype,
+        mV_per_adc=MV_PER_ADC,
+        sampling_interval=SAMPLING_INTERVAL
+    )
+
+    assert headers['Content-Type'] == mimetype
+    assert headers['X-Shape'] == str(waveform_mV.size)
+    assert float(headers['X-Sampling-Interval']) == SAMPLING_INTERVAL
+
+
+def test_encode_waveform_float32():
+    body, headers = encoding.encode_waveform(
+        waveform_mV=waveform_mV,
+        mimetype=encoding.FLOAT32,
+        mV_per_adc=MV_PER_ADC,
+        sampling_interval=SAMPLING_INTERVAL
+    )
+    decoded = np.frombuffer(body, dtype=headers['X-Dtype']) * float(headers['X-Scale'])
+
+    assert np.allclose(decoded, waveform_mV, atol=1e-3)
+
+
+def test_encode_waveform_int16():
+    body, headers = encoding.encode_waveform(
+        waveform_mV=waveform_mV,
+        mimetype=encoding.INT16,
+        mV_per_adc=MV_PER_ADC,
+        sampling_interval=SAMPLING_INTERVAL
+    )
+    decoded = np.frombuffer(body, dtype=headers['X-Dtype']) * float(headers['X-Scale'])
+
+    assert len(body) == 2 * waveform_mV.size
+    assert np.allclose(decoded, waveform_mV, atol=MV_PER_ADC)
+
+
+def test_encode_waveform_int16_sub_count():
+    averaged_mV = waveform_mV / 100  # Peaks at ~15 ADC counts, resolved finer by averaging
+    body, headers = encoding.encode_waveform(
+        waveform_mV=averaged_mV,
+        mimetype=encoding.INT16,
+        mV_per_adc=MV_PER_ADC,
+        sampling_interval=SAMPLING_INTERVAL
+    )
+    decoded = np.frombuffer(body, dtype=headers['X-Dtype']) * float(headers['X-Scale'])
+
+    assert float(headers['X-Scale']) < MV_PER_ADC
+    assert np.allclose(decoded, averaged_mV, atol=MV_PER_ADC / 100)
+
+
+def test_encode_waveform_npy():
+    body, _ = encoding.encode_waveform(
+        waveform_mV=waveform_mV,
+        mimetype=encoding.NPY,
+        mV_per_adc=MV_PER_ADC,
+        sampling_interval=SAMPLING_INTERVAL
+    )
+    decoded = np.load(io.BytesIO(body))
+
+    assert np.allclose(decoded, waveform_mV, atol=1e-3)
+
+
+@pytest.mark.parametrize('avg_num', [1, 64])
+def test_encode_waveform_delta_zlib_is_exact(avg_num: int):
+    # Averages of whole ADC counts.
+    rng = np.random.default_rng(seed=0)
+    adc_sum = rng.integers(-32512, 32512, size=(avg_num, 3000)).sum(axis=0)
+    averaged_mV = adc_sum / avg_num * MV_PER_ADC
+    body, headers = encoding.encode_waveform(
+        waveform_mV=averaged_mV,
+        mimetype=encoding.DELTA_ZLIB,
+        mV_per_adc=MV_PER_ADC,
+        sampling_interval=SAMPLING_INTERVAL,
+        avg_num=avg_num
+    )
+    codes = encoding.delta_decompress(body=body, dtype=headers['X-Dtype'])
+
+    np.testing.assert_array_equal(codes, adc_sum)
+    assert np.allclose(codes * float(headers['X-Scale']), averaged_mV)
+
+
+def test_encode_waveform_delta_zlib_precision():
+    body, headers = encoding.encode_waveform(
+        waveform_mV=waveform_mV,
+        mimetype=encoding.DELTA_ZLIB,
+        mV_per_adc=MV_PER_ADC,
+        sampling_interval=SAMPLING_INTERVAL,
+        precision=0.5
+    )
+    decoded = np.cumsum(np.frombuffer(zlib.decompress(body), dtype=headers['X-Dtype'])) * float(headers['X-Scale'])
+
+    assert len(body) < waveform_mV.size  # I.e. < 1 byte per sample
+    assert np.allclose(decoded, waveform_mV, atol=0.25)
+
+
+def test_encode_waveform_delta_zlib_rows():
+    waveforms_mV = np.stack([waveform_mV, -waveform_mV])
+    body, headers = encoding.encode_waveform(
+        waveform_mV=waveforms_mV,
+        mimetype=encoding.DELTA_ZLIB,
+        mV_per_adc=MV_PER_ADC,
+        sampling_interval=SAMPLING_INTERVAL
+    )
+    shape = tuple(int(dim) for dim in headers['X-Shape'].split(','))
+    decoded = encoding.delta_decompress(body=body, dtype=headers['X-Dtype']).reshape(shape) * float(headers['X-Scale'])
+
+    assert shape == waveforms_mV.shape
+    assert np.allclose(decoded, waveforms_mV, atol=MV_PER_ADC)
+
+
+def test_encode_waveforms():
+    waveforms_mV = [waveform_mV, waveform_mV[:100]]
+    body, headers = encoding.encode_waveforms(
+        waveforms_mV=waveforms_mV,
+        sampling_interval=SAMPLING_INTERVAL
+    )
+    decoded = np.frombuffer(body, dtype=headers['X-Dtype'])
+    lengths = [int(length) for length in headers['X-Lengths'].split(',')]
+
+    assert lengths == [waveform.size for waveform in waveforms_mV]
+    assert np.allclose(np.split(decoded, np.cumsum(lengths)[:-1])[1], waveform_mV[:100], atol=1e-3)
+
+
+def test_encode_waveforms_multi_channel():
+    waveforms_mV = [np.stack([waveform_mV, -waveform_mV]), waveform_mV[:100]]
+    body, headers = encoding.encode_waveforms(
+        waveforms_mV=waveforms_mV,
+        sampling_interval=SAMPLING_INTERVAL
+    )
+    decoded = np.frombuffer(body, dtype=headers['X-Dtype'])
+    lengths = [int(length) for length in headers['X-Lengths'].split(',')]
+    n_channels = [int(n) for n in headers['X-Channel-Counts'].split(',')]
+
+    assert lengths == [2 * waveform_mV.size, 100]
+    assert n_channels == [2, 1]
+    assert np.allclose(
+        np.split(decoded, np.cumsum(lengths)[:-1])[0].reshape(n_channels[0], -1)[1],
+        -waveform_mV,
+        atol=1e-3
+    )
+
+
+def test_encode_waveforms_sampling_interval_per_waveform():
+    _, headers = encoding.encode_waveforms(
+        waveforms_mV=[waveform_mV, waveform_mV[::4]],
+        sampling_interval=[SAMPLING_INTERVAL, 4 * SAMPLING_INTERVAL]
+    )
+
+    assert [float(interval) for interval in headers['X-Sampling-Interval'].split(',')] \
+        == [SAMPLING_INTERVAL, 4 * SAMPLING_INTERVAL]
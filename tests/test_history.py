@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from picoscope.averaging import AveragedWaveform
+from picoscope.history import Entry, History
+from picoscope.parameters import PulsingParams
+
+MAXLEN: int = 3
+
+pulsing_params: PulsingParams = PulsingParams(
+    delay = 26,
+    voltage_range = 1,
+    duration = 8
+)
+
+
+def make_entry(timestamp: float) -> Entry:
+    return Entry(
+        waveform=AveragedWaveform(mean_mV=np.full(10, timestamp), mV_per_adc=0.03, avg_num=1),
+        pulsing_params=pulsing_params,
+        timestamp=timestamp,
+        timings={'acquire_s': 0.01}
+    )
+
+
+@pytest.fixture
+def history():
+    history = History(maxlen=MAXLEN)
+
+    for timestamp in range(5):
+        history.append(make_entry(timestamp=float(timestamp)))
+
+    return history
+
+
+def test_latest_empty():
+    assert History().latest() is None
+
+
+def test_bounded(history: History):
+    assert len(history) == MAXLEN
+
+
+def test_latest(history: History):
+    assert history.latest().timestamp == 4.
+
+
+def test_between(history: History):
+    entries = history.between(start=2.5, end=3.5)
+
+    assert [entry.timestamp for entry in entries] == [3.]
+
+
+def test_between_defaults_to_everything(history: History):
+    entries = history.between()
+
+    assert [entry.timestamp for entry in entries] == [2., 3., 4.]
+
+
+def test_to_dict(history: History):
+    entry_dict = history.latest().to_dict()
+
+    assert isinstance(entry_dict['amps'], list)
+    assert entry_dict['pulsing_params']['delay'] == pulsing_params.delay
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+import time
+
+from picoscope import pulse
+from picoscope.acquisition import AcquisitionOwner
+from picoscope.averaging import AveragedWaveform
+from picoscope.jobs import JobStatus, JobStore
+from picoscope.parameters import PulsingParams
+
+ACQUISITION_TIME_S: float = 0.05
+DEVICE_ID: str = 'default'
+
+
+def params(delay: int) -> PulsingParams:
+    return PulsingParams(delay=delay, voltage_range=1, duration=8)
+
+
+@pytest.fixture
+def owner(monkeypatch: pytest.MonkeyPatch):
+    """Owner with a stand-in acquisition that fails for negative delays."""
+
+    def acquire(picoscope_, pulsing_params: PulsingParams, check_connection: bool = True) -> AveragedWaveform:
+        time.sleep(ACQUISITION_TIME_S)
+
+        if pulsing_params.delay < 0:
+            raise ValueError('Negative delay.')
+
+        return AveragedWaveform(mean_mV=np.full(10, pulsing_params.delay), mV_per_adc=1., avg_num=1)
+
+    monkeypatch.setattr(pulse, 'acquire', acquire)
+
+    return AcquisitionOwner(picoscope_=None)
+
+
+def test_submit_returns_immediately(owner: AcquisitionOwner):
+    jobs = JobStore()
+    start = time.perf_counter()
+    job = jobs.submit(owner=owner, device_id=DEVICE_ID, pulsing_params=params(delay=26))
+
+    assert time.perf_counter() - start < ACQUISITION_TIME_S
+    assert job.status in (JobStatus.QUEUED, JobStatus.RUNNING)
+    assert jobs.get(job.id) is job
+
+    assert job.result().mean_mV[0] == 26
+    assert job.status == JobStatus.DONE
+    assert job.to_dict()['status'] == 'done'
+
+
+def test_failed_job(owner: AcquisitionOwner):
+    job = JobStore().submit(owner=owner, device_id=DEVICE_ID, pulsing_params=params(delay=-1))
+
+    with pytest.raises(ValueError):
+        job.result()
+
+    assert job.status == JobStatus.FAILED
+    assert job.to_dict()['error'] == 'Negative delay.'
+
+
+def test_jobs_expire(owner: AcquisitionOwner):
+    jobs = JobStore(ttl_s=ACQUISITION_TIME_S)
+    job = jobs.submit(owner=owner, device_id=DEVICE_ID, pulsing_params=params(delay=26))
+    job.result()
+
+    assert jobs.get(job.id) is job
+
+    time.sleep(2 * ACQUISITION_TIME_S)
+
+    with pytest.raises(KeyError):
+        jobs.get(job.id)
+
+
+def test_store_is_bounded(owner: AcquisitionOwner):
+    jobs = JobStore(max_jobs=2)
+    submitted = [jobs.submit(owner=owner, device_id=DEVICE_ID, pulsing_params=params(delay=delay)) for delay in range(3)]
+
+    assert len(jobs) == 2
+
+    with pytest.raises(KeyError):
+        jobs.get(submitted[0].id)
+
+    # Forgotten, but still acquired.
+    assert submitted[0].result().mean_mV[0] == 0
+
+
+def test_pop(owner: AcquisitionOwner):
+    jobs = JobStore()
+    job = jobs.submit(owner=owner, device_id=DEVICE_ID, pulsing_params=params(delay=26))
+
+    assert jobs.pop(job.id) is job
+    assert len(jobs) == 0
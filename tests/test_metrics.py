@@ -0,0 +1,58 @@
+import pytest
+
+from picoscope.metrics import COUNTERS, Metrics
+
+BUCKETS = (1E-3, 1E-2, 1E-1)
+
+
+@pytest.fixture
+def metrics():
+    return Metrics(buckets=BUCKETS)
+
+
+def test_observe(metrics: Metrics):
+    for seconds in (5E-4, 5E-3, 5E-3, 1.):
+        metrics.observe(metric='stage', label='prepare', seconds=seconds)
+
+    histogram = metrics.histogram(metric='stage', label='prepare')
+
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(1.0105)
+    assert histogram.cumulative() == [('0.001', 1), ('0.01', 3), ('0.1', 3), ('+Inf', 4)]
+
+
+def test_timed(metrics: Metrics):
+    fn = metrics.timed(metric='sdk_call', label='RunBlock', fn=lambda x: 2 * x)
+
+    assert fn(2) == 4
+    assert metrics.histogram(metric='sdk_call', label='RunBlock').count == 1
+
+
+def test_timer_records_on_exception(metrics: Metrics):
+    with pytest.raises(ValueError):
+        with metrics.timer(metric='stage', label='get_data'):
+            raise ValueError
+
+    assert metrics.histogram(metric='stage', label='get_data').count == 1
+
+
+def test_increment(metrics: Metrics):
+    metrics.increment('shots', n=8)
+    metrics.increment('shots')
+
+    assert metrics.count('shots') == 9
+
+    with pytest.raises(KeyError):
+        metrics.increment('not_a_counter')
+
+
+def test_render(metrics: Metrics):
+    metrics.observe(metric='sdk_call', label='GetValuesBulk', seconds=5E-3)
+    metrics.increment('acquisitions')
+    text = metrics.render()
+
+    assert '# TYPE picoscope_sdk_call_seconds histogram' in text
+    assert 'picoscope_sdk_call_seconds_bucket{function="GetValuesBulk",le="+Inf"} 1' in text
+    assert 'picoscope_sdk_call_seconds_count{function="GetValuesBulk"} 1' in text
+    assert 'picoscope_acquisitions_total 1' in text
+    assert all(f'picoscope_{counter}_total' in text for counter in COUNTERS)
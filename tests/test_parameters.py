@@ -17,3 +17,21 @@ def test_channel():
 
     assert channel_A_enum == 0
 
+
+def test_wave_type():
+    """As PS2000A_WAVE_TYPE."""
+
+    assert parameters.WaveType.SQUARE.value == 1
+    assert parameters.WaveType.DC_VOLTAGE.value == 8
+
+
+def test_pulsing_params_avg_num_default():
+    pulsing_params = parameters.PulsingParams(delay=10, voltage_range=1, duration=8)
+
+    assert pulsing_params.avg_num == parameters.constants.AVG_NUM
+
+
+def test_wait_strategy_from_constant():
+    wait_strategy = parameters.WaitStrategy(parameters.constants.WAIT_STRATEGY)
+
+    assert isinstance(wait_strategy, parameters.WaitStrategy)
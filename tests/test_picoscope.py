@@ -1,6 +1,10 @@
+import ctypes
+import numpy as np
 import pytest
 
+from picoscope.parameters import PulsingParams
 from picoscope.picoscope import Picoscope2000
+from picoscope.plan import compile_plan
 
 CHANNEL: int = 1
 VOLTAGE_RANGE: int = 6
@@ -10,6 +14,7 @@ DURATION: int = 6
 DELAY_IN_US: int = 10
 DELAY_IN_SAMPLES: int = 5000
 DUMMY_SEGMENT_INDEX: int = 20
+CHANNELS: str = 'AB'
 
 
 @pytest.fixture
@@ -120,13 +125,20 @@ def test_set_simple_trigger(connection: Picoscope2000):
     connection.set_trigger()
 
 
+def test_set_channel_skipped_if_unchanged(connection: Picoscope2000):
+    connection.set_channel()
+    connection.SetChannel = None  # Would raise if called
+
+    connection.set_channel()
+
+
 def test_buffer_is_not_made(connection: Picoscope2000):
-    assert connection._c_buffer is None
+    assert not connection._buffers.is_registered
 
 
 @pytest.fixture
 def connection_w_buffer(connection: Picoscope2000):
-    connection.set_buffer()
+    connection.set_buffers()
 
     return connection
     
@@ -153,6 +165,40 @@ def test_pull_trigger(connection_w_buffer: Picoscope2000):
 #     connection_w_buffer.get_data()
 
 
+def test_set_buffers(connection_w_buffer: Picoscope2000):
+    assert connection_w_buffer._buffers.is_registered
+    assert connection_w_buffer.adc_values.shape == (1, connection_w_buffer.n_segments, N_SAMPLES)
+
+
+@pytest.fixture
+def connection_w_channels(connection: Picoscope2000):
+    params = PulsingParams(delay=DELAY_IN_US, voltage_range=VOLTAGE_RANGE, duration=DURATION, channels=CHANNELS)
+    connection.apply_plan(compile_plan(pulsing_params=params))
+    connection.set_buffers()
+
+    return connection
+
+
+def test_set_buffers_per_channel(connection_w_channels: Picoscope2000):
+    adc_values = connection_w_channels.adc_values
+
+    assert adc_values.shape == (len(CHANNELS), connection_w_channels.n_segments, connection_w_channels.n_samples)
+
+    # Each channel's buffer is registered as its own row.
+    for row, channel in enumerate(connection_w_channels.channels):
+        for segment in range(connection_w_channels.n_segments):
+            pointer = connection_w_channels._buffers.c_pointer(channel=channel, segment=segment)
+
+            assert ctypes.addressof(pointer.contents) == adc_values[row, segment].ctypes.data
+
+
+def test_set_buffers_reuses_buffer(connection_w_buffer: Picoscope2000):
+    block = connection_w_buffer.adc_values
+    connection_w_buffer.set_buffers()
+
+    assert connection_w_buffer.adc_values is block
+
+
 def test_stop(connection_w_buffer: Picoscope2000):
     connection_w_buffer.stop()
 
@@ -160,8 +206,31 @@ def test_stop(connection_w_buffer: Picoscope2000):
 def test_to_mV(connection_w_buffer: Picoscope2000):
     data_in_mV = connection_w_buffer.to_mV()
 
-    assert isinstance(data_in_mV, list)
-    assert isinstance(data_in_mV[0], float)
+    assert isinstance(data_in_mV, np.ndarray)
+    assert data_in_mV.shape == (1, connection_w_buffer.n_segments, connection_w_buffer.n_samples)
+
+
+def test_to_mV_per_channel(connection_w_channels: Picoscope2000):
+    for row in range(len(CHANNELS)):
+        connection_w_channels.adc_values[row] = row + 1
+
+    data_in_mV = connection_w_channels.to_mV()
+
+    assert data_in_mV.shape == (len(CHANNELS), connection_w_channels.n_segments, connection_w_channels.n_samples)
+
+    for row in range(len(CHANNELS)):
+        assert np.all(data_in_mV[row] == data_in_mV[row].flat[0])
+        assert data_in_mV[row].flat[0] == pytest.approx((row + 1) * data_in_mV[0].flat[0])
+
+
+def test_adc_values(connection_w_buffer: Picoscope2000):
+    adc_values = connection_w_buffer.adc_values
+
+    assert adc_values.dtype == np.int16
+
+
+def test_max_adc(connection: Picoscope2000):
+    assert connection.max_adc > 0
 
 
 @pytest.fixture
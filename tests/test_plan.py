@@ -0,0 +1,81 @@
+import pytest
+
+from picoscope import plan
+from picoscope.parameters import PulsingParams
+
+N_SAMPLES: int = 3000
+DURATION: int = 12
+DELAY: int = 10
+DELAY_IN_SAMPLES: int = 2500
+VOLTAGE_RANGE: int = 1
+ENUM_VOLTAGE_RANGE: int = 5
+
+pulsing_params: PulsingParams = PulsingParams(
+    delay=DELAY,
+    voltage_range=VOLTAGE_RANGE,
+    duration=DURATION
+)
+
+
+def test_n_samples_from_duration():
+    n_samples = plan.n_samples_from_duration(duration=DURATION)
+
+    assert n_samples == N_SAMPLES
+
+
+def test_compile_plan():
+    plan_ = plan.compile_plan(pulsing_params=pulsing_params)
+
+    assert plan_.n_samples == N_SAMPLES
+    assert plan_.enum_voltage_range == ENUM_VOLTAGE_RANGE
+    assert plan_.trigger_delay == DELAY_IN_SAMPLES
+    assert isinstance(plan_.avg_num, int)
+
+
+def test_compile_plan_is_cached():
+    """Equal params, e.g. parsed from http as floats, should hit the cache."""
+
+    params_as_floats = PulsingParams(
+        delay=float(DELAY),
+        voltage_range=float(VOLTAGE_RANGE),
+        duration=float(DURATION)
+    )
+
+    assert plan.compile_plan(pulsing_params) is plan.compile_plan(params_as_floats)
+
+
+def test_reconfiguration_order():
+    params = [
+        PulsingParams(delay=DELAY, voltage_range=VOLTAGE_RANGE, duration=2 * DURATION),
+        pulsing_params,
+        PulsingParams(delay=2 * DELAY, voltage_range=VOLTAGE_RANGE, duration=2 * DURATION),
+        PulsingParams(delay=2 * DELAY, voltage_range=VOLTAGE_RANGE, duration=DURATION),
+    ]
+    plans = [plan.compile_plan(pulsing_params=params_) for params_ in params]
+
+    order = plan.reconfiguration_order(plans=plans)
+
+    assert sorted(order) == list(range(len(params)))
+    assert [params[index].duration for index in order] == [DURATION, DURATION, 2 * DURATION, 2 * DURATION]
+
+
+def test_enumerate_channels():
+    assert plan.enumerate_channels(channels='B') == (1, )
+    assert plan.enumerate_channels(channels='bab') == (1, 0)
+
+    with pytest.raises(ValueError):
+        plan.enumerate_channels(channels='E')
+
+    with pytest.raises(ValueError):
+        plan.enumerate_channels(channels='')
+
+
+def test_enumerate_downsampling():
+    assert plan.enumerate_downsampling(mode='none', ratio=8) == (0, 1)
+    assert plan.enumerate_downsampling(mode='Average', ratio=8) == (4, 8)
+
+    with pytest.raises(ValueError):
+        plan.enumerate_downsampling(mode='aggregate', ratio=8)
+
+    with pytest.raises(ValueError):
+        plan.enumerate_downsampling(mode='decimate', ratio=0)
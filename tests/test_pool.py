@@ -0,0 +1,116 @@
+from dataclasses import replace
+import numpy as np
+import pytest
+import time
+
+from picoscope.parameters import PulsingParams
+from picoscope.pool import DEFAULT_DEVICE, DevicePool, Readiness, make_device
+
+SERIALS = ['SIM00/0001', 'SIM00/0002']
+AVG_NUM: int = 50
+
+pulsing_params: PulsingParams = PulsingParams(
+    delay = 26,
+    voltage_range = 1,
+    duration = 8,
+    avg_num = AVG_NUM
+)
+
+
+@pytest.fixture
+def pool():
+    pool = DevicePool.open(serials=SERIALS, backend='simulated', archive_dir=None)
+
+    for device in pool:
+        device.owner.run(device.picoscope_.connect)
+
+    yield pool
+
+    for device in pool:
+        device.owner.run(device.picoscope_.disconnect)
+
+
+def test_open(pool: DevicePool):
+    assert pool.ids == SERIALS
+    assert pool.default.id == SERIALS[0]
+    assert pool.get().picoscope_.serial == SERIALS[0]
+
+    with pytest.raises(KeyError):
+        pool.get('SIM00/0003')
+
+
+def test_open_attached():
+    pool = DevicePool.open(serials=[], backend='simulated', archive_dir=None)
+
+    assert pool.ids == ['SIM00/0001']
+
+
+def test_default_device():
+    assert make_device(backend='simulated').id == DEFAULT_DEVICE
+
+
+def test_handles_are_per_device(pool: DevicePool):
+    handles = [device.picoscope_._c_handle.value for device in pool]
+
+    assert len(set(handles)) == len(SERIALS)
+
+
+def test_devices_acquire_in_parallel(pool: DevicePool):
+    device = pool.default
+    start = time.perf_counter()
+    device.owner.acquire(pulsing_params=pulsing_params)
+    single_s = time.perf_counter() - start
+
+    # Different params, so not coalesced.
+    requests = [(None, replace(pulsing_params, delay=30)), (SERIALS[1], replace(pulsing_params, delay=30))]
+    start = time.perf_counter()
+    waveforms = pool.acquire_batch(requests=requests)
+    both_s = time.perf_counter() - start
+
+    assert [waveform.avg_num for waveform in waveforms] == [AVG_NUM, AVG_NUM]
+    assert both_s < 1.5 * single_s
+
+
+def test_batches_are_recorded(pool: DevicePool):
+    device = pool.default
+    requests = [(None, replace(pulsing_params, delay=delay)) for delay in [30, 28]]
+    waveforms = pool.acquire_batch(requests=requests)
+    entries = device.history.between(start=-np.inf, end=np.inf)
+
+    assert len(entries) == 2
+    assert {entry.pulsing_params.delay for entry in entries} == {30, 28}
+    assert {id(entry.waveform) for entry in entries} == {id(waveform) for waveform in waveforms}
+    assert device.owner.acquired_at is not None
+
+
+def test_warm_start():
+    pool = DevicePool.open(serials=SERIALS, backend='simulated', archive_dir=None)
+
+    assert all(device.readiness == Readiness.COLD for device in pool)
+
+    pool.warm_start(pulsing_params=pulsing_params)
+
+    for device in pool:
+        device.warm_start.result()
+
+        assert device.readiness == Readiness.READY
+        assert device.health()['warm_start_s'] > 0
+        assert device.owner.run(lambda: device.picoscope_.is_connected)
+        assert len(device.history) == 0  # The throwaway capture isn't recorded
+
+        device.owner.run(device.picoscope_.disconnect)
+
+    assert pool.is_healthy
+
+
+def test_warm_start_failure():
+    pool = DevicePool.open(serials=SERIALS[:1], backend='simulated', archive_dir=None)
+    pool.warm_start(pulsing_params=replace(pulsing_params, downsampling_mode='bogus'))
+
+    with pytest.raises(ValueError):
+        pool.default.warm_start.result()
+
+    assert pool.default.readiness == Readiness.FAILED
+    assert 'error' in pool.default.health()
+
+    pool.default.owner.run(pool.default.picoscope_.disconnect)
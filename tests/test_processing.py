@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from picoscope.averaging import AveragedWaveform
+from picoscope.processing import (
+    ProcessingParams, bandpass, envelope, gated_energy, peak, process, spectrum, time_of_flight
+)
+
+SAMPLING_INTERVAL: float = 4E-9
+DELAY_US: float = 26.
+
+times_us: np.ndarray = DELAY_US + np.arange(2000) * SAMPLING_INTERVAL * 1E6
+# A 2MHz tone burst centred at 30us, plus a 20MHz tone.
+burst_mV: np.ndarray = 100 * np.exp(-((times_us - 30) / 0.5)**2) * np.sin(2 * np.pi * 2 * times_us)
+waveform_mV: np.ndarray = burst_mV + 10 * np.sin(2 * np.pi * 20 * times_us)
+
+
+def test_processing_params():
+    processing_params = ProcessingParams(features='peak, tof', band='1,5', gates='28-30;30-32')
+
+    assert processing_params.feature_names == ('peak', 'tof')
+    assert processing_params.band_MHz == (1., 5.)
+    assert processing_params.gates_us == ((28., 30.), (30., 32.))
+    assert ProcessingParams(features='peak').band_MHz is None
+
+
+@pytest.mark.parametrize('kwargs', [
+    dict(features='loudness'),
+    dict(features=''),
+    dict(features='peak', band='5,1'),
+    dict(features='peak', gates='30-28'),
+    dict(features='peak', threshold=0)
+])
+def test_processing_params_invalid(kwargs: dict):
+    with pytest.raises(ValueError):
+        ProcessingParams(**kwargs)
+
+
+def test_bandpass():
+    filtered_mV = bandpass(waveform_mV, SAMPLING_INTERVAL, low_MHz=0.5, high_MHz=10)
+
+    assert filtered_mV.shape == waveform_mV.shape
+    assert np.max(np.abs(filtered_mV - burst_mV)) < 1
+
+
+def test_bandpass_vectorised():
+    stack_mV = np.stack([waveform_mV, 2 * waveform_mV])
+    filtered_mV = bandpass(stack_mV, SAMPLING_INTERVAL, low_MHz=1, high_MHz=5)
+
+    assert np.allclose(filtered_mV[1], 2 * filtered_mV[0])
+
+
+@pytest.mark.parametrize('n_samples', [2000, 1999])
+def test_envelope(n_samples: int):
+    envelope_mV = envelope(100 * np.sin(2 * np.pi * 2 * times_us[:n_samples]))
+
+    # Away from the edges, the envelope of a sine is its amplitude.
+    assert np.allclose(envelope_mV[200:-200], 100, rtol=0.01)
+
+
+def test_spectrum():
+    frequencies_MHz, magnitude_mV = spectrum(waveform_mV, SAMPLING_INTERVAL)
+
+    assert magnitude_mV.shape == frequencies_MHz.shape
+    assert frequencies_MHz[np.argmax(magnitude_mV * (frequencies_MHz > 10))] == pytest.approx(20, abs=0.5)
+    assert magnitude_mV[np.argmin(np.abs(frequencies_MHz - 20))] == pytest.approx(10, rel=0.1)
+
+
+def test_peak_and_time_of_flight():
+    envelope_mV = envelope(burst_mV)
+    peak_mV, peak_us = peak(envelope_mV, times_us)
+    tof_us = time_of_flight(envelope_mV, times_us, threshold=0.5)
+
+    assert peak_mV == pytest.approx(100, rel=0.05)
+    assert peak_us == pytest.approx(30, abs=0.05)
+    # Half the peak of the Gaussian envelope at sqrt(ln 2) widths before it.
+    assert tof_us == pytest.approx(30 - 0.5 * np.sqrt(np.log(2)), abs=0.01)
+
+
+def test_gated_energy():
+    energy = gated_energy(np.ones((2, len(times_us))), times_us, gates_us=((28, 30), (30, 32)))
+
+    assert energy.shape == (2, 2)
+    assert np.allclose(energy, 2, rtol=0.01)
+
+
+def test_process():
+    waveform = AveragedWaveform(mean_mV=waveform_mV, mV_per_adc=1., avg_num=1)
+    waveform.channels = {'B': waveform, 'A': AveragedWaveform(mean_mV=burst_mV, mV_per_adc=1., avg_num=1)}
+    features = process(
+        waveform=waveform,
+        processing_params=ProcessingParams(features='peak,energy,spectrum', band='1,5'),
+        delay_us=DELAY_US,
+        sampling_interval=SAMPLING_INTERVAL
+    )
+
+    assert list(features['channels']) == ['B', 'A']
+    assert features['peak_us'] == features['channels']['B']['peak_us']
+    assert features['peak_mV'] == pytest.approx(features['channels']['A']['peak_mV'], rel=0.01)
+    assert len(features['energy']) == 1
+    assert len(features['spectrum']) == len(features['frequencies_MHz'])
+    assert 'envelope' not in features
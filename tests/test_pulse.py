@@ -8,7 +8,7 @@ import numpy as np
 import pickle
 import pytest
 
-from picoscope.parameters import PulsingParams
+from picoscope.parameters import PulsingParams, WaitStrategy
 from picoscope.picoscope import Picoscope2000
 from picoscope import pulse
 
@@ -67,3 +67,53 @@ def test_pulse_wo_connection(instance: Picoscope2000):
     assert isinstance(waveform[COL], list)
     assert isinstance(waveform[COL][0], float)
     assert np.mean(abs(np.asarray(waveform[COL])) > 0)
+
+
+def test_pulse_rapid_block(connection: Picoscope2000):
+    global waveform
+
+    connection.rapid_block = True
+    waveform = pulse.pulse(
+        picoscope_=connection,
+        pulsing_params=PulsingParams(delay=26, voltage_range=1, duration=8, avg_num=8)
+    )
+
+    assert isinstance(waveform[COL], list)
+    assert np.mean(abs(np.asarray(waveform[COL])) > 0)
+
+
+@pytest.mark.parametrize('wait_strategy', list(WaitStrategy))
+def test_pulse_wait_strategies(connection: Picoscope2000, wait_strategy: WaitStrategy):
+    global waveform
+
+    connection.wait_strategy = wait_strategy
+    waveform = pulse.pulse(
+        picoscope_=connection,
+        pulsing_params=pulsing_params
+    )
+
+    assert isinstance(waveform[COL], list)
+    assert connection.wait_s >= 0
+
+
+def test_pulse_w_std(connection: Picoscope2000):
+    global waveform
+
+    waveform = pulse.pulse(
+        picoscope_=connection,
+        pulsing_params=PulsingParams(delay=26, voltage_range=1, duration=8, avg_num=8, std=True)
+    )
+
+    assert len(waveform['std']) == len(waveform[COL])
+
+
+def test_pulse_multi_channel(connection: Picoscope2000):
+    global waveform
+
+    waveform = pulse.pulse(
+        picoscope_=connection,
+        pulsing_params=PulsingParams(delay=26, voltage_range=1, duration=8, channels='BA')
+    )
+
+    assert list(waveform['channels']) == ['B', 'A']
+    assert len(waveform['channels']['A'][COL]) == len(waveform[COL])
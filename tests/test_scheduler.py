@@ -0,0 +1,180 @@
+import json
+import numpy as np
+import pytest
+import threading
+import time
+
+from picoscope import pulse
+from picoscope.acquisition import AcquisitionOwner
+from picoscope.averaging import AveragedWaveform
+from picoscope.parameters import PulsingParams
+from picoscope.scheduler import FileSink, MemorySink, Schedule, ScheduleStatus, Scheduler, Shot
+
+INTERVAL_S: float = 0.02
+DEVICE_ID: str = 'default'
+
+
+def params(delay: int) -> PulsingParams:
+    return PulsingParams(delay=delay, voltage_range=1, duration=8)
+
+
+@pytest.fixture
+def owner(monkeypatch: pytest.MonkeyPatch):
+    """Owner with a stand-in acquisition that takes _delay_ ms and fails for negative delays."""
+
+    def acquire(picoscope_, pulsing_params: PulsingParams, check_connection: bool = True) -> AveragedWaveform:
+        time.sleep(abs(pulsing_params.delay) * 1E-3)
+
+        if pulsing_params.delay < 0:
+            raise ValueError('Negative delay.')
+
+        return AveragedWaveform(mean_mV=np.full(10, pulsing_params.delay), mV_per_adc=1., avg_num=1)
+
+    monkeypatch.setattr(pulse, 'acquire', acquire)
+
+    return AcquisitionOwner(picoscope_=None)
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    scheduler = Scheduler(directory=str(tmp_path))
+
+    yield scheduler
+
+    for schedule in scheduler:
+        scheduler.remove(schedule.name).join()
+
+
+def test_duration(owner: AcquisitionOwner, scheduler: Scheduler):
+    schedule = scheduler.create(
+        name='short',
+        owner=owner,
+        device_id=DEVICE_ID,
+        pulsing_params=params(delay=1),
+        interval_s=INTERVAL_S,
+        duration_s=5 * INTERVAL_S
+    )
+    schedule.join()
+    shots = schedule.sink.since()
+
+    assert schedule.status == ScheduleStatus.DONE
+    assert [shot.index for shot in shots] == list(range(5))
+    assert all(shot.waveform is not None for shot in shots)
+    # Planned on a fixed grid, started close to it.
+    assert np.diff([shot.planned_at for shot in shots]) == pytest.approx(INTERVAL_S, abs=1E-6)
+    assert all(0 <= shot.lateness_s < INTERVAL_S for shot in shots)
+    assert schedule.to_dict()['max_lateness_s'] == max(shot.lateness_s for shot in shots)
+    assert [shot.index for shot in schedule.sink.since(index=2)] == [3, 4]
+
+
+def test_cancel(owner: AcquisitionOwner, scheduler: Scheduler):
+    schedule = scheduler.create(
+        name='endless',
+        owner=owner,
+        device_id=DEVICE_ID,
+        pulsing_params=params(delay=1),
+        interval_s=INTERVAL_S
+    )
+    time.sleep(3 * INTERVAL_S)
+
+    assert schedule.status == ScheduleStatus.RUNNING
+    assert [s.name for s in scheduler] == ['endless']
+
+    scheduler.remove('endless').join()
+
+    assert schedule.status == ScheduleStatus.CANCELLED
+    assert schedule.n_shots >= 2
+
+    with pytest.raises(KeyError):
+        scheduler.get('endless')
+
+
+def test_overrun_drops(owner: AcquisitionOwner, scheduler: Scheduler):
+    # Each shot takes 50ms, i.e. overruns two 20ms slots.
+    schedule = scheduler.create(
+        name='slow',
+        owner=owner,
+        device_id=DEVICE_ID,
+        pulsing_params=params(delay=50),
+        interval_s=INTERVAL_S,
+        duration_s=10 * INTERVAL_S
+    )
+    schedule.join()
+    indices = [shot.index for shot in schedule.sink.since()]
+
+    assert schedule.n_dropped > 0
+    assert schedule.n_shots + schedule.n_dropped >= 10
+    assert np.all(np.diff(indices) > 1)
+
+
+def test_failures_are_delivered(owner: AcquisitionOwner, scheduler: Scheduler):
+    schedule = scheduler.create(
+        name='failing',
+        owner=owner,
+        device_id=DEVICE_ID,
+        pulsing_params=params(delay=-1),
+        interval_s=INTERVAL_S,
+        duration_s=2 * INTERVAL_S
+    )
+    schedule.join()
+
+    assert schedule.n_failed == schedule.n_shots == 2
+    assert all(shot.to_dict()['error'] == 'Negative delay.' for shot in schedule.sink.since())
+
+
+def test_file_sink(owner: AcquisitionOwner, scheduler: Scheduler):
+    schedule = scheduler.create(
+        name='to_file',
+        sink='file',
+        owner=owner,
+        device_id=DEVICE_ID,
+        pulsing_params=params(delay=1),
+        interval_s=INTERVAL_S,
+        duration_s=3 * INTERVAL_S
+    )
+    schedule.join()
+
+    assert isinstance(schedule.sink, FileSink)
+    assert schedule.sink.since() == []
+
+    with open(schedule.to_dict()['path']) as file:
+        shots = [json.loads(line) for line in file]
+
+    assert [shot['index'] for shot in shots] == [0, 1, 2]
+    assert shots[0]['amps'] == [1.] * 10
+
+
+def test_delivered_off_the_worker(owner: AcquisitionOwner):
+    class ThreadSink(MemorySink):
+        def append(self, shot: Shot) -> None:
+            threads.append(threading.current_thread())
+            super().append(shot)
+
+    threads = []
+    schedule = Schedule(
+        name='threads',
+        owner=owner,
+        device_id=DEVICE_ID,
+        pulsing_params=params(delay=1),
+        interval_s=INTERVAL_S,
+        duration_s=2 * INTERVAL_S,
+        sink=ThreadSink()
+    )
+    schedule.start().join()
+
+    assert len(threads) == 2
+    assert owner._worker not in threads
+
+
+def test_invalid(owner: AcquisitionOwner, scheduler: Scheduler):
+    kwargs = dict(owner=owner, device_id=DEVICE_ID, pulsing_params=params(delay=1), interval_s=INTERVAL_S)
+    scheduler.create(name='taken', duration_s=INTERVAL_S, **kwargs)
+
+    for name, sink, interval_s in [('taken', 'memory', INTERVAL_S), ('../up', 'memory', INTERVAL_S),
+                                   ('new', 'tape', INTERVAL_S), ('new', 'memory', 0.),
+                                   ('new', 'memory', float('nan')), ('new', 'memory', float('inf'))]:
+        with pytest.raises(ValueError):
+            scheduler.create(name=name, sink=sink, **{**kwargs, 'interval_s': interval_s})
+
+    with pytest.raises(ValueError):
+        scheduler.create(name='new', duration_s=float('nan'), **kwargs)
@@ -0,0 +1,250 @@
+"""Runs the full pulsing flow against the simulated driver, no picoscope needed."""
+
+import ctypes
+from dataclasses import replace
+import numpy as np
+import pytest
+
+from picosdk.constants import PICO_STATUS
+
+from picoscope import pulse
+from picoscope.metrics import METRICS
+from picoscope.parameters import PulsingParams, WaitStrategy
+from picoscope.picoscope import PicoscopeSimulated, make_picoscope
+from picoscope.simulator import SimulatedPs2000a, SimulationProperties, downsample, sampling_interval
+
+COL = 'amps'
+
+pulsing_params: PulsingParams = PulsingParams(
+    delay=26,
+    voltage_range=1,
+    duration=8
+)
+properties: SimulationProperties = SimulationProperties(
+    echo_times_us=(30., ),
+    echo_amplitudes_V=(0.4, ),
+    pulse_repetition_rate=1E4,
+    call_latency_s=0.,
+    seed=0
+)
+
+
+@pytest.fixture
+def connection():
+    picoscope_ = PicoscopeSimulated(properties=properties)
+    picoscope_.connect()
+
+    yield picoscope_
+
+    picoscope_.disconnect()
+
+
+def test_make_picoscope():
+    assert isinstance(make_picoscope(backend='simulated'), PicoscopeSimulated)
+
+    with pytest.raises(ValueError):
+        make_picoscope(backend='ps9000')
+
+
+def test_sampling_interval():
+    assert sampling_interval(timebase=0) == 1E-9
+    assert sampling_interval(timebase=2) == 4E-9
+    assert sampling_interval(timebase=3) == 8E-9
+
+
+def test_is_connected(connection: PicoscopeSimulated):
+    assert connection.is_connected
+    assert connection.max_adc == properties.max_adc
+
+    connection.disconnect()
+
+    assert not connection.is_connected
+
+    connection.connect()
+
+
+def test_pulse(connection: PicoscopeSimulated):
+    waveform = pulse.pulse(picoscope_=connection, pulsing_params=pulsing_params)
+    amps = np.asarray(waveform[COL])
+
+    # The echo at 30us is 4us into the window.
+    assert len(amps) == connection.n_samples
+    assert abs(np.argmax(np.abs(amps)) * connection.sampling_interval - 4E-6) < 1E-6
+    assert 300 < np.max(np.abs(amps)) < 500
+
+
+@pytest.mark.parametrize('rapid_block, pipelined', [(True, False), (False, False), (False, True)])
+def test_pulse_averaging(connection: PicoscopeSimulated, rapid_block: bool, pipelined: bool):
+    connection.rapid_block = rapid_block
+    connection.pipelined = pipelined
+    waveform = pulse.acquire(
+        picoscope_=connection,
+        pulsing_params=PulsingParams(delay=26, voltage_range=1, duration=8, avg_num=16, std=True)
+    )
+
+    assert waveform.avg_num == 16
+    # Averaging reduces the noise, but the waveforms themselves are still noisy.
+    assert np.median(waveform.std_mV) == pytest.approx(properties.noise_V * 1E3, rel=0.2)
+
+
+def test_rapid_block_triggers_every_segment(connection: PicoscopeSimulated):
+    connection.rapid_block = True
+    avg_num = 8
+    pulse.acquire(
+        picoscope_=connection,
+        pulsing_params=PulsingParams(delay=26, voltage_range=1, duration=8, avg_num=avg_num)
+    )
+
+    # Echoes in every segment, none left to the auto trigger.
+    assert np.all(np.max(np.abs(connection.to_mV()[0]), axis=1) > 300)
+    assert connection._programmed['SetSigGenBuiltIn'][9] == avg_num
+
+    connection.rapid_block = False
+    pulse.acquire(picoscope_=connection, pulsing_params=pulsing_params)
+
+    assert connection._programmed['SetSigGenBuiltIn'][9] == 1  # Back to a single pulse
+
+
+@pytest.mark.parametrize('wait_strategy', list(WaitStrategy))
+def test_pulse_wait_strategies(connection: PicoscopeSimulated, wait_strategy: WaitStrategy):
+    connection.wait_strategy = wait_strategy
+    waveform = pulse.pulse(picoscope_=connection, pulsing_params=pulsing_params)
+
+    assert isinstance(waveform[COL], list)
+    assert connection.wait_s >= 0
+
+
+def test_pipelined(connection: PicoscopeSimulated):
+    connection.rapid_block = False
+    connection.pipelined = True
+    n_cycles = METRICS.histogram(metric='stage', label='cycle').count
+    waveform = pulse.acquire(
+        picoscope_=connection,
+        pulsing_params=PulsingParams(delay=26, voltage_range=1, duration=8, avg_num=5)
+    )
+
+    # Two segments, one capture per RunBlock, taking turns: the 5th shot is back in the first.
+    assert connection.n_segments == 2 and connection.n_captures == 1
+    assert connection.segment_index == 0
+    assert waveform.avg_num == 5
+    assert abs(np.argmax(np.abs(waveform.mean_mV)) * connection.sampling_interval - 4E-6) < 1E-6
+    assert METRICS.histogram(metric='stage', label='cycle').count == n_cycles + 5
+
+
+def test_overflow(connection: PicoscopeSimulated):
+    connection.rapid_block = True  # An overflow flag per segment
+    n_overflows = METRICS.count('overflows')
+
+    # 0.4V echo at the 0.1V range.
+    pulse.acquire(
+        picoscope_=connection,
+        pulsing_params=PulsingParams(delay=26, voltage_range=0.1, duration=8, avg_num=2)
+    )
+
+    assert all(connection._c_overflows)
+    assert METRICS.count('overflows') == n_overflows + 2
+
+
+def test_metrics(connection: PicoscopeSimulated):
+    n_shots = METRICS.count('shots')
+    pulse.acquire(
+        picoscope_=connection,
+        pulsing_params=PulsingParams(delay=26, voltage_range=1, duration=8, avg_num=4)
+    )
+
+    assert METRICS.count('shots') == n_shots + 4
+    assert METRICS.histogram(metric='sdk_call', label='GetValuesBulk').count > 0
+    assert METRICS.histogram(metric='stage', label='wait_ready').count > 0
+
+
+def test_status_codes():
+    simulator = SimulatedPs2000a(properties=properties)
+    handle = ctypes.c_int16()
+
+    assert simulator.PingUnit(handle) == PICO_STATUS['PICO_INVALID_HANDLE']
+    assert simulator.OpenUnit(ctypes.byref(handle), None) == PICO_STATUS['PICO_OK']
+    assert simulator.PingUnit(handle) == PICO_STATUS['PICO_OK']
+
+    n_max_samples = ctypes.c_int32()
+
+    assert simulator.MemorySegments(handle, 2, ctypes.byref(n_max_samples)) == PICO_STATUS['PICO_OK']
+    assert simulator.SetNoOfCaptures(handle, 4) == PICO_STATUS['PICO_NOT_ENOUGH_SEGMENTS']
+
+    n_samples = ctypes.c_int32(100)
+    overflow = ctypes.c_int16()
+
+    assert simulator.GetValues(handle, 0, ctypes.byref(n_samples), 0, 0, 0, ctypes.byref(overflow)) \
+        == PICO_STATUS['PICO_BUSY']
+
+
+def test_enumerate_serials():
+    picoscope_ = PicoscopeSimulated(properties=properties, serial='SIM00/0042')
+
+    assert picoscope_.enumerate_serials() == ['SIM00/0042']
+
+    picoscope_.connect()
+
+    assert picoscope_.enumerate_serials() == []
+
+    picoscope_.disconnect()
+
+
+def test_connect_to_wrong_serial():
+    picoscope_ = PicoscopeSimulated(properties=properties)
+    picoscope_.serial, picoscope_._c_serial = 'SIM00/0042', ctypes.c_char_p(b'SIM00/0042')
+
+    with pytest.raises(Exception):
+        picoscope_.connect()
+
+
+def test_multi_channel(connection: PicoscopeSimulated):
+    waveform = pulse.acquire(
+        picoscope_=connection,
+        pulsing_params=PulsingParams(delay=26, voltage_range=1, duration=8, avg_num=4, channels='BA')
+    )
+
+    assert list(waveform.channels) == ['B', 'A']
+    assert waveform.channels['B'].mean_mV is waveform.mean_mV
+    # Same echo, captured in the same shots, but with independent noise.
+    assert np.corrcoef(waveform.channels['A'].mean_mV, waveform.mean_mV)[0, 1] > 0.9
+    assert not np.array_equal(waveform.channels['A'].mean_mV, waveform.mean_mV)
+    assert connection.simulator._ranges.keys() == {0, 1}
+
+    waveform = pulse.acquire(picoscope_=connection, pulsing_params=pulsing_params)
+
+    assert waveform.channels is None
+    # A stays enabled, as the trigger's source.
+    assert connection.simulator._ranges.keys() == {0, 1}
+
+
+def test_trigger_source_is_enabled(connection: PicoscopeSimulated):
+    waveform = pulse.acquire(picoscope_=connection, pulsing_params=replace(pulsing_params, channels='B'))
+    source = connection.trigger_properties.channel
+
+    assert source not in connection.channels
+    assert source in connection.simulator._ranges
+    # Triggered, so the echo is there rather than just noise.
+    assert np.max(np.abs(waveform.mean_mV)) > 300
+
+
+def test_downsample():
+    adc = np.arange(10)
+
+    np.testing.assert_array_equal(downsample(adc=adc, mode=0, ratio=4), adc)
+    np.testing.assert_array_equal(downsample(adc=adc, mode=2, ratio=4), [0, 4])
+    np.testing.assert_array_equal(downsample(adc=adc, mode=4, ratio=4), [2, 6])
+
+
+@pytest.mark.parametrize('mode', ['decimate', 'average'])
+def test_downsampling(connection: PicoscopeSimulated, mode: str):
+    full = pulse.acquire(picoscope_=connection, pulsing_params=pulsing_params)
+    waveform = pulse.acquire(
+        picoscope_=connection,
+        pulsing_params=PulsingParams(delay=26, voltage_range=1, duration=8, downsampling_mode=mode, downsampling_ratio=4)
+    )
+
+    assert len(waveform.mean_mV) == len(full.mean_mV) // 4
+    assert connection.adc_values.shape[-1] == len(waveform.mean_mV)
+    assert waveform.sampling_interval == 4 * full.sampling_interval
+    # The echo at 30us is still 4us into the window.
+    assert abs(np.argmax(np.abs(waveform.mean_mV)) * waveform.sampling_interval - 4E-6) < 1E-6
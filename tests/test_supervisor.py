@@ -0,0 +1,105 @@
+from dataclasses import replace
+import pytest
+import time
+
+from picoscope.acquisition import AcquisitionOwner
+from picoscope.metrics import METRICS
+from picoscope.parameters import PulsingParams
+from picoscope.picoscope import PicoscopeSimulated
+from picoscope.simulator import SimulationProperties
+from picoscope.supervisor import ConnectionSupervisor
+
+INTERVAL_S: float = 0.01
+SERIAL: str = 'SIM00/0001'
+
+pulsing_params: PulsingParams = PulsingParams(
+    delay = 26,
+    voltage_range = 1,
+    duration = 8
+)
+
+
+def wait_for(condition, timeout_s: float = 2.) -> None:
+    deadline = time.monotonic() + timeout_s
+
+    while not condition():
+        assert time.monotonic() < deadline, 'Timed out.'
+        time.sleep(INTERVAL_S / 2)
+
+
+@pytest.fixture
+def supervisor():
+    picoscope_ = PicoscopeSimulated(properties=SimulationProperties(call_latency_s=0.), serial=SERIAL)
+    supervisor = ConnectionSupervisor(owner=AcquisitionOwner(picoscope_=picoscope_), interval_s=INTERVAL_S)
+
+    yield supervisor.start()
+
+    supervisor.stop()
+
+
+def unplug(supervisor: ConnectionSupervisor) -> None:
+    """The handle goes stale w/o the picoscope knowing, as if the cable was pulled."""
+    supervisor.owner.picoscope_.simulator._handle = 0
+
+
+def test_connects_at_start(supervisor: ConnectionSupervisor):
+    wait_for(lambda: supervisor.is_connected)
+
+    assert supervisor.owner.picoscope_.was_connected
+    assert supervisor.checked_at is not None
+    assert not supervisor.owner.check_connection
+
+
+def test_reconnects(supervisor: ConnectionSupervisor):
+    wait_for(lambda: supervisor.is_connected)
+    n_reconnects = supervisor.n_reconnects
+    unplug(supervisor)
+
+    wait_for(lambda: supervisor.n_reconnects > n_reconnects)
+
+    assert supervisor.is_connected
+    assert supervisor.status()['downtime_s'] > 0
+
+
+def test_backs_off(supervisor: ConnectionSupervisor):
+    wait_for(lambda: supervisor.is_connected)
+    simulator = supervisor.owner.picoscope_.simulator
+    simulator.properties = replace(simulator.properties, serial='SIM00/0002')  # Gone for good
+    unplug(supervisor)
+
+    wait_for(lambda: supervisor.n_failed_reconnects >= 3)
+    downtime_s = supervisor.downtime_s
+
+    assert not supervisor.is_connected
+    assert downtime_s > 0
+    # Backoff doubles from the interval, so the failures get sparser.
+    n_failed = supervisor.n_failed_reconnects
+    time.sleep(4 * INTERVAL_S)
+    assert supervisor.n_failed_reconnects <= n_failed + 2
+    assert supervisor.downtime_s > downtime_s
+
+
+def test_leases_are_not_interrupted(supervisor: ConnectionSupervisor):
+    wait_for(lambda: supervisor.is_connected)
+
+    with supervisor.owner.lease():
+        n_pings = METRICS.histogram(metric='sdk_call', label='PingUnit').count
+        time.sleep(4 * INTERVAL_S)
+
+        assert supervisor.heartbeat() is None
+        assert METRICS.histogram(metric='sdk_call', label='PingUnit').count == n_pings
+
+
+def test_acquisitions_dont_ping():
+    picoscope_ = PicoscopeSimulated(properties=SimulationProperties(call_latency_s=0.), serial=SERIAL)
+    owner = AcquisitionOwner(picoscope_=picoscope_)
+    owner.check_connection = False  # As set by a supervisor
+    owner.acquire(pulsing_params=pulsing_params)  # Connects, as it never was
+    n_pings = METRICS.histogram(metric='sdk_call', label='PingUnit').count
+
+    owner.acquire(pulsing_params=replace(pulsing_params, delay=27))
+
+    assert METRICS.histogram(metric='sdk_call', label='PingUnit').count == n_pings
+    assert owner.acquired_at is not None
+
+    owner.run(picoscope_.disconnect)
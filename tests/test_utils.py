@@ -1,6 +1,7 @@
 import numpy as np
 import pytest
 
+from picoscope.averaging import AveragedWaveform
 from picoscope.parameters import PulsingParams, builtin_voltage_ranges
 from picoscope import utils
 
@@ -58,13 +59,57 @@ def test_parse_dict_vals_to_int():
     assert isinstance(dict_w_vals_as_float['delay'], int)
 
 
+def test_parse_dataclass_vals():
+    dict_ = utils.parse_dataclass_vals(
+        dataclass_=PulsingParams,
+        dict_={**dict_w_vals_as_str, 'voltage_range': '0.1', 'avg_num': '8', 'std': 'False'}
+    )
+
+    assert dict_['voltage_range'] == 0.1
+    assert dict_['avg_num'] == 8 and isinstance(dict_['avg_num'], int)
+    assert dict_['std'] is False
+    assert utils.requests_to_type(val='1', type_=bool) is True
+
+
+def test_parse_pulsing_params_channels():
+    pulsing_params = utils.parse_pulsing_params({**dict_w_vals_as_str, 'channels': 'bab'})
+
+    assert pulsing_params.channels == 'BA'
+
+    for channels in ['', 'E', 'C', 'B, A']:
+        with pytest.raises(ValueError):
+            utils.parse_pulsing_params({**dict_w_vals_as_str, 'channels': channels})
+
+
 def test_parse_payload():
     key: str = 'amps'
-    payload = utils.parse_payload(field=np.array([[0.1, 0.01], [0.08, 0.02]]), key=key)
+    waveform = AveragedWaveform(mean_mV=np.array([0.09, 0.015]), mV_per_adc=0.03, avg_num=2)
+    payload = utils.parse_payload(waveform=waveform, key=key)
 
     assert isinstance(payload, dict)
     assert isinstance(payload[key], list)
     assert isinstance(payload[key][0], float)
+    assert 'std' not in payload
+
+
+def test_parse_payload_w_std():
+    waveform = AveragedWaveform(
+        mean_mV=np.array([0.09, 0.015]),
+        mV_per_adc=0.03,
+        avg_num=2,
+        std_mV=np.array([0.01, 0.005])
+    )
+    payload = utils.parse_payload(waveform=waveform)
+
+    assert payload['std'] == [0.01, 0.005]
+
+
+def test_adc_to_mV():
+    adc = np.array([[-32512, 0, 16256]], dtype=np.int16)
+    mV = utils.adc_to_mV(adc=adc, enum_voltage_range=6, max_adc=32512)
+
+    assert mV.shape == adc.shape
+    assert np.allclose(mV, [[-1000., 0., 500.]])
 
 
 def test_to_enum():